@@ -0,0 +1,440 @@
+import numpy as np
+import pandas as pd
+
+from convert_to_parquet import load_p2p_frame
+from cube import MONTH_KEY
+from filter_index import FilterIndex
+from preprocessing import gold_path, load_gold_frame, preprocess, safe_col
+from timing import DocumentTimings, percentile_table
+
+# ---------- CONFIG ----------
+FY = {
+    'All Years': (pd.Timestamp('2023-04-01'), pd.Timestamp('2026-03-31')),
+    '2023': (pd.Timestamp('2023-04-01'), pd.Timestamp('2024-03-31')),
+    '2024': (pd.Timestamp('2024-04-01'), pd.Timestamp('2025-03-31')),
+    '2025': (pd.Timestamp('2025-04-01'), pd.Timestamp('2026-03-31'))
+}
+# Source columns the dashboard reads (every safe_col candidate + direct references);
+# loaders project the Parquet read onto these.
+DASHBOARD_COLUMNS = frozenset([
+    'pr_number', 'pr_no', 'pr_date_submitted', 'pr_date', 'pr_status', 'status', 'prstatus',
+    'pr_requester', 'requester', 'pr_requester_name', 'requester_name',
+    'pr_quantity', 'unit_rate', 'pr_unit_rate', 'pr_value',
+    'purchase_doc', 'purchase_doc_number', 'po_create_date', 'po_created_date', 'po_approved_date',
+    'po_delivery_date', 'po_vendor', 'vendor', 'po_quantity', 'po_qty', 'po_unit_rate', 'po_unit_price',
+    'net_amount', 'net_amount_inr', 'amount', 'receivedqty', 'received_qty',
+    'po_orderer', 'po_orderer_code', 'buyer_group', 'Buyer.Type', 'buyer_type',
+    'procurement_category', 'product_name', 'item_code', 'item_description',
+    'pr_budget_code', 'pr_budgetcode', 'pr_budget_description', 'pr_budget_desc',
+    'po_budget_code', 'po_budgetcode', 'po_budget_description', 'po_budget_desc',
+    'pr_bussiness_unit', 'pr_business_unit', 'pr_bu', 'po_bussiness_unit', 'po_business_unit', 'po_bu',
+    'entity', 'company', 'brand', 'entity_name', 'entity_source_file',
+])
+# Role -> source column candidates, in the dashboard's detection order
+COLUMN_CANDIDATES = {
+    'pr_date': ['pr_date_submitted', 'pr_date', 'pr date submitted'],
+    'po_create': ['po_create_date', 'po create date', 'po_created_date'],
+    'po_approved': ['po_approved_date', 'po approved date'],
+    'po_delivery': ['po_delivery_date', 'po delivery date'],
+    'net_amount': ['net_amount', 'net amount', 'net_amount_inr', 'amount'],
+    'purchase_doc': ['purchase_doc', 'purchase_doc_number', 'purchase doc'],
+    'pr_number': ['pr_number', 'pr number', 'pr_no'],
+    'po_vendor': ['po_vendor', 'vendor', 'po vendor'],
+    'pr_qty': ['pr_quantity', 'pr qty', 'pr quantity'],
+    'pr_unit_rate': ['unit_rate', 'pr_unit_rate', 'pr unit rate'],
+    'pr_value': ['pr_value', 'pr value'],
+    'po_qty': ['po_quantity', 'po qty', 'po_qty'],
+    'po_unit_rate': ['po_unit_rate', 'po unit rate', 'po_unit_price'],
+    'received_qty': ['receivedqty', 'received_qty', 'received qty'],
+    'pr_budget_code': ['pr_budget_code', 'pr budget code', 'pr_budgetcode'],
+    'pr_budget_desc': ['pr_budget_description', 'pr budget description', 'pr_budget_desc'],
+    'po_budget_desc': ['po_budget_description', 'po budget description', 'po_budget_desc'],
+    'pr_bu': ['pr_bussiness_unit', 'pr_business_unit', 'pr business unit', 'pr_bu'],
+    'po_bu': ['po_bussiness_unit', 'po_business_unit', 'po business unit', 'po_bu'],
+}
+# Query filter name -> frame column (what the dashboard sidebar filters on)
+FILTER_COLUMNS = {
+    'entity': 'entity', 'buyer_type': 'Buyer.Type', 'procurement_category': 'procurement_category',
+    'po_creator': 'po_creator', 'po_vendor': 'po_vendor', 'product_name': 'product_name', 'item_type': 'Item.Type',
+}
+UNMAPPED_DEPARTMENT = 'Unmapped / Missing'
+
+
+def distinct_join(df: pd.DataFrame, by: str, col: str, sep: str = ', ', index=None) -> pd.Series:
+    """Per group of `by`, the sorted distinct non-blank values of `col` as text joined by `sep`
+    (what `', '.join(sorted(set(str(v) for v in x.dropna() if str(v).strip())))` gives per group).
+
+    Both columns are factorized once; only the distinct values are turned into text, the
+    (group, value) pairs are deduplicated and ordered with one np.unique, and the groups are
+    joined in a single pass. Indexed by group value; with `index`, reindexed to it ('' where
+    a group has no values)."""
+    g_codes, g_uniques = pd.factorize(df[by])
+    v_codes, v_uniques = pd.factorize(df[col])
+    # values with the same text (e.g. 1 and '1') are one distinct value
+    t_codes, texts = pd.factorize(np.array([str(v) for v in v_uniques], dtype=object))
+    texts = np.asarray(texts, dtype=object)
+    rank = np.empty(len(texts), dtype=np.int64)
+    rank[np.argsort(texts, kind='stable')] = np.arange(len(texts))
+    blank = np.array([not t.strip() for t in texts], dtype=bool)
+
+    keep = (g_codes >= 0) & (v_codes >= 0)
+    text_ids = t_codes[v_codes[keep]]
+    groups = g_codes[keep]
+    nonblank = ~blank[text_ids]
+    n_text = max(len(texts), 1)
+    pairs = np.unique(groups[nonblank].astype(np.int64) * n_text + rank[text_ids[nonblank]])
+    pair_groups, pair_ranks = pairs // n_text, pairs % n_text
+    by_rank = np.empty(len(texts), dtype=object)
+    by_rank[rank] = texts
+    labels = by_rank[pair_ranks].tolist()
+
+    starts = np.flatnonzero(np.r_[True, pair_groups[1:] != pair_groups[:-1]]) if len(pairs) else np.array([], dtype=np.int64)
+    ends = np.r_[starts[1:], len(pairs)]
+    joined = [sep.join(labels[a:b]) for a, b in zip(starts, ends)]
+    out = pd.Series(joined, index=pd.Index(np.asarray(g_uniques, dtype=object)[pair_groups[starts]]), dtype=object)
+    if index is not None:
+        out = out.reindex(np.asarray(index, dtype=object)).fillna('')
+    return out
+
+
+def text_codes(s: pd.Series) -> tuple:
+    """(codes, labels) with labels[codes] equal to s.astype(str), row for row; only the distinct
+    values are turned into text and categoricals reuse their codes. Nulls get the last label."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes, uniques = s.cat.codes.to_numpy(), s.cat.categories
+    else:
+        codes, uniques = pd.factorize(s)
+    labels = np.array([str(v) for v in uniques] + [str(np.nan)], dtype=object)
+    return np.where(codes < 0, len(labels) - 1, codes), labels
+
+
+def text_equals(s: pd.Series, value) -> np.ndarray:
+    """Positional mask of s.astype(str) == str(value), compared on codes instead of per-row strings."""
+    codes, labels = text_codes(s)
+    return np.isin(codes, np.flatnonzero(labels == str(value)))
+
+
+def text_values(s: pd.Series) -> list:
+    """Sorted distinct non-blank values of `s` as text (the choices of a value picker)."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes = s.cat.codes.to_numpy()
+        uniques = s.cat.categories[np.unique(codes[codes >= 0])]
+    else:
+        uniques = s.dropna().unique()
+    return sorted({str(v) for v in uniques if str(v).strip()})
+
+
+# ---------- Row selection ----------
+
+def fy_mask(df: pd.DataFrame, pr_col: str | None, po_create_col: str | None, start, end) -> np.ndarray:
+    """Rows whose PR date (PO create date where the PR date is missing) falls in [start, end].
+    Masks are writable copies (under copy-on-write to_numpy() hands out read-only views)."""
+    if pr_col and pr_col in df.columns:
+        d_check = df[pr_col]
+        if po_create_col and po_create_col in df.columns:
+            d_check = d_check.fillna(df[po_create_col])
+        return ((d_check >= start) & (d_check <= end)).to_numpy(copy=True)
+    if po_create_col and po_create_col in df.columns:
+        return ((df[po_create_col] >= start) & (df[po_create_col] <= end)).to_numpy(copy=True)
+    return np.ones(len(df), dtype=bool)
+
+
+def date_mask(df: pd.DataFrame, basis_col: str, start, end) -> np.ndarray:
+    """Rows with `basis_col` in [start day 00:00, end day 23:59:59]."""
+    sdt = pd.to_datetime(start)
+    edt = pd.to_datetime(end) + pd.Timedelta(hours=23, minutes=59, seconds=59)
+    return ((df[basis_col] >= sdt) & (df[basis_col] <= edt)).to_numpy(copy=True)
+
+
+# ---------- Tab computations (rows in, DataFrame out) ----------
+
+def monthly_spend(rows: pd.DataFrame, amount_col: str, by: str | None = None, start=None, end=None):
+    """Spend per month (MONTH_KEY column of `rows`) and, with `by`, per month x `by` as a long
+    frame with a 'month' column; without `by`, a month-indexed Series. `start` / `end` keep
+    only the months inside the FY."""
+    z = rows.rename(columns={MONTH_KEY: 'month'})
+    z = z[z['month'].notna()]
+    if start is not None and end is not None:
+        z = z[(z['month'] >= start) & (z['month'] <= end)]
+    if by is None:
+        return z.groupby('month')[amount_col].sum().sort_index()
+    return z.groupby(['month', by], dropna=False)[amount_col].sum().reset_index()
+
+
+def spend_by(rows: pd.DataFrame, amount_col: str, by: str, dropna: bool = False, observed: bool = False) -> pd.DataFrame:
+    """Spend per `by`, largest first, with a 'cr' (crore) column."""
+    out = rows.groupby(by, dropna=dropna, observed=observed)[amount_col].sum().reset_index().sort_values(amount_col, ascending=False)
+    out['cr'] = out[amount_col] / 1e7
+    return out
+
+
+def po_approval_lines(rows: pd.DataFrame, po_create: str, po_approved: str | None) -> pd.DataFrame:
+    """PO lines with is_approved and approval_lead_time (days from PO creation to approval)."""
+    p_df = rows.copy()
+    if po_approved and po_approved in p_df.columns:
+        p_df['is_approved'] = p_df[po_approved].notna()
+        p_df['approval_lead_time'] = (p_df[po_approved] - p_df[po_create]).dt.days
+    else:
+        p_df['is_approved'] = False
+        p_df['approval_lead_time'] = np.nan
+    return p_df
+
+
+def delivery_by_po(rows: pd.DataFrame, po_qty_col: str, received_col: str, po_col: str, vendor_col: str,
+                   amount_col: str | None = None) -> pd.DataFrame:
+    """One row per (PO, vendor): ordered / received quantity and value, % received, open and
+    partial flags, and the open value (net value x share not yet received)."""
+    tmp = pd.DataFrame({
+        po_col: rows[po_col], vendor_col: rows[vendor_col],
+        'po_qty_f': rows[po_qty_col].fillna(0.0), 'received_f': rows[received_col].fillna(0.0),
+        'net_val': rows[amount_col].fillna(0.0) if amount_col and amount_col in rows.columns else 0.0,
+    })
+    # observed=True: both keys are categorical, and unobserved PO x vendor pairs are not POs
+    grp = tmp.groupby([po_col, vendor_col], dropna=False, observed=True).agg(
+        {'po_qty_f': 'sum', 'received_f': 'sum', 'net_val': 'sum'}).reset_index()
+    grp['pct_received'] = np.where(grp['po_qty_f'] > 0, grp['received_f'] / grp['po_qty_f'] * 100, 0)
+    grp['is_open'] = grp['received_f'] < grp['po_qty_f']
+    grp['is_partial'] = (grp['received_f'] > 0) & (grp['received_f'] < grp['po_qty_f'])
+    ratio = np.clip(np.where(grp['po_qty_f'] > 0, grp['received_f'] / grp['po_qty_f'], 1.0), 0, 1)
+    grp['open_val'] = grp['net_val'] * (1 - ratio)
+    return grp
+
+
+def unified_department(dept: pd.DataFrame) -> pd.Series:
+    """First non-empty of the department columns (PR BU, PR budget description, PO BU, ...)."""
+    if dept.shape[1] == 0:
+        return pd.Series(UNMAPPED_DEPARTMENT, index=dept.index)
+    out = np.full(len(dept), UNMAPPED_DEPARTMENT, dtype=object)
+    pending = np.ones(len(dept), dtype=bool)
+    for col in dept.columns:
+        codes, labels = text_codes(dept[col])
+        hit = pending & (labels != '')[codes]
+        out[hit] = labels[codes[hit]]
+        pending &= ~hit
+    return pd.Series(out, index=dept.index)
+
+
+def unit_rate_deviation(rows: pd.DataFrame, group_col: str, rate_col: str) -> pd.DataFrame:
+    """Lines with a rate, each with its group's median rate and the relative deviation (pctdev)."""
+    z = rows.dropna(subset=[group_col, rate_col])
+    med = z.groupby(group_col)[rate_col].median().rename('median_rate')
+    z = z.join(med, on=group_col)
+    z['pctdev'] = (z[rate_col] - z['median_rate']) / z['median_rate'].replace(0, np.nan)
+    return z
+
+
+def savings_lines(z: pd.DataFrame, pr_number_col=None, purchase_doc_col=None, pr_qty_col=None, pr_unit_rate_col=None,
+                  pr_value_col=None, po_qty_col=None, po_unit_rate_col=None, net_col=None) -> pd.DataFrame:
+    """PR -> PO savings per line: PR and PO line values, absolute and % savings, unit-rate %
+    saved. Adds the columns to `z` (pass a frame of its own) and returns the display columns."""
+    # quantity/rate/value columns are float64 from the converter schema — no re-parsing
+    def num(col, default=0.0):
+        return z[col] if col and col in z.columns else pd.Series(default, index=z.index, dtype='float64')
+
+    # PR line value: PR Value if present else PR Qty * PR Unit Rate
+    if pr_value_col and pr_value_col in z.columns:
+        z['pr_line_value'] = z[pr_value_col].fillna(0.0)
+    else:
+        z['pr_line_value'] = num(pr_qty_col).fillna(0.0) * num(pr_unit_rate_col).fillna(0.0)
+    # PO line net: Net Amount if present else PO Qty * PO Unit Rate
+    if net_col and net_col in z.columns:
+        z['po_line_value'] = z[net_col].fillna(0.0)
+    else:
+        z['po_line_value'] = num(po_qty_col).fillna(0.0) * num(po_unit_rate_col).fillna(0.0)
+    z['pr_unit_rate_f'] = num(pr_unit_rate_col, np.nan)
+    z['po_unit_rate_f'] = num(po_unit_rate_col, np.nan)
+    z['savings_abs'] = z['pr_line_value'] - z['po_line_value']
+    z['savings_pct'] = np.where(z['pr_line_value'] > 0, (z['savings_abs'] / z['pr_line_value']) * 100.0, np.nan)
+    z['unit_rate_pct_saved'] = np.where(
+        z['pr_unit_rate_f'] > 0,
+        (z['pr_unit_rate_f'] - z['po_unit_rate_f']) / z['pr_unit_rate_f'] * 100.0,
+        np.nan
+    )
+    disp_cols = [
+        pr_number_col, purchase_doc_col, pr_qty_col, pr_unit_rate_col, pr_value_col,
+        po_qty_col, po_unit_rate_col, net_col, 'pr_line_value', 'po_line_value', 'savings_abs',
+        'savings_pct', 'unit_rate_pct_saved', 'po_vendor', 'buyer_display', 'entity', 'procurement_category'
+    ]
+    return z[[c for c in dict.fromkeys(disp_cols) if c and c in z.columns]]
+
+
+# ---------- Headless queries ----------
+
+class P2PData:
+    """The dashboard's data and numbers without Streamlit: one FY / entity load (the
+    preprocessed artifact when fresh, else live preprocessing), the same column detection
+    and sidebar filter semantics, and one method per report (filters in, DataFrame out).
+
+    Filters are a dict: 'date_range' = (start, end) days, 'item_type' = 'Products' or
+    'Services', and lists of values for entity, buyer_type, procurement_category,
+    po_creator, po_vendor and product_name (missing / empty = no filter)."""
+
+    def __init__(self, fy: str = 'All Years', entities=None):
+        if fy not in FY:
+            raise ValueError(f"Unknown FY {fy!r}; expected one of {list(FY)}")
+        self.fy = fy
+        self.start, self.end = FY[fy]
+        entities = list(entities) if entities else None
+        path = gold_path()
+        if path is not None:
+            df = load_gold_frame(columns=DASHBOARD_COLUMNS, start=self.start, end=self.end, entities=entities, path=path)
+        else:
+            df = load_p2p_frame(columns=DASHBOARD_COLUMNS, start=self.start, end=self.end, entities=entities)
+            df = preprocess(df) if not df.empty else df
+        missing = [c for c in ['Buyer.Type', 'po_creator', 'po_vendor', 'entity', 'po_buyer_type'] if c not in df.columns]
+        if missing:
+            df = df.assign(**{c: ('Direct' if c == 'Buyer.Type' else '') for c in missing})
+        self.df = df
+        self.cols = {role: safe_col(df, candidates) for role, candidates in COLUMN_CANDIDATES.items()}
+        self.date_basis = self.cols['pr_date'] or self.cols['po_create']
+        self.trend_date = self.cols['po_create'] or self.cols['pr_date']
+        self.index = FilterIndex(df)
+        self._timings = None
+
+    def rows(self, filters: dict | None = None) -> np.ndarray:
+        """Boolean row mask for the filters (FY always applies)."""
+        filters = filters or {}
+        c = self.cols
+        mask = fy_mask(self.df, c['pr_date'], c['po_create'], self.start, self.end)
+        if filters.get('date_range') and self.date_basis:
+            mask &= date_mask(self.df, self.date_basis, *filters['date_range'])
+        selections = {col: (list(filters[name]) if name != 'item_type' else [filters[name]])
+                      for name, col in FILTER_COLUMNS.items() if filters.get(name) and filters[name] != 'All'}
+        return self.index.select(selections, base=mask)
+
+    def lines(self, filters: dict | None = None, columns=None) -> pd.DataFrame:
+        """The filtered line items (`columns` only, when given), with the spend month."""
+        fil = self.df[self.rows(filters)]
+        if self.trend_date:
+            month = fil[self.trend_date].dt.to_period('M').dt.to_timestamp()
+        else:
+            month = pd.Series(pd.NaT, index=fil.index)
+        if columns is not None:
+            fil = fil[[col for col in dict.fromkeys(columns) if col and col in fil.columns]]
+        return fil.assign(**{MONTH_KEY: month})
+
+    def _amount(self) -> str:
+        if not self.cols['net_amount']:
+            raise KeyError("No Net Amount column in the data")
+        return self.cols['net_amount']
+
+    def kpis(self, filters=None) -> pd.DataFrame:
+        fil = self.df[self.rows(filters)]
+        c = self.cols
+        return pd.DataFrame([{
+            'Total PRs': int(fil[c['pr_number']].nunique()) if c['pr_number'] else 0,
+            'Total POs': int(fil[c['purchase_doc']].nunique()) if c['purchase_doc'] else 0,
+            'Line Items': len(fil),
+            'Entities': int(fil['entity'].nunique()),
+            'Spend (Cr)': float(fil[c['net_amount']].sum()) / 1e7 if c['net_amount'] else 0.0,
+        }])
+
+    def monthly_spend(self, filters=None, by: str = 'entity') -> pd.DataFrame:
+        """Monthly spend per `by` within the FY (the KPIs tab's monthly / entity chart)."""
+        amount = self._amount()
+        return monthly_spend(self.lines(filters, [by, amount]), amount, by, self.start, self.end)
+
+    def monthly_total(self, filters=None) -> pd.DataFrame:
+        amount = self._amount()
+        return monthly_spend(self.lines(filters, [amount]), amount).reset_index()
+
+    def category_spend(self, filters=None) -> pd.DataFrame:
+        amount = self._amount()
+        return spend_by(self.lines(filters, ['procurement_category', amount]), amount, 'procurement_category')
+
+    def buyer_spend(self, filters=None) -> pd.DataFrame:
+        amount = self._amount()
+        return spend_by(self.lines(filters, ['buyer_display', amount]), amount, 'buyer_display', dropna=True)
+
+    def buyer_trend(self, filters=None) -> pd.DataFrame:
+        amount = self._amount()
+        return monthly_spend(self.lines(filters, ['buyer_display', amount]), amount, 'buyer_display')
+
+    def timings(self) -> DocumentTimings:
+        if self._timings is None:
+            c = self.cols
+            self._timings = DocumentTimings(self.df, c['pr_number'], c['pr_date'], c['purchase_doc'],
+                                            c['po_create'], c['po_approved'], c['po_delivery'])
+        return self._timings
+
+    def lead_times(self, filters=None, by: str | None = 'Buyer.Type') -> pd.DataFrame:
+        """PR -> first PO lead-time percentiles per PR document, by `by` (None = overall)."""
+        docs = self.timings().prs(self.rows(filters))
+        return percentile_table(docs[docs['lead_days'].notna()] if 'lead_days' in docs.columns else docs, by, 'lead_days')
+
+    def approval_times(self, filters=None, by: str | None = 'po_creator') -> pd.DataFrame:
+        """PO creation -> approval percentiles per PO document, by `by` (None = overall)."""
+        return percentile_table(self.timings().pos(self.rows(filters)), by, 'approval_days')
+
+    def po_approval(self, filters=None) -> pd.DataFrame:
+        c = self.cols
+        if not c['po_create']:
+            return pd.DataFrame()
+        cols = ['po_creator', c['purchase_doc'], c['po_create'], c['po_approved'], c['net_amount'], c['po_vendor'], 'product_name']
+        return po_approval_lines(self.lines(filters, cols).drop(columns=MONTH_KEY), c['po_create'], c['po_approved'])
+
+    def delivery(self, filters=None) -> pd.DataFrame:
+        c = self.cols
+        if not (c['po_qty'] and c['received_qty']):
+            return pd.DataFrame()
+        rows = self.lines(filters, [c['po_qty'], c['received_qty'], c['purchase_doc'], c['po_vendor'], c['net_amount']])
+        return delivery_by_po(rows, c['po_qty'], c['received_qty'], c['purchase_doc'], c['po_vendor'], c['net_amount'])
+
+    def budget_spend(self, filters=None, by: str = 'pr_budget_desc') -> pd.DataFrame:
+        """Spend per PR budget description ('pr_budget_desc') or code ('pr_budget_code')."""
+        amount, col = self._amount(), self.cols.get(by)
+        if not col:
+            return pd.DataFrame()
+        return spend_by(self.lines(filters, [col, amount]), amount, col, observed=True)
+
+    def department_spend(self, filters=None) -> pd.DataFrame:
+        c = self.cols
+        amount = self._amount()
+        dept_cols = [col for col in (c['pr_bu'], c['pr_budget_desc'], c['po_bu'], c['po_budget_desc'], c['pr_budget_code']) if col]
+        rows = self.lines(filters, dept_cols + [amount])
+        rows['pr_department_unified'] = unified_department(rows[dept_cols])
+        return spend_by(rows, amount, 'pr_department_unified')
+
+    def savings(self, filters=None) -> pd.DataFrame:
+        c = self.cols
+        cols = [c['pr_number'], c['purchase_doc'], c['pr_qty'], c['pr_unit_rate'], c['pr_value'], c['po_qty'],
+                c['po_unit_rate'], c['net_amount'], 'po_vendor', 'buyer_display', 'entity', 'procurement_category']
+        return savings_lines(self.lines(filters, cols), c['pr_number'], c['purchase_doc'], c['pr_qty'], c['pr_unit_rate'],
+                             c['pr_value'], c['po_qty'], c['po_unit_rate'], c['net_amount'])
+
+    def unit_rate_outliers(self, filters=None, group_by: str = 'product_name', threshold: float = 50) -> pd.DataFrame:
+        """Lines whose PO unit rate deviates from their group's median by >= threshold %."""
+        c = self.cols
+        if not c['po_unit_rate'] or group_by not in self.df.columns:
+            return pd.DataFrame()
+        cols = [group_by, c['po_unit_rate'], c['purchase_doc'], c['pr_number'], c['po_vendor'], 'item_description',
+                c['po_create'], c['net_amount']]
+        z = unit_rate_deviation(self.lines(filters, cols).drop(columns=MONTH_KEY), group_by, c['po_unit_rate'])
+        out = z[abs(z['pctdev']) >= threshold / 100.0].copy()
+        out['pctdev%'] = (out['pctdev'] * 100).round(1)
+        return out.sort_values('pctdev%', ascending=False)
+
+
+# Report name -> P2PData method (the API's stable names)
+REPORTS = {
+    'kpis': P2PData.kpis,
+    'monthly_spend': P2PData.monthly_spend,
+    'monthly_total': P2PData.monthly_total,
+    'category_spend': P2PData.category_spend,
+    'buyer_spend': P2PData.buyer_spend,
+    'buyer_trend': P2PData.buyer_trend,
+    'lead_times': P2PData.lead_times,
+    'approval_times': P2PData.approval_times,
+    'po_approval': P2PData.po_approval,
+    'delivery': P2PData.delivery,
+    'budget_spend': P2PData.budget_spend,
+    'department_spend': P2PData.department_spend,
+    'savings': P2PData.savings,
+    'unit_rate_outliers': P2PData.unit_rate_outliers,
+}
+
+
+def run_report(data: P2PData, name: str, filters: dict | None = None, **params) -> pd.DataFrame:
+    if name not in REPORTS:
+        raise KeyError(f"Unknown report {name!r}; expected one of {sorted(REPORTS)}")
+    return REPORTS[name](data, filters, **params)
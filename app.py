@@ -8,24 +8,48 @@ from plotly.subplots import make_subplots
 import time
 import logging
 import traceback
-import re
+from convert_to_parquet import DATASET_DIR, MANIFEST_PATH, PARQUET_PATH, list_entities, load_p2p_frame
+from analytics import (
+    DASHBOARD_COLUMNS, FY, date_mask, delivery_by_po, distinct_join, fy_mask, monthly_spend, po_approval_lines,
+    savings_lines, spend_by, text_equals, text_values, unified_department, unit_rate_deviation,
+)
+from cube import MONTH_KEY, build_cube, cube_rows, distinct_count, month_aligned_range
+from filter_index import FilterIndex
+from search_index import SEARCH_FIELDS, SearchIndex
+from export import EXPORT_FORMATS, export_file
+from timing import DocumentTimings, percentile_table
+from table_window import PAGE_SIZES, page_count, sort_rows, window
+from memo_store import MemoStore
+from shared_frame import freeze, shared_nbytes
+from telemetry import TELEMETRY_PATH, RunTelemetry, describe_filters, filter_key, load_telemetry, result_rows, slowest_tabs
+from open_state import OPEN_STATE_PATH, document_ids, load_open_state, open_pr_mask, pending_po_mask
+from preprocessing import (
+    GOLD_PATH, HOT_CACHE_PATH, gold_path, load_gold_frame, preprocess, safe_col,
+)
+from vendor_dim import VendorDimension
+from vendor_match import accepted_aliases, load_match_table
+from vendor_master import VENDOR_MASTER_COLUMNS, load_vendor_master as read_vendor_master
 
 # ---------- CONFIG ----------
 # Set up a logger that works reliably with Streamlit
 logger = logging.getLogger(__name__)
 if not logger.handlers:
     logger.setLevel(logging.INFO)
-    handler = logging.FileHandler('app.log', mode='w')
+    handler = logging.FileHandler('app.log', mode='a')
     formatter = logging.Formatter('%(name)s - %(levelname)s - %(message)s')
     handler.setFormatter(formatter)
     logger.addHandler(handler)
 
+# Copy-on-write: column selections / derived frames share the cached frame's buffers
+# instead of copying them, and any write copies first (the cached frame is read-only)
+pd.set_option('mode.copy_on_write', True)
+
 DATA_DIR = Path(__file__).resolve().parent
 LOGO_PATH = DATA_DIR / "matter_logo.png"
-INDIRECT_BUYERS = {
-    'Aatish', 'Deepak', 'Deepakex', 'Dhruv', 'Dilip', 'Mukul', 'Nayan', 'Paurik',
-    'Kamlesh', 'Suresh', 'Priyam'
-}
+# Shared memo store for per-filter aggregates (all sessions, LRU within a byte budget)
+MEMO_MAX_BYTES = 256 * 1024 * 1024
+MEMO_TTL_SECONDS = 30 * 60
+
 
 st.set_page_config(page_title="P2P Dashboard — Indirect (Final)", layout="wide", initial_sidebar_state="expanded")
 
@@ -49,367 +73,226 @@ def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     df.columns = new
     return df
 
-def safe_col(df, candidates, default=None):
-    for c in candidates:
-        if c in df.columns:
-            return c
-    return default
+@st.cache_resource(show_spinner=False)
+def get_memo_store() -> MemoStore:
+    return MemoStore(MEMO_MAX_BYTES, ttl_seconds=MEMO_TTL_SECONDS)
 
 def memoized_compute(namespace: str, signature: tuple, compute_fn):
-    """Session-state memoization keyed by the active filter tuple."""
-    store = st.session_state.setdefault('_memo_cache', {})
-    key = (namespace, signature)
-    if key not in store:
-        store[key] = compute_fn()
-    return store[key]
-
-@st.cache_data
-def convert_df_to_csv(df):
-    return df.to_csv(index=False).encode('utf-8')
-
-def _resolve_path(fn: str) -> Path:
-    path = Path(fn)
-    if path.exists():
-        return path
-    candidate = DATA_DIR / fn
-    return candidate
-
-def _read_excel(path: Path, entity: str) -> pd.DataFrame:
-    # skiprows=1 was in original — preserve
-    df = pd.read_excel(path, skiprows=1)
-    df['entity_source_file'] = entity
-    return df
-
-def _finalize_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
-    if not frames:
-        return pd.DataFrame()
-    x = pd.concat(frames, ignore_index=True)
-    x = normalize_columns(x)
-    # parse common date columns once
-    for c in ['pr_date_submitted', 'po_create_date', 'po_delivery_date', 'po_approved_date']:
-        if c in x.columns:
-            x[c] = pd.to_datetime(x[c], errors='coerce')
-    return x
-
-@st.cache_data(show_spinner=False)
-def load_all():
-    """Loads and finalizes the dataset from the Parquet file."""
-    parquet_path = DATA_DIR / "p2p_data.parquet"
-    if not parquet_path.exists():
+    """Memoization keyed by the active filter tuple, shared across sessions (bounded LRU).
+    Results are shared: treat them as read-only. Timed per namespace with hit / miss."""
+    computed = []
+    def compute():
+        computed.append(True)
+        return compute_fn()
+    with perf.span('compute', namespace) as info:
+        result = get_memo_store().get_or_compute((namespace, signature), compute)
+        info['cache'] = 'miss' if computed else 'hit'
+        info['rows'] = result_rows(result)
+    return result
+
+def export_button(label: str, frame, file_stem: str, key: str):
+    """Download button with a format picker. The file is written (chunked, see export.py)
+    only when the button is clicked and is not kept in the Streamlit cache; `frame` may be
+    a zero-argument callable so the rows are selected on demand too."""
+    c1, c2 = st.columns([1, 3])
+    fmt = c1.selectbox('Format', list(EXPORT_FORMATS), key=f'{key}_fmt', label_visibility='collapsed')
+    ext, mime = EXPORT_FORMATS[fmt]
+    c2.download_button(label, lambda: export_file(frame, fmt), file_name=f'{file_stem}.{ext}', mime=mime,
+                       key=key, on_click='ignore')
+
+def show_table_window(frame: pd.DataFrame, rows: np.ndarray, key: str, default_order: str = 'Original order'):
+    """Paged table over `rows` (positions into `frame`): only the visible page is
+    materialized and sent to the browser. Sorting reads just the sort column."""
+    c1, c2, c3, c4 = st.columns([3, 1, 1, 1])
+    sort_col = c1.selectbox('Sort by', [default_order] + list(frame.columns), key=f'{key}_sort')
+    descending = c2.checkbox('Descending', key=f'{key}_desc')
+    page_size = c3.selectbox('Rows / page', PAGE_SIZES, index=1, key=f'{key}_size')
+    n_pages = page_count(len(rows), page_size)
+    # keyed on the row count so a new result set starts again at page 1
+    page = c4.number_input('Page', min_value=1, max_value=n_pages, value=1, step=1, key=f'{key}_page_{len(rows)}_{page_size}')
+    ordered = rows if sort_col == default_order else sort_rows(frame, rows, sort_col, ascending=not descending)
+    start = (page - 1) * page_size
+    st.caption(f"Rows {min(start + 1, len(rows)):,}–{min(start + page_size, len(rows)):,} of {len(rows):,} (page {page} of {n_pages})")
+    st.dataframe(window(frame, ordered, page, page_size), use_container_width=True)
+
+def _source_stamp() -> float:
+    """mtime of the current data source, so a (partial) refresh invalidates the load cache."""
+    if MANIFEST_PATH.exists():
+        return MANIFEST_PATH.stat().st_mtime
+    return PARQUET_PATH.stat().st_mtime if PARQUET_PATH.exists() else 0.0
+
+def load_all(source_stamp: float = 0.0, fy_key: str | None = None, entities: tuple | None = None):
+    """Loads the dashboard's columns for one FY / entity selection; both filters are pushed
+    into the Parquet reader so only matching partitions and row groups are decoded."""
+    if not DATASET_DIR.exists() and not PARQUET_PATH.exists():
         st.warning("Data file (p2p_data.parquet) not found. Please run the conversion script first.")
         return pd.DataFrame()
     
     try:
-        df = pd.read_parquet(parquet_path)
-        # Ensure date columns are parsed correctly after loading from Parquet
-        for c in ['pr_date_submitted', 'po_create_date', 'po_delivery_date', 'po_approved_date']:
-            if c in df.columns:
-                df[c] = pd.to_datetime(df[c], errors='coerce')
-        return df
+        start, end = FY[fy_key] if fy_key in FY else (None, None)
+        # Types come from the converter's schema; only files from older converters need casting
+        return load_p2p_frame(columns=DASHBOARD_COLUMNS, start=start, end=end, entities=entities)
     except Exception as e:
         st.error(f"Failed to load Parquet file: {e}")
         return pd.DataFrame()
 
+@st.cache_data(show_spinner=False)
+def gold_artifact(source_stamp: float = 0.0, gold_stamp: tuple = ()) -> str | None:
+    """Path of the preprocessed artifact built from the current source with the current
+    preprocessing: the memory-mapped p2p_gold.arrow, else p2p_gold.parquet (None = load live)."""
+    try:
+        path = gold_path()
+        return str(path) if path is not None else None
+    except Exception as e:
+        logger.error(f"Could not check preprocessed artifact: {e}")
+        return None
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_gold(source_stamp: float = 0.0, gold_stamp: tuple = (), fy_key: str | None = None, entities: tuple | None = None,
+              path: str | None = None):
+    """Loads the already-preprocessed frame (same projection / pushdown as load_all)."""
+    start, end = FY[fy_key] if fy_key in FY else (None, None)
+    return freeze(load_gold_frame(columns=DASHBOARD_COLUMNS, start=start, end=end, entities=entities,
+                                  path=Path(path) if path else GOLD_PATH))
+
+@st.cache_data(show_spinner=False)
+def load_entity_choices(source_stamp: float = 0.0) -> list:
+    try:
+        return list_entities()
+    except Exception as e:
+        logger.error(f"Could not list entities: {e}")
+        return []
+
 # ---------- Vendor Master Parsing (New) ----------
 @st.cache_data(show_spinner=False)
 def load_vendor_master():
     """
-    Parses 'meplvendor.xlsx', 'mlplvendor.xlsx', 'mmwvendor.xlsx', 'mmplvendor.xlsx' 
-    if present in DATA_DIR. Returns a unified DataFrame of vendor details.
-    Structure: Entity | VendorCode | VendorName | Address | Phone | Email | State | City
+    Unified vendor details (Entity | VendorCode | VendorName | Address | Phone | Email | State | City)
+    from the '<entity>vendor.xlsx' reports in DATA_DIR, served from vendor_master.parquet
+    unless a workbook changed.
     """
-    vendor_files = {
-        'MEPL': 'meplvendor.xlsx',
-        'MLPL': 'mlplvendor.xlsx',
-        'MMW':  'mmwvendor.xlsx',
-        'MMPL': 'mmplvendor.xlsx'
-    }
-    
-    records = []
-    
-    for entity, fname in vendor_files.items():
-        fpath = DATA_DIR / fname
-        if not fpath.exists():
-            continue
-            
-        try:
-            # Read headerless to parse semi-structured content
-            df = pd.read_excel(fpath, header=None)
-            
-            # Find all rows that start a vendor block (Col A == "Vendor account")
-            start_indices = df.index[df.iloc[:, 0].astype(str).str.strip() == 'Vendor account'].tolist()
-            
-            for start_idx in start_indices:
-                # Code
-                code = df.iloc[start_idx, 2] # Col C
-                
-                # Name (Row + 6)
-                name = None
-                if start_idx + 6 < len(df):
-                     val_g = str(df.iloc[start_idx + 6, 6]).strip() # Check label 'Vendor name'
-                     if val_g == 'Vendor name':
-                         name = df.iloc[start_idx + 6, 9] # Col I
-                
-                # Address (Row + 6)
-                address = None
-                if start_idx + 6 < len(df):
-                    val_a = str(df.iloc[start_idx + 6, 0]).strip()
-                    if val_a == 'Address':
-                        address = df.iloc[start_idx + 6, 2]
-
-                # Initialize other fields
-                phone = None
-                email = None
-                state = None
-                city = None
-                
-                # Scan next 40 rows for keywords in Col A
-                limit = min(start_idx + 40, len(df))
-                for r in range(start_idx, limit):
-                    label = str(df.iloc[r, 0]).strip()
-                    
-                    if label == 'Telephone':
-                        phone = df.iloc[r, 2]
-                    elif label == 'Email':
-                        email = df.iloc[r, 2]
-                    elif label == 'State':
-                        state = df.iloc[r, 2]
-                    
-                    # Stop if we hit next block
-                    if r > start_idx and label == 'Vendor account':
-                        break
-                
-                # Heuristic to parse City from Address if possible
-                # Pattern: "City -Zip" (e.g., "Noida -201301")
-                if address:
-                    # Look for lines containing " -<digits>"
-                    # or lines before state/country codes.
-                    # Simple Regex approach:
-                    # Matches "Word -123456" but ensures no newlines in the captured group
-                    match = re.search(r'(?:^|\n)([^\n]+?)\s*-\s*\d{6}', str(address))
-                    if match:
-                        city = match.group(1).strip()
-                    else:
-                        # Fallback: sometimes it is "City-Zip" without space
-                         match2 = re.search(r'(?:^|\n)([^\n]+?)-\d{6}', str(address))
-                         if match2:
-                             city = match2.group(1).strip()
-                
-                records.append({
-                    'Entity': entity,
-                    'VendorCode': str(code).strip(),
-                    'VendorName': str(name).strip() if name else None,
-                    'Address': str(address).strip() if address else None,
-                    'Phone': str(phone).strip() if phone else None,
-                    'Email': str(email).strip() if email else None,
-                    'State': str(state).strip() if state else None,
-                    'City': str(city).strip() if city else None
-                })
-
-        except Exception as e:
-            logger.error(f"Error parsing vendor file {fname}: {e}")
-            
-    if records:
-        v_df = pd.DataFrame(records)
-        # Normalize name for matching
-        v_df['VendorName_Norm'] = v_df['VendorName'].astype(str).str.lower().str.strip()
-        return v_df
-    
-    return pd.DataFrame(columns=['Entity', 'VendorCode', 'VendorName', 'Address', 'Phone', 'Email', 'State', 'City', 'VendorName_Norm'])
-
-# ---------- Fast type/coercion utilities ----------
-
-def to_cat(df, col):
-    if col in df.columns:
-        df[col] = df[col].astype('category')
-
-# ---------- Domain-specific vectorized helpers ----------
-
-def compute_buyer_type_vectorized(df: pd.DataFrame) -> pd.Series:
-    """Classify PRs into Direct/Indirect using Buyer Group + numeric code (vectorized)."""
-    if df.empty:
-        return pd.Series(dtype=object)
-    group_col = safe_col(df, ['buyer_group', 'Buyer Group', 'buyer group'])
-    if not group_col:  # default to Indirect if missing
-        return pd.Series('Indirect', index=df.index, dtype=object)
-
-    bg_raw = df[group_col].fillna('').astype(str).str.strip()
-    # extract numeric code
-    code_series = pd.to_numeric(bg_raw.str.extract(r'(\d+)')[0], errors='coerce')
-
-    buyer_type = pd.Series('Direct', index=df.index, dtype=object)
-    alias_direct = bg_raw.str.upper().isin({'ME_BG17', 'MLBG16'})
-    buyer_type[alias_direct] = 'Direct'
-
-    not_available = bg_raw.eq('') | bg_raw.str.lower().isin(['not available', 'na', 'n/a'])
-    buyer_type[not_available] = 'Indirect'
-
-    # vectorized ranges
-    buyer_type[(code_series >= 1) & (code_series <= 9)] = 'Direct'
-    buyer_type[(code_series >= 10) & (code_series <= 18)] = 'Indirect'
-    buyer_type = buyer_type.fillna('Direct')
-    return buyer_type
-
-def compute_buyer_display(df: pd.DataFrame, purchase_doc_col: str | None, requester_col: str | None) -> pd.Series:
-    if df.empty:
-        return pd.Series(dtype=object)
-    po_creator = df.get('po_creator', pd.Series('', index=df.index)).fillna('').astype(str).str.strip()
-    requester = df.get(requester_col, pd.Series('', index=df.index)).fillna('').astype(str).str.strip() if requester_col else pd.Series('', index=df.index)
-
-    has_po = pd.Series(False, index=df.index)
-    if purchase_doc_col and purchase_doc_col in df.columns:
-        has_po = df[purchase_doc_col].fillna('').astype(str).str.strip() != ''
-
-    # choose in vectorized manner with np.select
-    conditions = [
-        has_po & (po_creator != ''),
-        (po_creator == '') & (requester != '')
-    ]
-    choices = [
-        po_creator,
-        requester
-    ]
-    buyer_display = np.select(conditions, choices, default='PR only - Unassigned')
-    return pd.Series(buyer_display, index=df.index, dtype=object)
-
-def compute_item_type_vectorized(df: pd.DataFrame) -> pd.Series:
-    """Classifies items into 'Products' or 'Services' based on Category, Item Code, and Description."""
-    if df.empty:
-        return pd.Series(dtype=object)
-    
-    # 1. Explicit Service Categories
-    service_cats = {
-        'Service', 'Testing Services', 'IT Services', 'Recruitment', 'Repair & Maintenance', 
-        'Plant Consultancy Services', 'Repairs and Maint.- Vehicle', 'Advertisement And Agency Cost', 
-        'Customer Support Cost', 'Staff Welfare Cost', 'Electric Installation', 'Consulting Services', 
-        'Office Maintenance', 'Insurance Expense', 'Legal and professional', 'Software License', 
-        'SOFTWARE', 'Marketing', 'Network', 'Plant Maintenance', 'Transport'
+    try:
+        return read_vendor_master()
+    except Exception as e:
+        logger.error(f"Error loading vendor master: {e}")
+        return pd.DataFrame(columns=VENDOR_MASTER_COLUMNS)
+
+@st.cache_resource(show_spinner=False)
+def get_vendor_dim() -> VendorDimension:
+    """Vendor dimension (normalized name -> vendor_id -> contact / geo attributes), built once.
+    PO vendor spellings resolved by the persisted fuzzy match table map to the same vendor; the
+    table is built offline (convert_to_parquet.py / vendor_match.py), without it names match exactly."""
+    vendor_master = load_vendor_master()
+    try:
+        matches = load_match_table()
+        if matches.empty and not vendor_master.empty:
+            logger.info("Vendor match table missing or stale; using exact vendor names (run vendor_match.py)")
+        aliases = accepted_aliases(matches)
+    except Exception as e:
+        logger.error(f"Could not load vendor match table: {e}")
+        aliases = {}
+    return VendorDimension(vendor_master, aliases)
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_preprocessed(source_stamp: float = 0.0, fy_key: str | None = None, entities: tuple | None = None):
+    """Live path (gold artifact missing or stale): load + preprocess as one cached step, so
+    only the preprocessed frame is kept, once for every session."""
+    return freeze(preprocess(load_all(source_stamp, fy_key, entities)))
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_filter_index(_df: pd.DataFrame, cache_key: tuple = ()) -> FilterIndex:
+    """Value -> row postings for the sidebar filters, built once per loaded frame (see cache_key)."""
+    return FilterIndex(_df)
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_search_index(_df: pd.DataFrame, cache_key: tuple = (), columns: tuple = SEARCH_FIELDS) -> SearchIndex:
+    """Trigram index over the free-text fields, shared by Search and the Vendors reverse lookup."""
+    return SearchIndex(_df, columns)
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_open_masks(_df: pd.DataFrame, cache_key: tuple = (), status_col: str | None = None,
+                   approved_col: str | None = None) -> dict:
+    """Positional masks of the open-PR and unapproved-PO rows of the loaded frame (see cache_key),
+    so the Open PRs and pending-approval views only ever materialize those rows."""
+    return {
+        'open_pr': open_pr_mask(_df, status_col) if status_col else np.zeros(len(_df), dtype=bool),
+        'pending_po': pending_po_mask(_df, approved_col),
     }
-    
-    # 2. Prepare columns
-    cat_col = df.get('procurement_category', pd.Series('', index=df.index)).astype(str).fillna('')
-    code_col = df.get('item_code', pd.Series('', index=df.index)).astype(str).fillna('').str.upper()
-    prod_col = df.get('product_name', pd.Series('', index=df.index)).astype(str).fillna('').str.upper()
-    desc_col = df.get('item_description', pd.Series('', index=df.index)).astype(str).fillna('').str.upper()
-    
-    # 3. Vectorized Masks
-    mask_cat = cat_col.isin(service_cats)
-    
-    # Item Code Patterns: SER_, LBR_
-    mask_code = code_col.str.startswith('SER') | code_col.str.startswith('LBR')
-    
-    # Keywords in Product/Description
-    # Regex for distinct keywords to avoid partial matches like "Serviceable" (though likely safe)
-    service_keywords = r'\b(AMC|ANNUAL MAINTENANCE|SERVICE|FEE|CHARGES|CONSULTANCY|LABOUR|INSTALLATION|FREIGHT|TRANSPORT|SUBSCRIPTION|WARRANTY)\b'
-    mask_desc = prod_col.str.contains(service_keywords, regex=True) | desc_col.str.contains(service_keywords, regex=True)
-    
-    # 4. Final Logic: Any positive signal -> Service
-    is_service = mask_cat | mask_code | mask_desc
-    
-    return np.where(is_service, 'Services', 'Products')
 
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_document_index(_df: pd.DataFrame, cache_key: tuple = (), pr_key: str | None = None,
+                       po_key: str | None = None) -> FilterIndex:
+    """Document id ('<entity>|<key>', see open_state.document_ids) -> row postings of the loaded
+    frame (see cache_key), so the documents listed in the open-state table are found without a scan."""
+    ids = {kind: document_ids(_df['entity'], _df[col]).to_numpy() for kind, col in (('PR', pr_key), ('PO', po_key))
+           if col and col in _df.columns and 'entity' in _df.columns}
+    return FilterIndex(pd.DataFrame(ids), columns=tuple(ids))
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_document_timings(_df: pd.DataFrame, cache_key: tuple = (), pr_key: str | None = None, pr_date: str | None = None,
+                         po_key: str | None = None, po_create: str | None = None, po_approved: str | None = None,
+                         po_delivery: str | None = None) -> DocumentTimings:
+    """Per-PR / per-PO timing table of the loaded frame (see cache_key); filters select documents by row."""
+    return DocumentTimings(_df, pr_key, pr_date, po_key, po_create, po_approved, po_delivery)
 
 @st.cache_data(show_spinner=False)
-def preprocess_data(_df: pd.DataFrame) -> pd.DataFrame:
-    """Applies all expensive preprocessing steps to the raw dataframe."""
-    if _df.empty:
-        return _df
-    df = _df.copy()
-
-    # ensure entity
-    entity_col = safe_col(df, ['entity','company','brand','entity_name'])
-    if entity_col and entity_col in df.columns:
-        df['entity'] = df[entity_col].fillna('').astype(str).str.strip()
-    else:
-        df['entity'] = df.get('entity_source_file', '').fillna('').astype(str)
-
-    # defensive default columns
-    pr_budget_desc_col = safe_col(df, ['pr_budget_description', 'pr budget description', 'pr_budget_desc', 'pr budget description'])
-    pr_budget_code_col = safe_col(df, ['pr_budget_code', 'pr budget code', 'pr_budgetcode'])
-    po_budget_desc_col = safe_col(df, ['po_budget_description', 'po budget description', 'po_budget_desc'])
-    po_budget_code_col = safe_col(df, ['po_budget_code', 'po budget code', 'po_budgetcode'])
-    pr_bu_col = safe_col(df, ['pr_bussiness_unit','pr_business_unit','pr business unit','pr_bu','pr bussiness unit','pr business unit'])
-    po_bu_col = safe_col(df, ['po_bussiness_unit','po_business_unit','po business unit','po_bu','po bussiness unit','po business unit'])
-    for c in [pr_budget_desc_col, pr_budget_code_col, po_budget_desc_col, po_budget_code_col, pr_bu_col, po_bu_col]:
-        if c and c not in df.columns:
-            df[c] = ''
-
-    # buyer group code extraction (fast)
-    if 'buyer_group' in df.columns:
-        try:
-            df['buyer_group_code'] = pd.to_numeric(df['buyer_group'].astype(str).str.extract('([0-9]+)')[0], errors='coerce')
-        except Exception:
-            df['buyer_group_code'] = np.nan
-
-    # Buyer.Type
-    if 'Buyer.Type' not in df.columns:
-        df['Buyer.Type'] = compute_buyer_type_vectorized(df)
-    df['Buyer.Type'] = df['Buyer.Type'].fillna('Direct').astype(str).str.strip().str.title()
-
-    # normalize po_creator using mapping
-    o_created_by_map = {
-        'MMW2324030': 'Dhruv', 'MMW2324062': 'Deepak', 'MMW2425154': 'Mukul', 'MMW2223104': 'Paurik',
-        'MMW2021181': 'Nayan', 'MMW2223014': 'Aatish', 'MMW_EXT_002': 'Deepakex', 'MMW2425024': 'Kamlesh',
-        'MMW2021184': 'Suresh', 'N/A': 'Dilip', 'MMW2526019': 'Vraj', 'MMW2223240': 'Vatsal',
-        'MMW2223219': '', 'MMW2021115': 'Priyam', 'MMW2425031': 'Preet', 'MMW222360IN': 'Ayush',
-        'MMW2425132': 'Prateek.B', 'MMW2425025': 'Jaymin', 'MMW2425092': 'Suresh', 'MMW252617IN': 'Akaash',
-        'MMW1920052': 'Nirmal', '2425036': '', 'MMW222355IN': 'Jaymin', 'MMW2324060': 'Chetan',
-        'MMW222347IN': 'Vaibhav', 'MMW2425011': '', 'MMW1920036': 'Ankit', 'MMW2425143': 'Prateek.K',
-        '2425027': '', 'MMW2223017': 'Umesh', 'MMW2021214': 'Raunak', 'Intechuser1': 'Intesh Data'
-    }
-    upper_map = {k.upper(): v for k, v in o_created_by_map.items()}
-    po_orderer_col = safe_col(df, ['po_orderer', 'po orderer', 'po_orderer_code'])
-    df['po_orderer'] = df[po_orderer_col].fillna('N/A').astype(str).str.strip() if po_orderer_col in df.columns else 'N/A'
-    
-    # Optimized po_creator mapping
-    df['po_creator'] = df['po_orderer'].str.upper().map(upper_map).fillna(df['po_orderer'])
-    # Robust Dilip mapping (handle nan/null strings case-insensitive)
-    df['po_creator'] = df['po_creator'].fillna('Dilip').astype(str)
-    mask_dilip = df['po_creator'].str.strip().str.lower().isin(['nan', 'n/a', 'na', '', 'none', 'null'])
-    df.loc[mask_dilip, 'po_creator'] = 'Dilip'
-
-    # po_buyer_type
-    creator_clean = df['po_creator'].fillna('').astype(str).str.strip()
-    df['po_buyer_type'] = np.where(creator_clean.isin(INDIRECT_BUYERS), 'Indirect', 'Direct')
-
-    # Fix: Vraj should be considered Direct even if touching Indirect buyer groups
-    df.loc[df['po_creator'] == 'Vraj', 'Buyer.Type'] = 'Direct'
-
-    # pr_requester column detection and buyer_display
-    purchase_doc_col = safe_col(df, ['purchase_doc', 'purchase_doc_number', 'purchase doc'])
-    pr_requester_col = safe_col(df, ['pr_requester','requester','pr_requester_name','pr_requester_name','requester_name'])
-    df['buyer_display'] = compute_buyer_display(df, purchase_doc_col, pr_requester_col)
-
-    # Convert common columns to categorical to speed groupbys & joins
-    po_vendor_col = safe_col(df, ['po_vendor', 'vendor', 'po vendor'])
-    df['po_vendor'] = df[po_vendor_col].fillna('').astype(str) if po_vendor_col in df.columns else ''
-    df['product_name'] = df['product_name'].fillna('').astype(str) if 'product_name' in df.columns else ''
-    
-    # Ensure purchase_doc is categorical to speed up groupby in Delivery tab
-    if purchase_doc_col and purchase_doc_col in df.columns:
-        to_cat(df, purchase_doc_col)
+def load_open_state_table(state_stamp: float = 0.0) -> pd.DataFrame:
+    """Persisted open PR / pending PO state (open_state.py), refreshed with each incremental conversion."""
+    try:
+        return load_open_state()
+    except Exception as e:
+        logger.error(f"Could not read open state: {e}")
+        return pd.DataFrame()
 
-    # Compute Item.Type
-    df['Item.Type'] = compute_item_type_vectorized(df)
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_spend_cube(_df: pd.DataFrame, cache_key: tuple = (), amount_col: str = '', month_col: str | None = None,
+                   basis_col: str | None = None, po_col: str | None = None, pr_col: str | None = None) -> pd.DataFrame:
+    """Monthly spend cube over the loaded FY rows (see cache_key); built once, rolled up per rerun."""
+    return build_cube(_df, amount_col, month_col, basis_col, po_col=po_col, pr_col=pr_col)
 
-    for c in ['entity', 'po_creator', 'buyer_display', po_vendor_col, 'Buyer.Type', 'procurement_category', 'product_name', 'Item.Type']:
-        to_cat(df, c)
-        
-    return df
+# Timings of this run (stages, memoized computes, tab body, figures), see telemetry.py
+perf = RunTelemetry()
+
+# ---------- Load-time filters (pushed down into the Parquet reader) ----------
+if LOGO_PATH.exists():
+    st.sidebar.image(str(LOGO_PATH), use_column_width=True)
+st.sidebar.header('Filters')
+
+fy_key = st.sidebar.selectbox('Financial Year', list(FY))
+pr_start, pr_end = FY[fy_key]
+date_range_slot = st.sidebar.container()  # filled once the data is loaded
+
+source_stamp = _source_stamp()
+entity_choices = load_entity_choices(source_stamp)
+sel_e = st.sidebar.multiselect('Entity', entity_choices, default=entity_choices)
+load_entities = tuple(sel_e) if sel_e and len(sel_e) < len(entity_choices) else None
 
 # ---------- Load & preprocess ----------
 logger.info("Starting data loading...")
 load_start_time = time.time()
-df_raw = load_all()
+# both artifacts' mtimes: rebuilding or deleting either one re-resolves and reloads
+gold_stamp = tuple(p.stat().st_mtime if p.exists() else 0.0 for p in (GOLD_PATH, HOT_CACHE_PATH))
+gold_file = gold_artifact(source_stamp, gold_stamp)
+use_gold = gold_file is not None
+if use_gold:
+    df = load_gold(source_stamp, gold_stamp, fy_key, load_entities, gold_file)
 vendor_master = load_vendor_master() # Load vendor details
+vendor_dim = get_vendor_dim()
 load_end_time = time.time()
 logger.info(f"Data loading took: {load_end_time - load_start_time:.2f} seconds")
+perf.record('stage', 'load', load_end_time - load_start_time, cache=Path(gold_file).suffix.lstrip('.') if use_gold else 'live',
+            rows=len(df) if use_gold else None)
 
 logger.info("Starting data preprocessing...")
 preprocess_start_time = time.time()
-df = preprocess_data(df_raw)
+if use_gold:
+    logger.info(f"Using preprocessed artifact ({Path(gold_file).name})")
+else:
+    logger.info("Preprocessed artifact missing or stale; loading and preprocessing live")
+    df = load_preprocessed(source_stamp, fy_key, load_entities)
 preprocess_end_time = time.time()
 logger.info(f"Data preprocessing took: {preprocess_end_time - preprocess_start_time:.2f} seconds")
+perf.record('stage', 'preprocess', preprocess_end_time - preprocess_start_time, rows=len(df))
 
 
 if df.empty:
@@ -435,105 +318,85 @@ po_budget_desc_col = safe_col(df, ['po_budget_description', 'po budget descripti
 pr_bu_col = safe_col(df, ['pr_bussiness_unit','pr_business_unit','pr business unit','pr_bu','pr bussiness unit','pr business unit'])
 po_bu_col = safe_col(df, ['po_bussiness_unit','po_business_unit','po business unit','po_bu','po bussiness unit','po business unit'])
 entity_col = safe_col(df, ['entity','company','brand','entity_name'])
+search_fields = tuple(c for c in [pr_number_col, purchase_doc_col, 'product_name', po_vendor_col, 'item_description'] if c)
 pr_requester_col = safe_col(df, ['pr_requester','requester','pr_requester_name','pr_requester_name','requester_name'])
 
 # ----------------- Sidebar filters -----------------
+# data_version first: the memo store outlives a data refresh and is shared across sessions
+data_version = (source_stamp, gold_stamp, use_gold)
 logger.info("Applying filters...")
 filter_start_time = time.time()
-if LOGO_PATH.exists():
-    st.sidebar.image(str(LOGO_PATH), use_column_width=True)
-st.sidebar.header('Filters')
-
-FY = {
-    'All Years': (pd.Timestamp('2023-04-01'), pd.Timestamp('2026-03-31')),
-    '2023': (pd.Timestamp('2023-04-01'), pd.Timestamp('2024-03-31')),
-    '2024': (pd.Timestamp('2024-04-01'), pd.Timestamp('2025-03-31')),
-    '2025': (pd.Timestamp('2025-04-01'), pd.Timestamp('2026-03-31'))
-}
-fy_key = st.sidebar.selectbox('Financial Year', list(FY))
-pr_start, pr_end = FY[fy_key]
 
-# Work on a filtered view (avoid copies until necessary)
-fil = df
+# Row masks over `df` (positional); the frame is sliced once, after every filter is combined
 # FY Filtering Logic: Use PR Date if available; fallback to PO Create Date for rows where PR Date is missing
-if pr_col and pr_col in fil.columns:
-    # Use PR date primarily, backfill with PO date for filtering check
-    d_check = fil[pr_col]
-    if po_create_col and po_create_col in fil.columns:
-        d_check = d_check.fillna(fil[po_create_col])
-    fil = fil[(d_check >= pr_start) & (d_check <= pr_end)]
-elif po_create_col and po_create_col in fil.columns:
-    # Fallback if PR column completely missing
-    fil = fil[(fil[po_create_col] >= pr_start) & (fil[po_create_col] <= pr_end)]
+row_mask = fy_mask(df, pr_col, po_create_col, pr_start, pr_end)
+
+fy_row_mask = row_mask.copy()  # the spend cube is built over the FY rows
 
 # Date range filter
-date_basis = pr_col if pr_col in fil.columns else (po_create_col if po_create_col in fil.columns else None)
+date_basis = pr_col if pr_col in df.columns else (po_create_col if po_create_col in df.columns else None)
 dr = None
 date_range_key = None
+cube_basis_range = None
 if date_basis:
     # compute min/max without copying
-    mindt = fil[date_basis].dropna().min()
-    maxdt = fil[date_basis].dropna().max()
+    basis_in_fy = df[date_basis][row_mask]
+    mindt = basis_in_fy.min()
+    maxdt = basis_in_fy.max()
     if pd.notna(mindt) and pd.notna(maxdt):
-        dr = st.sidebar.date_input('Date range', (mindt.date(), maxdt.date()), key='date_range')
+        dr = date_range_slot.date_input('Date range', (mindt.date(), maxdt.date()), key='date_range')
         if isinstance(dr, tuple) and len(dr) == 2:
             sdt = pd.to_datetime(dr[0]); edt = pd.to_datetime(dr[1]) + pd.Timedelta(hours=23, minutes=59, seconds=59)
-            fil = fil[(fil[date_basis] >= sdt) & (fil[date_basis] <= edt)]
+            row_mask &= date_mask(df, date_basis, dr[0], dr[1])
             date_range_key = (sdt.isoformat(), edt.isoformat())
+            cube_basis_range = month_aligned_range(sdt, edt, mindt, maxdt)
 
 # ensure defensive columns exist without expensive operations
-for c in ['Buyer.Type', 'po_creator', 'po_vendor', 'entity', 'po_buyer_type']:
-    if c not in fil.columns:
-        fil[c] = ''
-
-# Ensure PR-level Buyer.Type is tidy (reuse compute only if missing)
-if 'Buyer.Type' not in fil.columns:
-    fil['Buyer.Type'] = compute_buyer_type_vectorized(fil)
-fil['Buyer.Type'] = fil['Buyer.Type'].fillna('Direct').astype(str).str.strip().str.title()
-fil.loc[fil['Buyer.Type'].str.lower().isin(['direct', 'd']), 'Buyer.Type'] = 'Direct'
-fil.loc[fil['Buyer.Type'].str.lower().isin(['indirect', 'i', 'in']), 'Buyer.Type'] = 'Indirect'
-fil.loc[~fil['Buyer.Type'].isin(['Direct', 'Indirect']), 'Buyer.Type'] = 'Direct'
+missing_cols = [c for c in ['Buyer.Type', 'po_creator', 'po_vendor', 'entity', 'po_buyer_type'] if c not in df.columns]
+if missing_cols:
+    df = df.assign(**{c: ('Direct' if c == 'Buyer.Type' else '') for c in missing_cols})
 
+# Buyer.Type is canonicalised (Direct / Indirect) during preprocessing
+filter_index = get_filter_index(df, (data_version, fy_key, load_entities))
 
+def _choices(col):
+    return sorted(str(x) for x in filter_index.values_in(col, row_mask) if str(x).strip())
 
-# Entity + PO ordered by filters (use categories for speed)
-entity_choices = sorted([e for e in fil['entity'].cat.categories.tolist() if str(e).strip() != '']) if 'entity' in fil.columns and fil['entity'].dtype.name=='category' else sorted([e for e in fil['entity'].dropna().unique().tolist() if str(e).strip() != ''])
-sel_e = st.sidebar.multiselect('Entity', entity_choices, default=entity_choices)
-
+# Entity was chosen before loading (pushed into the reader); the index below keeps it exact
 # Procurement Category filter
-if 'procurement_category' in fil.columns:
-    proc_cat_choices = sorted([str(x) for x in fil['procurement_category'].dropna().unique() if str(x).strip()])
+if 'procurement_category' in df.columns:
+    proc_cat_choices = _choices('procurement_category')
     sel_pc = st.sidebar.multiselect('Procurement Category', proc_cat_choices, default=proc_cat_choices)
 else:
     sel_pc = []
     proc_cat_choices = []
 
 # PO Ordered By
-creators = sorted([str(x) for x in fil.get('po_creator', pd.Series(dtype=object)).dropna().unique().tolist() if str(x).strip()!=''])
+creators = _choices('po_creator')
 # Optimization: remove default=creators to speed up loading
 sel_o = st.sidebar.multiselect('PO Ordered By', creators) 
 
 # Buyer Type choices
-choices_bt = sorted(fil['Buyer.Type'].dropna().unique().tolist())
+choices_bt = sorted(filter_index.values_in('Buyer.Type', row_mask))
 sel_b = st.sidebar.multiselect('Buyer Type', choices_bt, default=choices_bt)
 
 # Item Type Filter (Products vs Services)
 item_type_opt = st.sidebar.radio("Item Type (Global)", ["All", "Products", "Services"], index=0)
 
 # Vendor + Item filters
-if po_vendor_col and po_vendor_col in fil.columns:
-    if pd.api.types.is_categorical_dtype(fil[po_vendor_col]):
-        vendor_choices = sorted(fil[po_vendor_col].cat.categories)
+if po_vendor_col and po_vendor_col in df.columns:
+    if pd.api.types.is_categorical_dtype(df[po_vendor_col]):
+        vendor_choices = sorted(df[po_vendor_col].cat.categories)
     else:
-        vendor_choices = sorted(fil[po_vendor_col].unique())
+        vendor_choices = sorted(filter_index.values_in(po_vendor_col, row_mask))
     # Optimization: remove default=vendor_choices to speed up loading (no serialization of 1000 items)
     sel_v = st.sidebar.multiselect('Vendor (pick one or more)', vendor_choices) # default is None
 else:
     sel_v = []
     vendor_choices = []
 
-if 'product_name' in fil.columns:
-    item_choices = sorted(fil['product_name'].unique())
+if 'product_name' in df.columns:
+    item_choices = sorted(filter_index.values_in('product_name', row_mask))
     # Optimization: remove default=item_choices
     sel_i = st.sidebar.multiselect('Item / Product (pick one or more)', item_choices) # default is None
 else:
@@ -541,49 +404,121 @@ else:
     item_choices = []
 
 
-# Apply filters using df.query() for potential performance improvement
-query_parts = []
-if sel_b and len(sel_b) < len(choices_bt):
-    query_parts.append('`Buyer.Type` in @sel_b')
-if sel_e and 'entity' in fil.columns and len(sel_e) < len(entity_choices):
-    query_parts.append('entity in @sel_e')
-if sel_pc and len(sel_pc) < len(proc_cat_choices):
-    query_parts.append('procurement_category in @sel_pc')
-
-if sel_o and len(sel_o) < len(creators):
-    query_parts.append('po_creator in @sel_o')
-
-if sel_v and len(sel_v) < len(vendor_choices):
-    query_parts.append('po_vendor in @sel_v')
-
-if sel_i and len(sel_i) < len(item_choices):
-    query_parts.append('product_name in @sel_i')
-
-if query_parts:
-    fil = fil.query(' & '.join(query_parts))
-
-# Apply Item Type Filter (Products vs Services)
-if item_type_opt != "All" and 'Item.Type' in fil.columns:
-    fil = fil[fil['Item.Type'] == item_type_opt]
+def _subset(selected, choices):
+    """Selection to apply, or None when the whole dimension is selected (no-op)."""
+    return selected if selected and len(selected) < len(choices) else None
+
+# Base mask (FY + date range) is kept apart: some tabs re-filter with only part of the sidebar
+base_row_mask = row_mask
+sidebar_selections = {
+    'Buyer.Type': _subset(sel_b, choices_bt),
+    'entity': _subset(sel_e, entity_choices),
+    'procurement_category': _subset(sel_pc, proc_cat_choices),
+    'po_creator': _subset(sel_o, creators),
+    'po_vendor': _subset(sel_v, vendor_choices),
+    'product_name': _subset(sel_i, item_choices),
+    # Item Type Filter (Products vs Services)
+    'Item.Type': [item_type_opt] if item_type_opt != "All" else None,
+}
+row_mask = filter_index.select(sidebar_selections, base=base_row_mask)
+# `df` is the shared cached frame and `fil` may be `df` itself: both are read-only. Derived
+# per-request columns go into `overlay` (same index as `fil`); `view()` joins the two.
+fil = df if row_mask.all() else df[row_mask]
 
 filter_end_time = time.time()
 logger.info(f"Filter application took: {filter_end_time - filter_start_time:.2f} seconds")
+perf.record('stage', 'filter', filter_end_time - filter_start_time, rows=len(fil))
 
 
 # Helper to create deterministic signature for caching
 def _sel_key(values):
     return tuple(sorted(str(v) for v in values)) if values else ()
 filter_signature = (
-    fy_key, date_range_key, _sel_key(sel_b), _sel_key(sel_e), _sel_key(sel_pc),
+    data_version, fy_key, date_range_key, _sel_key(sel_b), _sel_key(sel_e), _sel_key(sel_pc),
     _sel_key(sel_o), _sel_key(sel_v), _sel_key(sel_i), item_type_opt
 )
+perf.filter_key = filter_key(filter_signature)
 
 # Precompute month bucket once
 trend_date_col = po_create_col if (po_create_col and po_create_col in fil.columns) else (pr_col if (pr_col and pr_col in fil.columns) else None)
+overlay = pd.DataFrame(index=fil.index)
 if trend_date_col:
-    fil['_month_bucket'] = fil[trend_date_col].dt.to_period('M').dt.to_timestamp()
+    overlay['_month_bucket'] = fil[trend_date_col].dt.to_period('M').dt.to_timestamp()
 else:
-    fil['_month_bucket'] = pd.NaT
+    overlay['_month_bucket'] = pd.NaT
+
+def view(columns) -> pd.DataFrame:
+    """New frame with just `columns` of the filtered rows, taken from `fil` or `overlay`."""
+    columns = list(dict.fromkeys(c for c in columns if c))
+    base = [c for c in columns if c in fil.columns and c not in overlay.columns]
+    extra = [c for c in columns if c in overlay.columns]
+    if not extra:
+        return fil[base]  # copy-on-write: shares fil's columns until written to
+    return pd.concat([fil[base], overlay[extra]], axis=1)[base + extra]
+
+def load_spend_cube() -> pd.DataFrame:
+    fy_rows = df if fy_row_mask.all() else df[fy_row_mask]
+    return get_spend_cube(fy_rows, (data_version, fy_key, load_entities), net_amount_col, trend_date_col,
+                          date_basis, purchase_doc_col, pr_number_col)
+
+# The spend cube answers any combination of the sidebar filters except Item / Product and
+# day-level (not month-aligned) date ranges; those fall back to the line items.
+cube_answerable = bool(net_amount_col and net_amount_col in df.columns) \
+    and sidebar_selections['product_name'] is None and (date_range_key is None or cube_basis_range is not None)
+
+def spend_rows(columns) -> pd.DataFrame:
+    """Rows to sum `net_amount_col` over for `columns` (may include '_month_bucket'):
+    rolled-up cube rows when the cube can answer the current filters, else line items."""
+    columns = list(dict.fromkeys(c for c in columns if c and c != net_amount_col))
+    if not cube_answerable:
+        return view(columns + [net_amount_col])
+    rows = cube_rows(load_spend_cube(), sidebar_selections, cube_basis_range if date_range_key else None)
+    return rows[columns + [net_amount_col]]
+
+def open_masks() -> dict:
+    """Open-PR / unapproved-PO row masks of the loaded frame (AND with row_mask for the filters)."""
+    return get_open_masks(df, (data_version, fy_key, load_entities),
+                          safe_col(df, ['pr_status', 'pr status', 'status', 'prstatus']),
+                          safe_col(df, ['po_approved_date', 'po approved date']))
+
+def current_open_state() -> pd.DataFrame:
+    """Persisted open PR / pending PO state when it is at least as new as the source data; empty
+    otherwise, and the views fall back to the status / approval-date masks of the loaded frame."""
+    state_stamp = OPEN_STATE_PATH.stat().st_mtime if OPEN_STATE_PATH.exists() else 0.0
+    if state_stamp < source_stamp:
+        return pd.DataFrame()
+    return load_open_state_table(state_stamp)
+
+def open_document_rows(kind: str, state: pd.DataFrame) -> np.ndarray:
+    """Rows of the open PRs (kind 'PR') or unapproved POs ('PO'): the lines of the documents in the
+    state table when there is one, else the full-frame masks (AND with row_mask for the filters)."""
+    index = get_document_index(df, (data_version, fy_key, load_entities), pr_number_col, purchase_doc_col)
+    status_col = safe_col(df, ['pr_status', 'pr status', 'status', 'prstatus'])
+    approved_col = safe_col(df, ['po_approved_date', 'po approved date'])
+    if state.empty or kind not in index or (kind == 'PR' and not status_col):
+        return open_masks()['open_pr' if kind == 'PR' else 'pending_po']
+    docs = state[state['kind'] == kind]
+    rows = np.flatnonzero(index.mask(kind, document_ids(docs['entity'], docs['key'])))
+    # a document can have closed / approved lines too: test only the looked-up lines
+    if kind == 'PR':
+        keep = open_pr_mask(df[[status_col]].iloc[rows], status_col)
+    else:
+        keep = pending_po_mask(df[[approved_col]].iloc[rows] if approved_col else df.iloc[rows, :0], approved_col)
+    out = np.zeros(len(df), dtype=bool)
+    out[rows[keep]] = True
+    return out
+
+def state_ages(state: pd.DataFrame, kind: str, entities: pd.Series, keys: pd.Series) -> pd.DataFrame:
+    """Document date, age in days and first-seen-open time of (entity, key) documents from the state table."""
+    docs = state[state['kind'] == kind].set_index(['entity', 'key'])
+    out = docs[['doc_date', 'opened_at']].reindex(pd.MultiIndex.from_arrays([entities.astype(str), keys.astype(str)]))
+    out['age_days'] = (pd.to_datetime(pd.Timestamp.today().date()) - pd.to_datetime(out['doc_date'])).dt.days
+    return out.reset_index(drop=True)
+
+def document_timings() -> DocumentTimings:
+    return get_document_timings(df, (data_version, fy_key, load_entities), pr_number_col, pr_col, purchase_doc_col,
+                                po_create_col, safe_col(df, ['po_approved_date', 'po approved date']),
+                                safe_col(df, ['po_delivery_date', 'po delivery date']))
 
 if st.sidebar.button('Reset Filters'):
     for k in list(st.session_state.keys()):
@@ -592,22 +527,38 @@ if st.sidebar.button('Reset Filters'):
         except Exception:
             pass
     st.rerun()
+show_perf = st.sidebar.toggle('Performance panel', key='show_perf')
+perf_slot = st.sidebar.container()  # filled at the end of the run
 
 
 # ----------------- Tabs (structure preserved) -----------------
-T = st.tabs(['KPIs & Spend','PR/PO Timing','PO Approval','Delivery','Vendors','Dept & Services','Unit-rate Outliers','Forecast','Savings','Scorecards','Search','Full Data', 'Geo Distribution'])
+# st.tabs runs every tab's code on each rerun; a tab-style radio runs only the selected one
+TABS = ['KPIs & Spend','PR/PO Timing','PO Approval','Delivery','Vendors','Dept & Services','Unit-rate Outliers','Forecast','Savings','Scorecards','Search','Full Data', 'Geo Distribution']
+active_tab = st.radio('Section', TABS, horizontal=True, key='active_tab', label_visibility='collapsed')
+perf.tab = active_tab
+tab_start_time = time.perf_counter()
 
 # ----------------- KPIs & Spend -----------------
-with T[0]:
+if active_tab == TABS[0]:
     st.header('P2P Dashboard — Indirect (KPIs & Spend)')
     c1,c2,c3,c4,c5 = st.columns(5)
-    total_prs = int(fil.get(pr_number_col, pd.Series(dtype=object)).nunique()) if pr_number_col else 0
-    total_pos = int(fil.get(purchase_doc_col, pd.Series(dtype=object)).nunique()) if purchase_doc_col else 0
+    if cube_answerable:
+        kpi_rows = cube_rows(load_spend_cube(), sidebar_selections, cube_basis_range if date_range_key else None)
+        total_prs = distinct_count(kpi_rows, 'pr_codes')
+        total_pos = distinct_count(kpi_rows, 'po_codes')
+        line_items = int(kpi_rows['lines'].sum())
+        n_entities = int(kpi_rows['entity'].nunique()) if 'entity' in kpi_rows.columns else 0
+        spend_val = kpi_rows[net_amount_col].sum()
+    else:
+        total_prs = int(fil.get(pr_number_col, pd.Series(dtype=object)).nunique()) if pr_number_col else 0
+        total_pos = int(fil.get(purchase_doc_col, pd.Series(dtype=object)).nunique()) if purchase_doc_col else 0
+        line_items = len(fil)
+        n_entities = int(fil.get('entity', pd.Series(dtype=object)).nunique())
+        spend_val = fil.get(net_amount_col, pd.Series(0)).sum() if net_amount_col else 0
     c1.metric('Total PRs', total_prs)
     c2.metric('Total POs', total_pos)
-    c3.metric('Line Items', len(fil))
-    c4.metric('Entities', int(fil.get('entity', pd.Series(dtype=object)).nunique()))
-    spend_val = fil.get(net_amount_col, pd.Series(0)).sum() if net_amount_col else 0
+    c3.metric('Line Items', line_items)
+    c4.metric('Entities', n_entities)
     c5.metric('Spend (Cr ₹)', f"{spend_val/1e7:,.2f}")
     st.markdown('---')
 
@@ -617,14 +568,8 @@ with T[0]:
             return pd.DataFrame()
         if 'entity' not in fil.columns:
             return pd.DataFrame()
-        z = fil.loc[fil['_month_bucket'].notna(), ['_month_bucket', 'entity', net_amount_col]].copy()
-        z['month'] = z['_month_bucket']
-        
         # FIX: Strict FY filtering for the chart to avoid bleed into next FY
-        z = z[(z['month'] >= pr_start) & (z['month'] <= pr_end)]
-        
-        # groupby using categorical 'entity' is fast
-        return z.groupby(['month','entity'], dropna=False)[net_amount_col].sum().reset_index()
+        return monthly_spend(spend_rows([MONTH_KEY, 'entity']), net_amount_col, 'entity', pr_start, pr_end)
 
     st.subheader('Monthly Total Spend + Cumulative')
     if trend_date_col and net_amount_col and net_amount_col in fil.columns:
@@ -646,38 +591,39 @@ with T[0]:
             total_cr = pivot_cr.sum(axis=1)
             cum_cr = total_cr.cumsum()
 
-            fig = make_subplots(specs=[[{"secondary_y": True}]])
-            xaxis_labels = pivot_cr.index.strftime('%b-%Y')
-            colors = {'MEPL':'#1f77b4','MLPL':'#ff7f0e','MMW':'#2ca02c','MMPL':'#d62728'}
-            for ent in ordered_entities:
-                ent_vals = pivot_cr[ent].values
-                text_vals = [f"{v:.2f}" if v > 0 else '' for v in ent_vals]
-                fig.add_trace(go.Bar(x=xaxis_labels, y=ent_vals, name=ent, marker_color=colors.get(ent, None), text=text_vals, textposition='inside', hovertemplate='%{x}<br>'+ent+': %{y:.2f} Cr<extra></extra>'), secondary_y=False)
-            highlight_color = '#FFD700'
-            fig.add_trace(go.Scatter(x=xaxis_labels, y=cum_cr.values, mode='lines+markers+text',
-                name='Cumulative (Cr)', line=dict(color=highlight_color, width=3),
-                marker=dict(color=highlight_color, size=6), text=[f"{int(round(v, 0))}" for v in cum_cr.values],
-                textposition='top center', textfont=dict(color=highlight_color, size=9),
-                hovertemplate='%{x}<br>Cumulative: %{y:.2f} Cr<extra></extra>'),
-                secondary_y=True)
-
-            # Add total labels on top of each bar
-            fig.add_trace(go.Scatter(
-                x=xaxis_labels,
-                y=total_cr,
-                mode='text',
-                text=[f'{v:.2f}' for v in total_cr],
-                textposition='top center',
-                showlegend=False,
-                hovertemplate=None,
-                hoverinfo='none'
-            ), secondary_y=False)
-
-            fig.update_layout(barmode='stack', xaxis_tickangle=-45, title='Monthly Spend (stacked by Entity) + Cumulative',
-                legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1))
-            fig.update_yaxes(title_text='Monthly Spend (Cr)', secondary_y=False)
-            fig.update_yaxes(title_text='Cumulative (Cr)', secondary_y=True)
-            st.plotly_chart(fig, use_container_width=True)
+            with perf.span('figure', 'monthly_spend'):
+                fig = make_subplots(specs=[[{"secondary_y": True}]])
+                xaxis_labels = pivot_cr.index.strftime('%b-%Y')
+                colors = {'MEPL':'#1f77b4','MLPL':'#ff7f0e','MMW':'#2ca02c','MMPL':'#d62728'}
+                for ent in ordered_entities:
+                    ent_vals = pivot_cr[ent].values
+                    text_vals = [f"{v:.2f}" if v > 0 else '' for v in ent_vals]
+                    fig.add_trace(go.Bar(x=xaxis_labels, y=ent_vals, name=ent, marker_color=colors.get(ent, None), text=text_vals, textposition='inside', hovertemplate='%{x}<br>'+ent+': %{y:.2f} Cr<extra></extra>'), secondary_y=False)
+                highlight_color = '#FFD700'
+                fig.add_trace(go.Scatter(x=xaxis_labels, y=cum_cr.values, mode='lines+markers+text',
+                    name='Cumulative (Cr)', line=dict(color=highlight_color, width=3),
+                    marker=dict(color=highlight_color, size=6), text=[f"{int(round(v, 0))}" for v in cum_cr.values],
+                    textposition='top center', textfont=dict(color=highlight_color, size=9),
+                    hovertemplate='%{x}<br>Cumulative: %{y:.2f} Cr<extra></extra>'),
+                    secondary_y=True)
+
+                # Add total labels on top of each bar
+                fig.add_trace(go.Scatter(
+                    x=xaxis_labels,
+                    y=total_cr,
+                    mode='text',
+                    text=[f'{v:.2f}' for v in total_cr],
+                    textposition='top center',
+                    showlegend=False,
+                    hovertemplate=None,
+                    hoverinfo='none'
+                ), secondary_y=False)
+
+                fig.update_layout(barmode='stack', xaxis_tickangle=-45, title='Monthly Spend (stacked by Entity) + Cumulative',
+                    legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1))
+                fig.update_yaxes(title_text='Monthly Spend (Cr)', secondary_y=False)
+                fig.update_yaxes(title_text='Cumulative (Cr)', secondary_y=True)
+                st.plotly_chart(fig, use_container_width=True)
     else:
         st.info('Monthly Spend not available — need date and Net Amount columns.')
 
@@ -687,9 +633,10 @@ with T[0]:
         if trend_date_col and net_amount_col and net_amount_col in fil.columns and 'entity' in fil.columns:
             g = memoized_compute('monthly_entity', filter_signature, build_monthly)
             if not g.empty:
-                fig_e = px.line(g, x=g['month'].dt.strftime('%b-%Y'), y=net_amount_col, color='entity', labels={net_amount_col:'Net Amount','x':'Month'})
-                fig_e.update_layout(xaxis_tickangle=-45)
-                st.plotly_chart(fig_e, use_container_width=True)
+                with perf.span('figure', 'entity_trend'):
+                    fig_e = px.line(g, x=g['month'].dt.strftime('%b-%Y'), y=net_amount_col, color='entity', labels={net_amount_col:'Net Amount','x':'Month'})
+                    fig_e.update_layout(xaxis_tickangle=-45)
+                    st.plotly_chart(fig_e, use_container_width=True)
     except Exception as e:
         st.error(f'Could not render Entity Trend: {e}')
 
@@ -699,14 +646,13 @@ with T[0]:
     if 'procurement_category' in fil.columns and net_amount_col and net_amount_col in fil.columns:
         # build function for memoization
         def build_proc_cat_spend():
-            pc = fil.groupby('procurement_category', dropna=False)[net_amount_col].sum().reset_index().sort_values(net_amount_col, ascending=False)
-            pc['cr'] = pc[net_amount_col] / 1e7
-            return pc
+            return spend_by(spend_rows(['procurement_category']), net_amount_col, 'procurement_category')
         pc_spend = memoized_compute('proc_cat_spend', filter_signature, build_proc_cat_spend)
-        fig_pc = px.bar(pc_spend, x='procurement_category', y='cr', text='cr', title='Procurement Category Spend (Cr)')
-        fig_pc.update_traces(texttemplate='%{text:.2f}', textposition='outside')
-        fig_pc.update_layout(xaxis_tickangle=-45)
-        st.plotly_chart(fig_pc, use_container_width=True)
+        with perf.span('figure', 'proc_cat_spend'):
+            fig_pc = px.bar(pc_spend, x='procurement_category', y='cr', text='cr', title='Procurement Category Spend (Cr)')
+            fig_pc.update_traces(texttemplate='%{text:.2f}', textposition='outside')
+            fig_pc.update_layout(xaxis_tickangle=-45)
+            st.plotly_chart(fig_pc, use_container_width=True)
     else:
         st.info('Procurement Category or Net Amount column not found — cannot show Procurement Category spend.')
 
@@ -715,23 +661,20 @@ with T[0]:
     st.subheader('Buyer-wise Spend (Cr)')
     if 'buyer_display' in fil.columns and net_amount_col in fil.columns:
         def build_buyer_spend():
-            grp = fil.groupby('buyer_display')[net_amount_col].sum().reset_index()
-            grp['cr'] = grp[net_amount_col] / 1e7
-            return grp.sort_values('cr', ascending=False)
+            return spend_by(spend_rows(['buyer_display']), net_amount_col, 'buyer_display', dropna=True)
         buyer_spend = memoized_compute('buyer_spend', filter_signature, build_buyer_spend)
-        fig_buyer = px.bar(buyer_spend, x='buyer_display', y='cr', text='cr', title='Buyer-wise Spend (Cr)')
-        fig_buyer.update_traces(texttemplate='%{text:.2f}', textposition='outside')
-        fig_buyer.update_layout(xaxis_tickangle=-45)
-        st.plotly_chart(fig_buyer, use_container_width=True)
+        with perf.span('figure', 'buyer_spend'):
+            fig_buyer = px.bar(buyer_spend, x='buyer_display', y='cr', text='cr', title='Buyer-wise Spend (Cr)')
+            fig_buyer.update_traces(texttemplate='%{text:.2f}', textposition='outside')
+            fig_buyer.update_layout(xaxis_tickangle=-45)
+            st.plotly_chart(fig_buyer, use_container_width=True)
         st.dataframe(buyer_spend, use_container_width=True)
 
         # Buyer trend (optimized grouping)
         try:
             if trend_date_col and net_amount_col and net_amount_col in fil.columns:
                 def build_buyer_trend():
-                    bt = fil.loc[fil['_month_bucket'].notna(), ['_month_bucket','buyer_display', net_amount_col]].copy()
-                    bt['month'] = bt['_month_bucket']
-                    return bt.groupby(['month','buyer_display'], dropna=False)[net_amount_col].sum().reset_index()
+                    return monthly_spend(spend_rows([MONTH_KEY, 'buyer_display']), net_amount_col, 'buyer_display')
                 bt_grouped = memoized_compute('buyer_trend', filter_signature, build_buyer_trend)
                 if bt_grouped.empty:
                     st.info('No buyer trend data for the current filters.')
@@ -761,11 +704,12 @@ with T[0]:
                                     .transform(lambda s: s.rolling(rolling_window, min_periods=1).mean()))
                             trend_long = trend_long[trend_long['buyer_display'].isin(chosen)]
 
-                            fig_b_trend = px.line(trend_long, x='month', y='value', color='buyer_display',
-                                labels={'value':'Net Amount','month':'Month','buyer_display':'Buyer'}, title='Buyer-wise Monthly Trend')
-                            fig_b_trend.update_layout(xaxis_tickformat='%b-%Y', hovermode='x unified', legend_title_text='Buyer')
-                            fig_b_trend.update_traces(mode='lines+markers')
-                            st.plotly_chart(fig_b_trend, use_container_width=True)
+                            with perf.span('figure', 'buyer_trend'):
+                                fig_b_trend = px.line(trend_long, x='month', y='value', color='buyer_display',
+                                    labels={'value':'Net Amount','month':'Month','buyer_display':'Buyer'}, title='Buyer-wise Monthly Trend')
+                                fig_b_trend.update_layout(xaxis_tickformat='%b-%Y', hovermode='x unified', legend_title_text='Buyer')
+                                fig_b_trend.update_traces(mode='lines+markers')
+                                st.plotly_chart(fig_b_trend, use_container_width=True)
                         else:
                             st.info('No buyer trend rows for the selected buyers.')
         except Exception as e:
@@ -774,37 +718,43 @@ with T[0]:
         st.info('Buyer display or Net Amount column missing — cannot compute buyer-wise spend.')
 
 # ----------------- PR/PO Timing & Open PRs -----------------
-with T[1]:
+if active_tab == TABS[1]:
     st.subheader('PR/PO Timing')
     if pr_col and po_create_col and pr_col in fil.columns and po_create_col in fil.columns:
-        def build_lead_df():
-            lead = fil.loc[fil[pr_col].notna() & fil[po_create_col].notna(), [pr_col, po_create_col, 'Buyer.Type', 'po_creator']].copy()
-            lead['Lead Time (Days)'] = (pd.to_datetime(lead[po_create_col]) - pd.to_datetime(lead[pr_col])).dt.days
-            return lead
-        lead_df = memoized_compute('lead_df', filter_signature, build_lead_df)
+        # one row per PR: submission -> first PO, so multi-line PRs count once
+        pr_docs = document_timings().prs(row_mask)
+        lead_docs = pr_docs[pr_docs['lead_days'].notna()] if 'lead_days' in pr_docs.columns else pd.DataFrame(columns=['lead_days', 'lead_bdays'])
 
         SLA_DAYS = 7
-        avg_lead = float(lead_df['Lead Time (Days)'].mean().round(1)) if not lead_df.empty else 0.0
-        gauge_fig = go.Figure(go.Indicator(mode='gauge+number', value=avg_lead,
-            number={'suffix':' days'},
-            gauge={'axis':{'range':[0, max(14, avg_lead * 1.2 if avg_lead else 14)]},
-                   'bar':{'color':'darkblue'},
-                   'steps':[{'range':[0,SLA_DAYS],'color':'lightgreen'},{'range':[SLA_DAYS,max(14, avg_lead * 1.2 if avg_lead else 14)],'color':'lightcoral'}],
-                   'threshold':{'line':{'color':'red','width':4}, 'value':SLA_DAYS}}))
-        st.plotly_chart(gauge_fig, use_container_width=True)
+        avg_lead = float(round(lead_docs['lead_days'].mean(), 1)) if not lead_docs.empty else 0.0
+        with perf.span('figure', 'lead_time_gauge'):
+            gauge_fig = go.Figure(go.Indicator(mode='gauge+number', value=avg_lead,
+                number={'suffix':' days'},
+                gauge={'axis':{'range':[0, max(14, avg_lead * 1.2 if avg_lead else 14)]},
+                       'bar':{'color':'darkblue'},
+                       'steps':[{'range':[0,SLA_DAYS],'color':'lightgreen'},{'range':[SLA_DAYS,max(14, avg_lead * 1.2 if avg_lead else 14)],'color':'lightcoral'}],
+                       'threshold':{'line':{'color':'red','width':4}, 'value':SLA_DAYS}}))
+            st.plotly_chart(gauge_fig, use_container_width=True)
         st.caption(f"Current Avg Lead Time: {avg_lead:.1f} days • Target ≤ {SLA_DAYS} days")
-
-        st.subheader('⏱️ PR to PO Lead Time by Buyer Type & by Buyer')
-        lead_avg_by_type = lead_df.groupby('Buyer.Type')['Lead Time (Days)'].mean().round(0).reset_index().rename(columns={'Buyer.Type':'Buyer Type'}) if 'Buyer.Type' in lead_df.columns else pd.DataFrame()
-        lead_avg_by_buyer = lead_df.groupby('po_creator')['Lead Time (Days)'].mean().round(0).reset_index().rename(columns={'po_creator':'PO.Creator'}) if 'po_creator' in lead_df.columns else pd.DataFrame()
+        if not lead_docs.empty:
+            overall = percentile_table(lead_docs, None, 'lead_days').iloc[0]
+            within_sla = (lead_docs['lead_days'] <= SLA_DAYS).mean() * 100
+            st.caption(f"Per PR ({int(overall['Documents']):,} PRs): P50 {overall['P50']:.0f} • P90 {overall['P90']:.0f} • "
+                       f"P99 {overall['P99']:.0f} days • median {lead_docs['lead_bdays'].median():.0f} business days • "
+                       f"{within_sla:.1f}% within SLA")
+
+        st.subheader('⏱️ PR to PO Lead Time by Buyer Type, Buyer & Entity')
+        lead_avg_by_type = percentile_table(lead_docs, 'Buyer.Type', 'lead_days').rename(columns={'Buyer.Type':'Buyer Type'})
+        lead_avg_by_buyer = percentile_table(lead_docs, 'po_creator', 'lead_days').rename(columns={'po_creator':'PO.Creator'})
         c1,c2 = st.columns(2)
         c1.dataframe(lead_avg_by_type, use_container_width=True)
         c2.dataframe(lead_avg_by_buyer, use_container_width=True)
+        st.dataframe(percentile_table(lead_docs, 'entity', 'lead_days').rename(columns={'entity':'Entity'}), use_container_width=True)
 
         st.subheader('📅 Monthly PR & PO Trends')
-        tmp = fil
-        tmp['PR Month'] = pd.to_datetime(tmp[pr_col], errors='coerce').dt.to_period('M') if pr_col in tmp.columns else pd.NaT
-        tmp['PO Month'] = pd.to_datetime(tmp[po_create_col], errors='coerce').dt.to_period('M') if po_create_col in tmp.columns else pd.NaT
+        tmp = view([pr_col, po_create_col, pr_number_col, purchase_doc_col])
+        tmp['PR Month'] = tmp[pr_col].dt.to_period('M') if pr_col in tmp.columns else pd.NaT
+        tmp['PO Month'] = tmp[po_create_col].dt.to_period('M') if po_create_col in tmp.columns else pd.NaT
 
         pr_col_name = pr_number_col if pr_number_col else None
         po_col_name = purchase_doc_col if purchase_doc_col else None
@@ -827,33 +777,30 @@ with T[1]:
         pr_number_col_local = pr_number_col if pr_number_col in df.columns else safe_col(df, ['pr_number','pr number','pr_no','pr no'])
 
         if pr_status_col and pr_status_col in df.columns:
-            def prepare_open_source(source_df: pd.DataFrame) -> pd.DataFrame:
-                base = source_df.copy()
-                if 'Buyer.Type' not in base.columns:
-                    base['Buyer.Type'] = compute_buyer_type_vectorized(base)
-                base['Buyer.Type'] = base['Buyer.Type'].fillna('Direct').astype(str).str.strip().str.title()
-                base.loc[base['Buyer.Type'].str.lower().isin(['direct', 'd']), 'Buyer.Type'] = 'Direct'
-                base.loc[base['Buyer.Type'].str.lower().isin(['indirect', 'i', 'in']), 'Buyer.Type'] = 'Indirect'
-                base.loc[~base['Buyer.Type'].isin(['Direct','Indirect']), 'Buyer.Type'] = 'Direct'
-                if sel_b:
-                    base = base[base['Buyer.Type'].isin(sel_b)]
-                return base
-
+            # open PRs from the persisted state table; only their lines' display columns are read
+            open_state = current_open_state()
+            open_rows = open_document_rows('PR', open_state)
+            shown = {pr_number_col_local, pr_date_col, pr_status_col, net_amount_col, purchase_doc_col, 'entity', 'po_creator',
+                     'procurement_category', 'procurement category', 'product_name', 'product name', 'productname',
+                     'po_budget_code', 'po budget code', 'pr_budget_code', 'pr budget code', 'buyer_group', 'buyer group',
+                     'Buyer.Type', 'buyer_type', 'buyer.type'}
+            open_lines = df[[c for c in df.columns if c in shown]]
             using_global = False
-            scoped_df = prepare_open_source(fil)
-            open_df = scoped_df[scoped_df[pr_status_col].astype(str).isin(["Approved", "InReview"])].copy()
+            open_df = open_lines[row_mask & open_rows]
             if open_df.empty:
-                global_df = prepare_open_source(df)
-                open_df = global_df[global_df[pr_status_col].astype(str).isin(["Approved", "InReview"])].copy()
+                # all loaded open PRs, restricted only by the Buyer Type selection
+                global_rows = open_rows & filter_index.mask('Buyer.Type', sel_b) if sel_b and 'Buyer.Type' in filter_index else open_rows
+                open_df = open_lines[global_rows]
                 if not open_df.empty:
                     using_global = True
+            open_df = open_df.copy()
 
             if open_df.empty:
                 st.warning('⚠️ No open PRs match the current filters.')
             else:
                 if using_global:
-                    st.info('No filtered Open PRs were found — showing all Open PRs after applying only the Buyer Type selection.')
-                # pending age
+                    st.info('No filtered Open PRs were found — showing all Open PRs for the loaded year/entities after applying only the Buyer Type selection.')
+                # pending age (from the state table's PR dates when there is one, below)
                 if pr_date_col and pr_date_col in open_df.columns:
                     open_df["Pending Age (Days)"] = (pd.to_datetime(pd.Timestamp.today().date()) - pd.to_datetime(open_df[pr_date_col], errors='coerce')).dt.days
                 else:
@@ -890,6 +837,11 @@ with T[1]:
                     open_summary = open_df.reset_index().groupby('_row_id' if '_row_id' in open_df.columns else open_df.index.name or 'index').agg(agg_map).reset_index()
 
                 open_summary = open_summary.drop(columns=['buyer_type','effective_buyer_type'], errors='ignore')
+                # age and first conversion in which each PR was seen open, from the persisted state table
+                if not open_state.empty and group_by_col and 'entity' in open_summary.columns:
+                    ages = state_ages(open_state, 'PR', open_summary['entity'], open_summary[group_by_col])
+                    open_summary['Pending Age (Days)'] = ages['age_days'].fillna(open_summary['Pending Age (Days)']).to_numpy()
+                    open_summary['Open Since'] = ages['opened_at'].to_numpy()
                 st.metric("🔢 Open PRs", open_summary.shape[0])
 
                 # highlight
@@ -915,8 +867,7 @@ with T[1]:
                     st.dataframe(open_summary, use_container_width=True)
 
                 try:
-                    csv_out = open_summary.to_csv(index=False)
-                    st.download_button('⬇️ Download Open PRs (CSV)', csv_out, file_name='open_prs_summary.csv', mime='text/csv')
+                    export_button('⬇️ Download Open PRs', open_summary, 'open_prs_summary', 'export_open_prs')
                 except Exception:
                     pass
 
@@ -934,7 +885,7 @@ with T[1]:
 
 
 # ---- Defensive PO Approval details (final stable version) ----
-with T[2]:
+if active_tab == TABS[2]:
     st.subheader("PO Approval Details")
     po_create = safe_col(df, ['po_create_date', 'po create date'])
     po_approved = safe_col(df, ['po_approved_date', 'po approved date'])
@@ -956,16 +907,7 @@ with T[2]:
         if 'product_name' in fil.columns:
             cols.append('product_name')
             
-        p_df = fil[[c for c in cols if c in fil.columns]].copy()
-        
-        if po_approved and po_approved in p_df.columns:
-            p_df['is_approved'] = p_df[po_approved].notna()
-            p_df['approval_lead_time'] = (p_df[po_approved] - p_df[po_create]).dt.days
-        else:
-            p_df['is_approved'] = False
-            p_df['approval_lead_time'] = np.nan
-            
-        return p_df
+        return po_approval_lines(fil[[c for c in cols if c in fil.columns]], po_create, po_approved)
 
     po_app_df = memoized_compute('po_approval', filter_signature, build_po_app_df)
 
@@ -984,20 +926,33 @@ with T[2]:
         if net_amount_col and net_amount_col in po_app_df.columns:
             pending_val = po_app_df.loc[~po_app_df['is_approved'], net_amount_col].sum()
 
-        avg_approval_time = unique_pos_df['approval_lead_time'].mean()
+        # per PO document: creation -> approval
+        po_docs = document_timings().pos(row_mask)
+        approval_docs = po_docs[po_docs['approval_days'].notna()] if 'approval_days' in po_docs.columns else pd.DataFrame()
+        avg_approval_time = approval_docs['approval_days'].mean() if not approval_docs.empty else unique_pos_df['approval_lead_time'].mean()
 
         m1, m2, m3, m4 = st.columns(4)
         m1.metric("Avg Approval Time (Days)", f"{avg_approval_time:.1f}")
         m2.metric("Approved POs", int(approved_count))
         m3.metric("Pending POs", int(pending_count))
         m4.metric("Pending PO Value (Cr)", f"{pending_val/1e7:,.2f}")
+        if not approval_docs.empty:
+            appr = percentile_table(approval_docs, None, 'approval_days').iloc[0]
+            st.caption(f"Approval time per PO: P50 {appr['P50']:.0f} • P90 {appr['P90']:.0f} • P99 {appr['P99']:.0f} days "
+                       f"• median {approval_docs['approval_bdays'].median():.0f} business days")
+            with st.expander('Approval time percentiles by buyer, Buyer Type and entity'):
+                for col, label in (('po_creator', 'PO.Creator'), ('Buyer.Type', 'Buyer Type'), ('entity', 'Entity')):
+                    st.dataframe(percentile_table(approval_docs, col, 'approval_days').rename(columns={col: label}), use_container_width=True)
         
         st.markdown('---')
         
         # New: Buyer-wise Pending Count & List
         st.subheader("Buyer-wise Pending Approvals")
         
-        pending_df = po_app_df[~po_app_df['is_approved']].copy()
+        # unapproved POs from the persisted state table (else the pending mask); display columns only
+        open_state = current_open_state()
+        pending_rows = row_mask & open_document_rows('PO', open_state)
+        pending_df = df.loc[pending_rows, [c for c in list(po_app_df.columns) + ['entity'] if c in df.columns]]
         
         if not pending_df.empty:
             # Aggregate to get unique POs with summed Net Amount and combined Product Names
@@ -1006,11 +961,12 @@ with T[2]:
             if po_create and po_create in pending_df.columns: agg_dict[po_create] = 'first'
             if po_vendor_col and po_vendor_col in pending_df.columns: agg_dict[po_vendor_col] = 'first'
             if net_amount_col and net_amount_col in pending_df.columns: agg_dict[net_amount_col] = 'sum'
-            if 'product_name' in pending_df.columns: 
-                agg_dict['product_name'] = lambda x: ', '.join(sorted(set(str(i) for i in x.dropna().unique() if str(i).strip() != '')))
+            if 'entity' in pending_df.columns: agg_dict['entity'] = 'first'
 
             if purchase_doc_col and purchase_doc_col in pending_df.columns:
                 unique_pending = pending_df.groupby(purchase_doc_col, as_index=False).agg(agg_dict)
+                if 'product_name' in pending_df.columns:
+                    unique_pending['product_name'] = distinct_join(pending_df, purchase_doc_col, 'product_name', index=unique_pending[purchase_doc_col]).to_numpy()
             else:
                 unique_pending = pending_df # Fallback
                 
@@ -1039,6 +995,10 @@ with T[2]:
                 filtered_pending['Age (Days)'] = (pd.Timestamp.now() - filtered_pending[po_create]).dt.days
             else:
                 filtered_pending['Age (Days)'] = np.nan
+            if not open_state.empty and purchase_doc_col in filtered_pending.columns and 'entity' in filtered_pending.columns:
+                ages = state_ages(open_state, 'PO', filtered_pending['entity'], filtered_pending[purchase_doc_col])
+                state_age = (pd.Timestamp.now() - ages['doc_date']).dt.days
+                filtered_pending['Age (Days)'] = state_age.fillna(filtered_pending['Age (Days)'].reset_index(drop=True)).to_numpy()
 
             # Select relevant columns for the list
             # Requested: PO Number, Vendor Name, Product Name, Net Amount, Age
@@ -1087,7 +1047,7 @@ with T[2]:
 
 
 # ----------------- Delivery -----------------
-with T[3]:
+if active_tab == TABS[3]:
     st.subheader('Delivery Summary')
     dv = fil
     po_qty_col = safe_col(dv, ['po_qty','po quantity','po_quantity','po qty'])
@@ -1095,39 +1055,9 @@ with T[3]:
 
     if po_qty_col and received_col and po_qty_col in dv.columns and received_col in dv.columns:
         def build_delivery():
-            # Include Net Amount for Open Value calc
-            cols = [po_qty_col, received_col, purchase_doc_col, po_vendor_col]
-            if net_amount_col and net_amount_col in dv.columns:
-                cols.append(net_amount_col)
-                
-            tmp = dv[[c for c in cols if c in dv.columns]].copy()
-            tmp['po_qty_f'] = tmp[po_qty_col].fillna(0).astype(float)
-            tmp['received_f'] = tmp[received_col].fillna(0).astype(float)
-            
-            if net_amount_col and net_amount_col in tmp.columns:
-                tmp['net_val'] = tmp[net_amount_col].fillna(0).astype(float)
-            else:
-                tmp['net_val'] = 0.0
-
-            # Group by PO
-            # Aggregation: Sum Qty, Sum Received, Sum Net Amount (assuming net amount is line level)
-            agg_rules = {'po_qty_f':'sum', 'received_f':'sum', 'net_val':'sum'}
-            
-            grp = tmp.groupby([purchase_doc_col, po_vendor_col], dropna=False).agg(agg_rules).reset_index()
-            
-            # Derived metrics
-            grp['pct_received'] = np.where(grp['po_qty_f']>0, grp['received_f']/grp['po_qty_f']*100, 0)
-            grp['is_open'] = grp['received_f'] < grp['po_qty_f']
-            grp['is_partial'] = (grp['received_f'] > 0) & (grp['received_f'] < grp['po_qty_f'])
-            
-            # Open Value: Pro-rata? Or full line value if not fully received? 
-            # Usually "Open PO Value" means the value of the goods NOT yet received.
-            # Approximation: net_val * (1 - received/qty)
-            ratio = np.where(grp['po_qty_f']>0, grp['received_f']/grp['po_qty_f'], 1.0)
-            ratio = np.clip(ratio, 0, 1) # Ensure bounded
-            grp['open_val'] = grp['net_val'] * (1 - ratio)
-            
-            return grp
+            # one row per PO x vendor; open value = net value x share not yet received
+            return delivery_by_po(view([po_qty_col, received_col, purchase_doc_col, po_vendor_col, net_amount_col]),
+                                  po_qty_col, received_col, purchase_doc_col, po_vendor_col, net_amount_col)
             
         ag = memoized_compute('delivery_summary', filter_signature, build_delivery)
         
@@ -1159,7 +1089,7 @@ with T[3]:
 
 
 # ----------------- Vendors -----------------
-with T[4]:
+if active_tab == TABS[4]:
     st.subheader('Vendor Insights & Service Buckets')
     
     if po_vendor_col and net_amount_col and po_vendor_col in fil.columns and net_amount_col in fil.columns:
@@ -1178,35 +1108,13 @@ with T[4]:
         # but respects FY, Date Range, Entity, Category.
         # Construct df_context by applying base filters to df (raw processed data).
         
-        df_context = df.copy()
-        
-        # Apply Time Filters
-        if pr_col and pr_col in df_context.columns:
-            d_check_ctx = df_context[pr_col]
-            if po_create_col and po_create_col in df_context.columns:
-                d_check_ctx = d_check_ctx.fillna(df_context[po_create_col])
-            df_context = df_context[(d_check_ctx >= pr_start) & (d_check_ctx <= pr_end)]
-        elif po_create_col and po_create_col in df_context.columns:
-            df_context = df_context[(df_context[po_create_col] >= pr_start) & (df_context[po_create_col] <= pr_end)]
-            
-        if date_basis and date_range_key:
-             # date_range_key is (sdt_iso, edt_iso)
-             # we can re-use sdt, edt from global scope if available, or parse date_range_key
-             # Actually, simpler to reuse the 'dr' logic if sdt/edt variables are available in scope.
-             # They are defined in the sidebar section.
-             try:
-                 if 'sdt' in locals() and 'edt' in locals():
-                     df_context = df_context[(df_context[date_basis] >= sdt) & (df_context[date_basis] <= edt)]
-             except:
-                 pass
-
-        # Apply Entity & Category Filters (Sidebar logic replicated)
-        if sel_e and 'entity' in df_context.columns and len(sel_e) < len(entity_choices):
-            df_context = df_context[df_context['entity'].isin(sel_e)]
-        if sel_pc and 'procurement_category' in df_context.columns and len(sel_pc) < len(proc_cat_choices):
-            df_context = df_context[df_context['procurement_category'].isin(sel_pc)]
-        if sel_b and 'Buyer.Type' in df_context.columns and len(sel_b) < len(choices_bt):
-            df_context = df_context[df_context['Buyer.Type'].isin(sel_b)]
+        # Time filters come from base_row_mask; Entity / Category / Buyer Type from the filter index
+        ctx_mask = filter_index.select({
+            'entity': _subset(sel_e, entity_choices),
+            'procurement_category': _subset(sel_pc, proc_cat_choices),
+            'Buyer.Type': _subset(sel_b, choices_bt),
+        }, base=base_row_mask)
+        df_context = df[ctx_mask]
 
         # Get list of buyers from this context
         ctx_buyers = sorted([str(x) for x in df_context['po_creator'].dropna().unique().tolist() if str(x).strip() != ''])
@@ -1219,7 +1127,7 @@ with T[4]:
             
             # 2. Get ALL transactions for these vendors (to see other buyers)
             # This is the key requirement: "show multiple users for the vendors"
-            portfolio_df = df_context[df_context[po_vendor_col].isin(my_vendor_list)].copy()
+            portfolio_df = df_context[df_context[po_vendor_col].isin(my_vendor_list)]
             
             if not portfolio_df.empty:
                 # Aggregate
@@ -1227,19 +1135,15 @@ with T[4]:
                     Spend=(net_amount_col, 'sum'),
                     PO_Count=(purchase_doc_col, 'nunique') if purchase_doc_col in portfolio_df.columns else ('entity', 'count'),
                     Buyer_Count=('po_creator', 'nunique'),
-                    Assigned_Buyers=('po_creator', lambda x: ', '.join(sorted(set(str(i) for i in x.dropna().unique() if str(i).strip() != ''))))
                 ).reset_index()
+                port_agg['Assigned_Buyers'] = distinct_join(portfolio_df, po_vendor_col, 'po_creator', index=port_agg[po_vendor_col]).to_numpy()
                 
                 port_agg['Spend (Cr)'] = port_agg['Spend'] / 1e7
                 port_agg = port_agg.sort_values('Spend (Cr)', ascending=False)
                 
                 # Merge with master data for contact info
                 if not vendor_master.empty:
-                    port_agg['VendorName_Norm'] = port_agg[po_vendor_col].astype(str).str.lower().str.strip()
-                    vm_unique_p = vendor_master.sort_values('Entity').drop_duplicates(subset=['VendorName_Norm'], keep='first')
-                    port_agg = pd.merge(port_agg, vm_unique_p[['VendorName_Norm', 'City', 'State', 'Phone']], 
-                                      on='VendorName_Norm', how='left')
-                    port_agg = port_agg.drop(columns=['VendorName_Norm'])
+                    port_agg = vendor_dim.enrich(port_agg, po_vendor_col, ['City', 'State', 'Phone'])
                 
                 st.write(f"Vendors associated with **{sel_buyer_portfolio}** (and other buyers interactions):")
                 
@@ -1270,12 +1174,13 @@ with T[4]:
             cat_df['Spend (Cr)'] = cat_df['Spend'] / 1e7
             
             # Chart 1: Spend by Category
-            fig_cat = px.bar(cat_df, x='procurement_category', y='Spend (Cr)', 
-                             hover_data=['VendorCount'], text='Spend (Cr)',
-                             title='Spend by Category')
-            fig_cat.update_traces(texttemplate='%{text:.2f}', textposition='outside')
-            with col_cat:
-                st.plotly_chart(fig_cat, use_container_width=True)
+            with perf.span('figure', 'vendor_category_spend'):
+                fig_cat = px.bar(cat_df, x='procurement_category', y='Spend (Cr)', 
+                                 hover_data=['VendorCount'], text='Spend (Cr)',
+                                 title='Spend by Category')
+                fig_cat.update_traces(texttemplate='%{text:.2f}', textposition='outside')
+                with col_cat:
+                    st.plotly_chart(fig_cat, use_container_width=True)
             
             # Selector
             cats = ['All'] + sorted(cat_df['procurement_category'].dropna().astype(str).unique().tolist())
@@ -1290,15 +1195,16 @@ with T[4]:
             ent_v_count = fil.groupby('entity')[po_vendor_col].nunique().reset_index()
             ent_v_count.columns = ['Entity', 'Vendor Count']
             if not ent_v_count.empty:
-                fig_ent_count = px.pie(ent_v_count, values='Vendor Count', names='Entity', 
-                                     title='Vendor Count by Entity', hole=0.4)
-                with col_ent:
-                    st.plotly_chart(fig_ent_count, use_container_width=True)
+                with perf.span('figure', 'vendor_count_by_entity'):
+                    fig_ent_count = px.pie(ent_v_count, values='Vendor Count', names='Entity', 
+                                         title='Vendor Count by Entity', hole=0.4)
+                    with col_ent:
+                        st.plotly_chart(fig_ent_count, use_container_width=True)
 
         # Filter for Vendor section
-        v_df = fil.copy()
+        v_df = fil
         if sel_cat != 'All' and 'procurement_category' in v_df.columns:
-            v_df = v_df[v_df['procurement_category'].astype(str) == sel_cat]
+            v_df = v_df[text_equals(v_df['procurement_category'], sel_cat)]
             
         st.markdown("---")
         st.markdown(f"### 2. Vendors in '{sel_cat}'")
@@ -1307,24 +1213,15 @@ with T[4]:
         v_stats = v_df.groupby(po_vendor_col).agg(
             Spend=(net_amount_col, 'sum'),
             PO_Count=(purchase_doc_col, 'nunique') if purchase_doc_col in v_df.columns else ('entity', 'count'),
-            Buyers=('po_creator', lambda x: ', '.join(sorted(set(str(i) for i in x.dropna().unique() if str(i).strip() != ''))))
         ).reset_index()
+        v_stats['Buyers'] = distinct_join(v_df, po_vendor_col, 'po_creator', index=v_stats[po_vendor_col]).to_numpy()
         v_stats['Spend (Cr)'] = v_stats['Spend'] / 1e7
         v_stats = v_stats.sort_values('Spend (Cr)', ascending=False)
 
         # Merge with master data to show enriched table
         if not vendor_master.empty:
-            # We use normalized matching or left join on name if possible
-            # But the vendor names in transaction data may vary slightly.
-            # We'll try a naive merge on Vendor Name first.
-            vm_unique = vendor_master.sort_values('Entity').drop_duplicates(subset=['VendorName_Norm'], keep='first')
-            
-            # Prepare join column
-            v_stats['VendorName_Norm'] = v_stats[po_vendor_col].astype(str).str.lower().str.strip()
-            
-            # Join
-            v_enriched = pd.merge(v_stats, vm_unique[['VendorName_Norm', 'Email', 'Phone', 'City', 'State']], 
-                                  on='VendorName_Norm', how='left')
+            # Normalized-name match via the vendor dimension (names in transactions may vary slightly)
+            v_enriched = vendor_dim.enrich(v_stats, po_vendor_col, ['Email', 'Phone', 'City', 'State'])
             
             # Display enriched table instead of just list
             st.markdown("#### Vendor List (Sorted by Spend)")
@@ -1343,7 +1240,7 @@ with T[4]:
         
         if sel_vendor:
             # Vendor Detail View
-            sub = v_df[v_df[po_vendor_col].astype(str) == sel_vendor]
+            sub = v_df[text_equals(v_df[po_vendor_col], sel_vendor)]
             
             # Metrics for this vendor
             v_spend = sub[net_amount_col].sum() / 1e7
@@ -1354,9 +1251,7 @@ with T[4]:
             
             found_contact = False
             if not vendor_master.empty:
-                # Normalize selected vendor
-                sel_norm = str(sel_vendor).lower().strip()
-                match = vendor_master[vendor_master['VendorName_Norm'] == sel_norm]
+                match = vendor_dim.contacts(sel_vendor)
                 
                 if not match.empty:
                     found_contact = True
@@ -1387,10 +1282,11 @@ with T[4]:
                 ent_breakdown = sub.groupby('entity')[net_amount_col].sum().reset_index()
                 ent_breakdown['Spend (Cr)'] = ent_breakdown[net_amount_col] / 1e7
                 if not ent_breakdown.empty:
-                    fig_ent = px.pie(ent_breakdown, values='Spend (Cr)', names='entity', 
-                                     title=f"Spend Breakdown by Entity: {sel_vendor}",
-                                     hole=0.4)
-                    st.plotly_chart(fig_ent, use_container_width=True)
+                    with perf.span('figure', 'vendor_entity_spend'):
+                        fig_ent = px.pie(ent_breakdown, values='Spend (Cr)', names='entity', 
+                                         title=f"Spend Breakdown by Entity: {sel_vendor}",
+                                         hole=0.4)
+                        st.plotly_chart(fig_ent, use_container_width=True)
             
             # Items / Services Table
             st.markdown("**Items / Services Provided:**")
@@ -1417,8 +1313,8 @@ with T[4]:
             rcv_col_vpm = safe_col(sub, ['receivedqty','received_qty','received qty','received_qty'])
             
             if qty_col_vpm and rcv_col_vpm and qty_col_vpm in sub.columns and rcv_col_vpm in sub.columns:
-                sub_qty = pd.to_numeric(sub[qty_col_vpm], errors='coerce').fillna(0)
-                sub_rcv = pd.to_numeric(sub[rcv_col_vpm], errors='coerce').fillna(0)
+                sub_qty = sub[qty_col_vpm].fillna(0.0)
+                sub_rcv = sub[rcv_col_vpm].fillna(0.0)
                 
                 total_ord = sub_qty.sum()
                 total_rcv = sub_rcv.sum()
@@ -1426,15 +1322,16 @@ with T[4]:
                 fill_rate = (total_rcv / total_ord * 100) if total_ord > 0 else 0.0
                 
                 # Gauge chart
-                fig_fill = go.Figure(go.Indicator(
-                    mode = "gauge+number",
-                    value = fill_rate,
-                    title = {'text': "Volume Fill Rate (%)"},
-                    gauge = {'axis': {'range': [0, 100]}, 'bar': {'color': "green" if fill_rate >= 90 else "orange"}}
-                ))
-                fig_fill.update_layout(height=250, margin=dict(l=20,r=20,t=40,b=20))
-                with vpm1:
-                    st.plotly_chart(fig_fill, use_container_width=True)
+                with perf.span('figure', 'fill_rate_gauge'):
+                    fig_fill = go.Figure(go.Indicator(
+                        mode = "gauge+number",
+                        value = fill_rate,
+                        title = {'text': "Volume Fill Rate (%)"},
+                        gauge = {'axis': {'range': [0, 100]}, 'bar': {'color': "green" if fill_rate >= 90 else "orange"}}
+                    ))
+                    fig_fill.update_layout(height=250, margin=dict(l=20,r=20,t=40,b=20))
+                    with vpm1:
+                        st.plotly_chart(fig_fill, use_container_width=True)
             else:
                 with vpm1:
                     st.info("PO Qty / Received Qty columns not found — cannot calculate Fill Rate.")
@@ -1451,9 +1348,10 @@ with T[4]:
                     with vpm2:
                         st.metric("Avg Promised Lead Time", f"{avg_lead_days:.1f} Days")
                         # Histogram of lead times
-                        fig_lead = px.histogram(sub_dates, x='lead_days', nbins=20, title='Lead Time Distribution (Promised)', labels={'lead_days':'Days'})
-                        fig_lead.update_layout(height=200, margin=dict(l=20,r=20,t=40,b=20))
-                        st.plotly_chart(fig_lead, use_container_width=True)
+                        with perf.span('figure', 'promised_lead_time'):
+                            fig_lead = px.histogram(sub_dates, x='lead_days', nbins=20, title='Lead Time Distribution (Promised)', labels={'lead_days':'Days'})
+                            fig_lead.update_layout(height=200, margin=dict(l=20,r=20,t=40,b=20))
+                            st.plotly_chart(fig_lead, use_container_width=True)
                 else:
                     with vpm2:
                         st.info("No valid dates for Lead Time calc.")
@@ -1499,31 +1397,20 @@ with T[4]:
         # Simple text search for products to find vendors
         srv_query = st.text_input("Enter Service/Item keyword (e.g. 'Laptop', 'Housekeeping')", "")
         if srv_query and 'product_name' in fil.columns:
-            mask = fil['product_name'].astype(str).str.lower().str.contains(srv_query.lower())
-            found = fil[mask]
+            search_index = get_search_index(df, (data_version, fy_key, load_entities), search_fields)
+            found = df[search_index.mask(srv_query, ['product_name']) & row_mask]
             if not found.empty:
                 # Group by Vendor
-                v_found = found.groupby(po_vendor_col).agg(
+                v_found = found.groupby(po_vendor_col, observed=True).agg(
                     Spend=(net_amount_col, 'sum'),
                     Matches=('product_name', 'count'),
-                    Buyers=('po_creator', lambda x: ', '.join(sorted(set(str(i) for i in x.dropna().unique() if str(i).strip() != ''))))
                 ).reset_index().sort_values('Spend', ascending=False)
+                v_found['Buyers'] = distinct_join(found, po_vendor_col, 'po_creator', index=v_found[po_vendor_col]).to_numpy()
                 v_found['Spend'] = v_found['Spend'].apply(lambda x: f"{x/1e7:.4f} Cr")
                 
                 # Merge contact details if available
                 if not vendor_master.empty:
-                    # Prepare join column
-                    v_found['VendorName_Norm'] = v_found[po_vendor_col].astype(str).str.lower().str.strip()
-                    
-                    # Deduplicate master data
-                    vm_unique = vendor_master.sort_values('Entity').drop_duplicates(subset=['VendorName_Norm'], keep='first')
-                    
-                    # Join
-                    v_found = pd.merge(v_found, vm_unique[['VendorName_Norm', 'Email', 'Phone', 'City', 'State']], 
-                                      on='VendorName_Norm', how='left')
-                    
-                    # Cleanup for display
-                    v_found = v_found.drop(columns=['VendorName_Norm'])
+                    v_found = vendor_dim.enrich(v_found, po_vendor_col, ['Email', 'Phone', 'City', 'State'])
                 
                 st.write(f"Vendors supplying '{srv_query}':")
                 st.dataframe(v_found, use_container_width=True)
@@ -1535,39 +1422,32 @@ with T[4]:
 
 
 # ----------------- Dept & Services -----------------
-with T[5]:
+if active_tab == TABS[5]:
     st.subheader('Dept & Services — PR Budget perspective')
-    dept_df = fil
     # replace expensive apply with column-wise bfill
-    dept_cols = [c for c in [pr_bu_col, pr_budget_desc_col, po_bu_col, po_budget_desc_col, pr_budget_code_col] if c]
-    if dept_cols:
-        # prepare as strings, replace empty with NaN then backfill
-        dept_df_local = dept_df[dept_cols].astype(str).replace({'': np.nan}).bfill(axis=1).iloc[:, 0].fillna('Unmapped / Missing')
-        dept_df = dept_df.copy()
-        dept_df['pr_department_unified'] = dept_df_local
-    else:
-        dept_df = dept_df.copy()
-        dept_df['pr_department_unified'] = 'Unmapped / Missing'
+    dept_cols = [c for c in [pr_bu_col, pr_budget_desc_col, po_bu_col, po_budget_desc_col, pr_budget_code_col] if c and c in fil.columns]
 
     def build_dept_df():
+        # only the columns this tab reads
+        dept_df = view([pr_number_col, purchase_doc_col, pr_budget_code_col, pr_budget_desc_col, net_amount_col, po_vendor_col])
+        dept_df['pr_department_unified'] = unified_department(fil[dept_cols])
         return dept_df
     dept_df = memoized_compute('dept_df', filter_signature, build_dept_df)
 
     if pr_budget_desc_col and pr_budget_desc_col in dept_df.columns and net_amount_col and net_amount_col in dept_df.columns:
         def build_desc():
-            df_ = dept_df.groupby(pr_budget_desc_col, dropna=False)[net_amount_col].sum().reset_index().sort_values(net_amount_col, ascending=False)
-            df_['cr'] = df_[net_amount_col]/1e7
-            return df_
+            return spend_by(dept_df, net_amount_col, pr_budget_desc_col, observed=True)
         agg_desc = memoized_compute('dept_desc', filter_signature, build_desc)
         top_desc = agg_desc.head(30)
         if not top_desc.empty:
-            fig_desc = px.bar(top_desc, x=pr_budget_desc_col, y='cr', title='PR Budget Description Spend (Top 30)', labels={pr_budget_desc_col: 'PR Budget Description', 'cr':'Cr'}, text='cr')
-            fig_desc.update_traces(texttemplate='%{text:.2f}', textposition='outside'); fig_desc.update_layout(xaxis_tickangle=-45)
-            st.plotly_chart(fig_desc, use_container_width=True)
+            with perf.span('figure', 'budget_desc_spend'):
+                fig_desc = px.bar(top_desc, x=pr_budget_desc_col, y='cr', title='PR Budget Description Spend (Top 30)', labels={pr_budget_desc_col: 'PR Budget Description', 'cr':'Cr'}, text='cr')
+                fig_desc.update_traces(texttemplate='%{text:.2f}', textposition='outside'); fig_desc.update_layout(xaxis_tickangle=-45)
+                st.plotly_chart(fig_desc, use_container_width=True)
 
             pick_desc = st.selectbox('Drill into PR Budget Description', ['-- none --'] + top_desc[pr_budget_desc_col].astype(str).tolist())
             if pick_desc and pick_desc != '-- none --':
-                sub = dept_df[dept_df[pr_budget_desc_col].astype(str) == pick_desc].copy()
+                sub = dept_df[text_equals(dept_df[pr_budget_desc_col], pick_desc)]
                 show_cols = [c for c in [pr_number_col, purchase_doc_col, pr_budget_code_col, pr_budget_desc_col, net_amount_col, po_vendor_col] if c in sub.columns]
                 st.dataframe(sub[show_cols].sort_values(net_amount_col, ascending=False).head(500), use_container_width=True)
     else:
@@ -1576,19 +1456,18 @@ with T[5]:
     st.markdown('---')
     if pr_budget_code_col and pr_budget_code_col in dept_df.columns and net_amount_col and net_amount_col in dept_df.columns:
         def build_code():
-            df_ = dept_df.groupby(pr_budget_code_col, dropna=False)[net_amount_col].sum().reset_index().sort_values(net_amount_col, ascending=False)
-            df_['cr'] = df_[net_amount_col]/1e7
-            return df_
+            return spend_by(dept_df, net_amount_col, pr_budget_code_col, observed=True)
         agg_code = memoized_compute('dept_code', filter_signature, build_code)
         top_code = agg_code.head(30)
         if not top_code.empty:
-            fig_code = px.bar(top_code, x=pr_budget_code_col, y='cr', title='PR Budget Code Spend (Top 30)', labels={pr_budget_code_col: 'PR Budget Code', 'cr':'Cr'}, text='cr')
-            fig_code.update_traces(texttemplate='%{text:.2f}', textposition='outside'); fig_code.update_layout(xaxis_tickangle=-45)
-            st.plotly_chart(fig_code, use_container_width=True)
+            with perf.span('figure', 'budget_code_spend'):
+                fig_code = px.bar(top_code, x=pr_budget_code_col, y='cr', title='PR Budget Code Spend (Top 30)', labels={pr_budget_code_col: 'PR Budget Code', 'cr':'Cr'}, text='cr')
+                fig_code.update_traces(texttemplate='%{text:.2f}', textposition='outside'); fig_code.update_layout(xaxis_tickangle=-45)
+                st.plotly_chart(fig_code, use_container_width=True)
 
             pick_code = st.selectbox('Drill into PR Budget Code', ['-- none --'] + top_code[pr_budget_code_col].astype(str).tolist())
             if pick_code and pick_code != '-- none --':
-                sub2 = dept_df[dept_df[pr_budget_code_col].astype(str) == pick_code].copy()
+                sub2 = dept_df[text_equals(dept_df[pr_budget_code_col], pick_code)]
                 show_cols2 = [c for c in [pr_number_col, purchase_doc_col, pr_budget_code_col, pr_budget_desc_col, net_amount_col, po_vendor_col] if c in sub2.columns]
                 st.dataframe(sub2[show_cols2].sort_values(net_amount_col, ascending=False).head(500), use_container_width=True)
     else:
@@ -1596,7 +1475,7 @@ with T[5]:
 
 
 # ----------------- Unit-rate Outliers -----------------
-with T[6]:
+if active_tab == TABS[6]:
     st.subheader('Unit-rate Outliers vs Historical Median')
     grp_candidates = [c for c in ['product_name','item_code','product name','item code'] if c in fil.columns]
     grp_by = st.selectbox('Group by', grp_candidates) if grp_candidates else None
@@ -1604,11 +1483,7 @@ with T[6]:
         cols_needed = [grp_by, po_unit_rate_col, purchase_doc_col, pr_number_col, po_vendor_col, 'item_description', po_create_col, net_amount_col]
         available_cols = [c for c in cols_needed if c in fil.columns]
         def build_unit_base():
-            z = fil[available_cols].dropna(subset=[grp_by, po_unit_rate_col]).copy()
-            med = z.groupby(grp_by)[po_unit_rate_col].median().rename('median_rate')
-            z = z.join(med, on=grp_by)
-            z['pctdev'] = (z[po_unit_rate_col] - z['median_rate']) / z['median_rate'].replace(0, np.nan)
-            return z
+            return unit_rate_deviation(fil[available_cols], grp_by, po_unit_rate_col)
         z = memoized_compute('unit_outlier', filter_signature + (grp_by,), build_unit_base)
         thr = st.slider('Outlier threshold (±%)', 10, 300, 50, 5)
         out = z[abs(z['pctdev']) >= thr/100.0].copy()
@@ -1616,13 +1491,11 @@ with T[6]:
         st.dataframe(out.sort_values('pctdev%', ascending=False), use_container_width=True)
 
 # ----------------- Forecast -----------------
-with T[7]:
+if active_tab == TABS[7]:
     st.subheader('Forecast Next Month Spend (SMA)')
     if trend_date_col and net_amount_col and net_amount_col in fil.columns:
         def build_monthly_total():
-            t = fil.loc[fil['_month_bucket'].notna(), ['_month_bucket', net_amount_col]].copy()
-            t['month'] = t['_month_bucket']
-            return t.groupby('month')[net_amount_col].sum().sort_index()
+            return monthly_spend(spend_rows([MONTH_KEY]), net_amount_col)
         m = memoized_compute('monthly_total', filter_signature, build_monthly_total)
         m_cr = m/1e7
         k = st.slider('Window (months)', 3, 12, 6)
@@ -1638,13 +1511,14 @@ with T[7]:
             'SpendCr': list(m_cr.values) + [np.nan],
             'SMA': list(sma.values) + [mu]
         })
-        fig = go.Figure();
-        fig.add_bar(x=fdf['Month'], y=fdf['SpendCr'], name='Actual (Cr)');
-        fig.add_scatter(x=fdf['Month'], y=fdf['SMA'], mode='lines+markers', name=f'SMA{k}')
-        st.plotly_chart(fig, use_container_width=True)
+        with perf.span('figure', 'forecast'):
+            fig = go.Figure();
+            fig.add_bar(x=fdf['Month'], y=fdf['SpendCr'], name='Actual (Cr)');
+            fig.add_scatter(x=fdf['Month'], y=fdf['SMA'], mode='lines+markers', name=f'SMA{k}')
+            st.plotly_chart(fig, use_container_width=True)
 
 # ----------------- Savings -----------------
-with T[8]:
+if active_tab == TABS[8]:
     st.subheader('Savings — PR → PO')
     # detect PR/PO rate/value/quantity columns
     pr_qty_col = safe_col(fil, ['pr_quantity','pr qty','pr_quantity','pr quantity','pr quantity','pr_quantity'])
@@ -1657,49 +1531,12 @@ with T[8]:
     if (pr_qty_col or pr_unit_rate_col or pr_value_col) and (po_qty_col or po_unit_rate_col or net_col):
         try:
             def build_savings():
-                z = fil.copy()
-                # ensure any categorical columns used are converted to safe types first
-                for col in [pr_qty_col, pr_unit_rate_col, pr_value_col, po_qty_col, po_unit_rate_col, net_col]:
-                    if col and col in z.columns and pd.api.types.is_categorical_dtype(z[col]):
-                        z[col] = z[col].astype(object)
-
-                # compute PR line value: prefer PR Value if present else PR Qty * PR Unit Rate
-                if pr_value_col and pr_value_col in z.columns:
-                    z['pr_line_value'] = pd.to_numeric(z[pr_value_col].astype(str).str.replace(',', ''), errors='coerce').fillna(0.0)
-                else: # safe multiplication with defaults
-                    pr_q = pd.to_numeric(z.get(pr_qty_col, 0).astype(str).str.replace(',', ''), errors='coerce').fillna(0.0)
-                    pr_r = pd.to_numeric(z.get(pr_unit_rate_col, 0).astype(str).str.replace(',', ''), errors='coerce').fillna(0.0)
-                    z['pr_line_value'] = pr_q * pr_r
-
-                # compute PO line net: prefer Net Amount if present else PO Qty * PO Unit Rate
-                if net_col and net_col in z.columns:
-                    z['po_line_value'] = pd.to_numeric(z[net_col].astype(str).str.replace(',', ''), errors='coerce').fillna(0.0)
-                else:
-                    po_q = pd.to_numeric(z.get(po_qty_col, 0).astype(str).str.replace(',', ''), errors='coerce').fillna(0.0)
-                    po_r = pd.to_numeric(z.get(po_unit_rate_col, 0).astype(str).str.replace(',', ''), errors='coerce').fillna(0.0)
-                    z['po_line_value'] = po_q * po_r
-
-                # unit rates numeric where available
-                z['pr_unit_rate_f'] = pd.to_numeric(z.get(pr_unit_rate_col, np.nan), errors='coerce')
-                z['po_unit_rate_f'] = pd.to_numeric(z.get(po_unit_rate_col, np.nan), errors='coerce')
-
-                # savings absolute and percent (use pr_line_value as denominator when >0)
-                z['savings_abs'] = z['pr_line_value'] - z['po_line_value']
-                z['savings_pct'] = np.where(z['pr_line_value'] > 0, (z['savings_abs'] / z['pr_line_value']) * 100.0, np.nan)
-                # per-unit pct if unit rates present
-                z['unit_rate_pct_saved'] = np.where(
-                    z['pr_unit_rate_f'] > 0,
-                    (z['pr_unit_rate_f'] - z['po_unit_rate_f']) / z['pr_unit_rate_f'] * 100.0,
-                    np.nan
-                )
-                # select display columns (only those that exist)
-                disp_cols = [
+                z = view([
                     pr_number_col, purchase_doc_col, pr_qty_col, pr_unit_rate_col, pr_value_col,
-                    po_qty_col, po_unit_rate_col, net_col, 'pr_line_value', 'po_line_value', 'savings_abs',
-                    'savings_pct', 'unit_rate_pct_saved', 'po_vendor', 'buyer_display', 'entity', 'procurement_category'
-                ]
-                disp_cols = [c for c in disp_cols if c and c in z.columns]
-                return z[disp_cols].copy()
+                    po_qty_col, po_unit_rate_col, net_col, 'po_vendor', 'buyer_display', 'entity', 'procurement_category'
+                ])
+                return savings_lines(z, pr_number_col, purchase_doc_col, pr_qty_col, pr_unit_rate_col, pr_value_col,
+                                     po_qty_col, po_unit_rate_col, net_col)
 
             # compute and memoize
             savings_df = memoized_compute('savings', filter_signature, build_savings)
@@ -1721,16 +1558,18 @@ with T[8]:
 
                 # Histogram % saved
                 st.subheader('Distribution of % Saved (per line)')
-                fig_hist = px.histogram(savings_df, x='savings_pct', nbins=50, title='% Saved per Line (PR→PO)', labels={'savings_pct':'% Saved'})
-                st.plotly_chart(fig_hist, use_container_width=True)
+                with perf.span('figure', 'savings_histogram'):
+                    fig_hist = px.histogram(savings_df, x='savings_pct', nbins=50, title='% Saved per Line (PR→PO)', labels={'savings_pct':'% Saved'})
+                    st.plotly_chart(fig_hist, use_container_width=True)
 
                 # Top savings by absolute value
                 st.subheader('Top Savings — Absolute (Cr)')
                 top_abs = savings_df.sort_values('savings_abs', ascending=False).head(20).copy()
                 top_abs['savings_cr'] = top_abs['savings_abs']/1e7
                 x_axis_for_top = 'po_vendor' if 'po_vendor' in top_abs.columns else purchase_doc_col
-                fig_top_abs = px.bar(top_abs, x=x_axis_for_top, y='savings_cr', hover_data=['pr_line_value','po_line_value'], title='Top 20 Savings by Absolute Value (Cr)')
-                st.plotly_chart(fig_top_abs, use_container_width=True)
+                with perf.span('figure', 'top_savings'):
+                    fig_top_abs = px.bar(top_abs, x=x_axis_for_top, y='savings_cr', hover_data=['pr_line_value','po_line_value'], title='Top 20 Savings by Absolute Value (Cr)')
+                    st.plotly_chart(fig_top_abs, use_container_width=True)
 
                 # Category level
                 st.subheader('Savings by Procurement Category')
@@ -1738,10 +1577,11 @@ with T[8]:
                     pc = savings_df.groupby('procurement_category', dropna=False)[['pr_line_value','po_line_value','savings_abs']].sum().reset_index()
                     pc['savings_cr'] = pc['savings_abs']/1e7
                     pc['pct_saved'] = np.where(pc['pr_line_value']>0, pc['savings_abs']/pc['pr_line_value']*100.0, np.nan)
-                    fig_pc = px.bar(pc.sort_values('savings_cr', ascending=False), x='procurement_category', y='savings_cr', text='pct_saved', title='Procurement Category — Savings (Cr)')
-                    fig_pc.update_traces(texttemplate='%{text:.2f}%')
-                    fig_pc.update_layout(xaxis_tickangle=-45)
-                    st.plotly_chart(fig_pc, use_container_width=True)
+                    with perf.span('figure', 'savings_by_category'):
+                        fig_pc = px.bar(pc.sort_values('savings_cr', ascending=False), x='procurement_category', y='savings_cr', text='pct_saved', title='Procurement Category — Savings (Cr)')
+                        fig_pc.update_traces(texttemplate='%{text:.2f}%')
+                        fig_pc.update_layout(xaxis_tickangle=-45)
+                        st.plotly_chart(fig_pc, use_container_width=True)
                 else:
                     st.info('Procurement Category not available for category breakdown.')
 
@@ -1749,16 +1589,17 @@ with T[8]:
                 if 'pr_unit_rate_f' in savings_df.columns and 'po_unit_rate_f' in savings_df.columns:
                     st.subheader('PR Unit Rate vs PO Unit Rate (scatter)')
                     sc = savings_df.dropna(subset=['pr_unit_rate_f','po_unit_rate_f']).copy()
-                    fig_sc = px.scatter(sc, x='pr_unit_rate_f', y='po_unit_rate_f', size='pr_line_value',
-                        hover_data=[pr_number_col, purchase_doc_col, 'po_vendor'],
-                        title='PR Unit Rate vs PO Unit Rate')
-                    st.plotly_chart(fig_sc, use_container_width=True)
+                    with perf.span('figure', 'unit_rate_scatter'):
+                        fig_sc = px.scatter(sc, x='pr_unit_rate_f', y='po_unit_rate_f', size='pr_line_value',
+                            hover_data=[pr_number_col, purchase_doc_col, 'po_vendor'],
+                            title='PR Unit Rate vs PO Unit Rate')
+                        st.plotly_chart(fig_sc, use_container_width=True)
 
                 st.markdown('---')
                 st.subheader('Detailed Savings List')
                 st.dataframe(savings_df.sort_values('savings_abs', ascending=False).reset_index(drop=True), use_container_width=True)
                 try:
-                    st.download_button('⬇️ Download Savings CSV', savings_df.to_csv(index=False), file_name='savings_detail.csv', mime='text/csv')
+                    export_button('⬇️ Download Savings', savings_df, 'savings_detail', 'export_savings')
                 except Exception:
                     pass
         except Exception as ex:
@@ -1769,42 +1610,44 @@ with T[8]:
 
 
 # ----------------- Vendor Scorecard -----------------
-with T[9]:
+if active_tab == TABS[9]:
     st.subheader('Vendor Scorecard')
     if po_vendor_col and po_vendor_col in fil.columns:
-        vendor = st.selectbox('Pick Vendor', sorted(fil[po_vendor_col].dropna().astype(str).unique().tolist()))
-        vd = fil[fil[po_vendor_col].astype(str) == str(vendor)].copy()
+        vendor = st.selectbox('Pick Vendor', text_values(fil[po_vendor_col]))
+        vd = fil[text_equals(fil[po_vendor_col], vendor)]
         spend = vd.get(net_amount_col, pd.Series(0)).sum()/1e7 if net_amount_col else 0
         upos = int(vd.get(purchase_doc_col, pd.Series(dtype=object)).nunique()) if purchase_doc_col else 0
         k1,k2 = st.columns(2); k1.metric('Spend (Cr)', f"{spend:.2f}"); k2.metric('Unique POs', upos)
         st.dataframe(vd.head(200), use_container_width=True)
 
 # ----------------- Search -----------------
-with T[10]:
+if active_tab == TABS[10]:
     st.subheader('🔍 Keyword Search')
-    search_df = df # search on processed data
-    valid_cols = [c for c in [pr_number_col, purchase_doc_col, 'product_name', po_vendor_col] if c in search_df.columns]
+    # full history, independent of the Financial Year / Entity selection and the sidebar filters
+    # (the preprocessed rows of every year and entity: same columns and vendor names as the other tabs)
+    if use_gold:
+        search_df = load_gold(source_stamp, gold_stamp, None, None, gold_file)
+    else:
+        search_df = load_preprocessed(source_stamp, None, None)
+    search_key = (data_version, None, None)
+    search_index = get_search_index(search_df, search_key, tuple(c for c in search_fields if c in search_df.columns))
+    search_filters = get_filter_index(search_df, search_key)
     query = st.text_input('Type vendor, product, PO, PR, etc.', '')
+    st.caption('Searches all years and entities (PR, PO, product, vendor and item description), '
+               'regardless of the Financial Year, Entity and sidebar filters.')
     cat_sel = st.multiselect('Filter by Procurement Category',
-        sorted(search_df.get('procurement_category', pd.Series(dtype=object)).dropna().astype(str).unique().tolist())) if 'procurement_category' in search_df.columns else []
+        sorted(str(x) for x in search_filters.values_in('procurement_category'))) if 'procurement_category' in search_df.columns else []
     vend_sel = st.multiselect('Filter by Vendor',
-        sorted(search_df.get(po_vendor_col, pd.Series(dtype=object)).dropna().astype(str).unique().tolist())) if po_vendor_col in search_df.columns else []
-
-    if query and valid_cols:
-        q = query.lower()
-        masks = []
-        for c in valid_cols:
-            masks.append(search_df[c].astype(str).str.lower().str.contains(q, na=False))
-        mask_any = np.logical_or.reduce(masks) if masks else pd.Series(False, index=search_df.index)
-        res = search_df[mask_any].copy()
-        if cat_sel:
-            res = res[res['procurement_category'].astype(str).isin(cat_sel)]
-        if vend_sel and po_vendor_col in df.columns:
-            res = res[res[po_vendor_col].astype(str).isin(vend_sel)]
-        st.write(f'Found {len(res)} rows')
-        st.dataframe(res, use_container_width=True)
+        sorted(str(x) for x in search_filters.values_in(po_vendor_col))) if po_vendor_col in search_df.columns else []
+
+    if query and search_index.columns:
+        # ranked: exact value, then prefix, word prefix, substring matches
+        base = search_filters.select({'procurement_category': cat_sel or None, po_vendor_col: vend_sel or None})
+        hits = search_index.search(query, base=base)
+        st.write(f'Found {len(hits)} rows')
+        show_table_window(search_df, hits, 'search_table', default_order='Relevance')
         try:
-            st.download_button('⬇️ Download Search Results', res.to_csv(index=False), file_name='search_results.csv', mime='text/csv')
+            export_button('⬇️ Download Search Results', lambda: search_df.iloc[hits], 'search_results', 'export_search')
         except Exception:
             pass
     else:
@@ -1812,17 +1655,16 @@ with T[10]:
 
 
 # ----------------- Full Data -----------------
-with T[11]:
+if active_tab == TABS[11]:
     st.subheader('Full Data — all filtered rows')
     try:
-        st.dataframe(fil.reset_index(drop=True), use_container_width=True)
-        csv = convert_df_to_csv(fil)
-        st.download_button('⬇️ Download full filtered data (CSV)', csv, file_name='p2p_full_filtered.csv', mime='text/csv')
+        show_table_window(df, np.flatnonzero(row_mask), 'full_data_table')
+        export_button('⬇️ Download full filtered data', fil, 'p2p_full_filtered', 'export_full_data')
     except Exception as e:
         st.error(f'Could not display full data: {e}')
 
 # ----------------- Geo Distribution -----------------
-with T[12]:
+if active_tab == TABS[12]:
     st.subheader('Geo Distribution of Processed Orders (India)')
     
     # Needs vendor master and filtered data
@@ -1846,23 +1688,11 @@ with T[12]:
         else:
              po_col_geo = purchase_doc_col
              
-        df_geo_base['VendorName_Norm'] = df_geo_base[po_vendor_col].astype(str).str.lower().str.strip()
-        
-        # 2. Prepare Vendor Master (Deduplicate to get one State per vendor)
-        # We prioritize the master entries. If duplicates, pick first.
-        # Ensure State is present
+        # 2. One State per vendor: the dimension's first master entry that has a State
         if 'State' in vendor_master.columns:
-            vm_geo = vendor_master[vendor_master['State'].notna()].copy()
-            vm_geo['VendorName_Norm'] = vm_geo['VendorName_Norm'].astype(str).str.lower().str.strip()
-            # Deduplicate
-            vm_geo = vm_geo.drop_duplicates(subset=['VendorName_Norm'], keep='first')
-            
-            # 3. Merge (Keep City if available)
-            cols_vm_geo = ['VendorName_Norm', 'State']
-            if 'City' in vm_geo.columns:
-                cols_vm_geo.append('City')
-                
-            merged_geo = pd.merge(df_geo_base, vm_geo[cols_vm_geo], on='VendorName_Norm', how='inner')
+            # 3. Join by vendor id (Keep City if available)
+            merged_geo = vendor_dim.enrich(df_geo_base, po_vendor_col, {'GeoState': 'State', 'GeoCity': 'City'})
+            merged_geo = merged_geo[merged_geo['State'].notna()]
             
             if not merged_geo.empty:
                 # 4. Aggregation by State
@@ -1921,39 +1751,40 @@ with T[12]:
                 
                 try:
                     # Base Choropleth
-                    fig_map = px.choropleth(
-                        geo_stats,
-                        geojson=geojson_url,
-                        featureidkey='properties.ST_NM',
-                        locations='State',
-                        color='PO_Count',
-                        color_continuous_scale='Reds',
-                        hover_data=['Percentage', 'PO_Count'],
-                        title='PO Count by Vendor State (Heatmap)'
-                    )
+                    with perf.span('figure', 'vendor_state_map'):
+                        fig_map = px.choropleth(
+                            geo_stats,
+                            geojson=geojson_url,
+                            featureidkey='properties.ST_NM',
+                            locations='State',
+                            color='PO_Count',
+                            color_continuous_scale='Reds',
+                            hover_data=['Percentage', 'PO_Count'],
+                            title='PO Count by Vendor State (Heatmap)'
+                        )
                     
-                    # Add Text Labels - Improved for Visibility
-                    # Only show labels with some significance to reduce overlapping
-                    df_labels = geo_stats.dropna(subset=['lat', 'lon']).copy()
+                        # Add Text Labels - Improved for Visibility
+                        # Only show labels with some significance to reduce overlapping
+                        df_labels = geo_stats.dropna(subset=['lat', 'lon']).copy()
                     
-                    # Heuristic: Filter overlap for very small percentages if clustered?
-                    # For now, just render them with a clearer font/background
-                    if not df_labels.empty:
-                        fig_map.add_trace(go.Scattergeo(
-                            lon=df_labels['lon'],
-                            lat=df_labels['lat'],
-                            text=df_labels['label'],
-                            mode='text',
-                            textfont=dict(color='black', size=12, family='Arial'),
-                            textposition='middle center',
-                            showlegend=False
-                        ))
-
-                    fig_map.update_geos(fitbounds="locations", visible=False)
-                    fig_map.update_traces(hovertemplate='<b>%{location}</b><br>PO Count: %{z}<br>Percentage: %{customdata[0]:.2f}%<extra></extra>')
-                    fig_map.update_layout(height=600, margin={"r":0,"t":30,"l":0,"b":0})
+                        # Heuristic: Filter overlap for very small percentages if clustered?
+                        # For now, just render them with a clearer font/background
+                        if not df_labels.empty:
+                            fig_map.add_trace(go.Scattergeo(
+                                lon=df_labels['lon'],
+                                lat=df_labels['lat'],
+                                text=df_labels['label'],
+                                mode='text',
+                                textfont=dict(color='black', size=12, family='Arial'),
+                                textposition='middle center',
+                                showlegend=False
+                            ))
+
+                        fig_map.update_geos(fitbounds="locations", visible=False)
+                        fig_map.update_traces(hovertemplate='<b>%{location}</b><br>PO Count: %{z}<br>Percentage: %{customdata[0]:.2f}%<extra></extra>')
+                        fig_map.update_layout(height=600, margin={"r":0,"t":30,"l":0,"b":0})
                     
-                    st.plotly_chart(fig_map, use_container_width=True)
+                        st.plotly_chart(fig_map, use_container_width=True)
                     
                     # --- DRILL DOWN SECTION ---
                     st.markdown("---")
@@ -2045,4 +1876,29 @@ with T[12]:
     else:
         st.info("Vendor Master data missing or no transactions available.")
 
+# ----------------- Performance telemetry -----------------
+perf.record('tab', active_tab, time.perf_counter() - tab_start_time, rows=len(fil), filters=describe_filters({
+    'FY': fy_key, 'Dates': date_range_key, 'Entity': sel_e, 'Buyer Type': sel_b, 'Category': sel_pc,
+    'Ordered By': sel_o, 'Vendor': sel_v, 'Item': sel_i, 'Item Type': item_type_opt,
+}))
+try:
+    perf.flush(TELEMETRY_PATH)
+except OSError as e:
+    logger.error(f"Could not write telemetry: {e}")
+
+if show_perf:
+    with perf_slot:
+        run_df = perf.frame()
+        st.caption(f"This run: {run_df.loc[run_df['kind'] == 'tab', 'seconds'].sum():.2f}s in {active_tab}, "
+                   f"{run_df.loc[run_df['kind'] == 'stage', 'seconds'].sum():.2f}s loading / filtering")
+        st.dataframe(run_df[['kind', 'name', 'seconds', 'cache', 'rows']].sort_values('seconds', ascending=False),
+                     use_container_width=True, hide_index=True)
+        st.caption(f"Shared frame: {shared_nbytes(df) / 2**20:,.1f} MB (read-only, one copy for all sessions); "
+                   f"this run's filtered rows: {0 if fil is df else shared_nbytes(fil) / 2**20:,.1f} MB")
+        memo = get_memo_store().stats()
+        st.caption(f"Memo store: {memo['entries']} entries, {memo['bytes'] / 2**20:.0f} / {memo['max_bytes'] / 2**20:.0f} MB, "
+                   f"hit rate {memo['hit_rate']:.0%}, {memo['evictions']} evictions")
+        st.markdown('**Slowest tabs (logged runs)**')
+        st.dataframe(slowest_tabs(load_telemetry(TELEMETRY_PATH)).head(20), use_container_width=True, hide_index=True)
+
 # EOF
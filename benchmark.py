@@ -0,0 +1,229 @@
+import argparse
+import io
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from analytics import distinct_join
+from convert_to_parquet import DATA_DIR, enforce_schema, load_p2p_frame, normalize_columns
+from cube import build_cube, cube_rows
+from export import write_export
+from filter_index import FilterIndex
+from open_state import snapshot_open_state
+from preprocessing import compute_buyer_type_vectorized, compute_item_type_vectorized, preprocess
+from search_index import SearchIndex
+from table_window import sort_rows
+from timing import DocumentTimings, percentile_table
+
+# ---------- CONFIG ----------
+RESULTS_PATH = DATA_DIR / "benchmark_results.json"
+DEFAULT_SCALES = (1, 10, 100)
+# Document keys made unique per synthetic copy, so distinct PR / PO counts scale with the rows
+KEY_COLUMNS = ('pr_number', 'purchase_doc')
+
+
+def synthesize(base: pd.DataFrame, scale: int) -> pd.DataFrame:
+    """`scale` stacked copies of `base`; copy k > 0 gets '-S<k>' appended to the document keys."""
+    if scale <= 1:
+        return base.copy()
+    parts = []
+    for k in range(scale):
+        part = base.copy()
+        if k:
+            for col in KEY_COLUMNS:
+                if col in part.columns:
+                    part[col] = part[col].astype(object).where(part[col].isna(), part[col].astype(str) + f'-S{k}')
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+
+def _excel_headers(df: pd.DataFrame) -> pd.DataFrame:
+    """Column names as they come out of the workbooks ("PR Number", "Po create Date", ...)."""
+    return df.rename(columns=lambda c: str(c).replace('_', ' ').title())
+
+
+# ---------- Stages ----------
+# Each stage reads the shared context dict and stores what later stages need in it. app.py's
+# per-tab build_* closures are not importable; their module-level building blocks are timed here.
+
+def _stage_normalize(ctx):
+    normalize_columns(_excel_headers(ctx['raw']))
+
+def _stage_enforce_schema(ctx):
+    enforce_schema(ctx['raw'].copy(), strict=True)
+
+def _stage_buyer_type(ctx):
+    compute_buyer_type_vectorized(ctx['raw'])
+
+def _stage_item_type(ctx):
+    compute_item_type_vectorized(ctx['raw'])
+
+def _stage_preprocess(ctx):
+    ctx['df'] = preprocess(ctx['raw'])
+
+def _stage_filter_index(ctx):
+    ctx['filter_index'] = FilterIndex(ctx['df'])
+
+def _stage_filter_select(ctx):
+    df, index = ctx['df'], ctx['filter_index']
+    vendors = df['po_vendor'].value_counts().index[:20].tolist() if 'po_vendor' in df.columns else []
+    ctx['rows'] = index.select({'Buyer.Type': ['Indirect'], 'po_vendor': vendors or None})
+
+def _stage_spend_cube(ctx):
+    ctx['cube'] = build_cube(ctx['df'], 'net_amount', 'po_create_date', 'pr_date_submitted',
+                             po_col='purchase_doc', pr_col='pr_number')
+
+def _stage_cube_rollup(ctx):
+    rows = cube_rows(ctx['cube'], {'Buyer.Type': ['Indirect']})
+    rows.groupby('_month_bucket')['net_amount'].sum()
+
+def _stage_search_index(ctx):
+    ctx['search_index'] = SearchIndex(ctx['df'])
+
+def _stage_search_query(ctx):
+    for query in ('laptop', 'pvt', 'PR00', 'a'):
+        ctx['search_index'].search(query)
+
+def _stage_document_timings(ctx):
+    timings = DocumentTimings(ctx['df'], 'pr_number', 'pr_date_submitted', 'purchase_doc', 'po_create_date',
+                              'po_approved_date', 'po_delivery_date')
+    percentile_table(timings.prs(ctx['rows']), 'po_creator', 'lead_days')
+
+def _stage_distinct_join(ctx):
+    distinct_join(ctx['df'], 'po_vendor', 'po_creator')
+
+def _stage_open_state(ctx):
+    snapshot_open_state(ctx['df'], 'BENCH')
+
+def _stage_sort_window(ctx):
+    sort_rows(ctx['df'], np.flatnonzero(ctx['rows']), 'net_amount', ascending=False)
+
+def _stage_export_csv(ctx):
+    write_export(ctx['df'], 'CSV', io.BytesIO())
+
+# name -> (function, stages whose output it needs)
+STAGES = {
+    'normalize_columns': (_stage_normalize, ()),
+    'enforce_schema': (_stage_enforce_schema, ()),
+    'compute_buyer_type_vectorized': (_stage_buyer_type, ()),
+    'compute_item_type_vectorized': (_stage_item_type, ()),
+    'preprocess': (_stage_preprocess, ()),
+    'filter_index.build': (_stage_filter_index, ('preprocess',)),
+    'filter_index.select': (_stage_filter_select, ('filter_index.build',)),
+    'spend_cube.build': (_stage_spend_cube, ('preprocess',)),
+    'spend_cube.rollup': (_stage_cube_rollup, ('spend_cube.build',)),
+    'search_index.build': (_stage_search_index, ('preprocess',)),
+    'search_index.query': (_stage_search_query, ('search_index.build',)),
+    'document_timings': (_stage_document_timings, ('filter_index.select',)),
+    'distinct_join': (_stage_distinct_join, ('preprocess',)),
+    'open_state.snapshot': (_stage_open_state, ('preprocess',)),
+    'table_window.sort': (_stage_sort_window, ('filter_index.select',)),
+    'export.csv': (_stage_export_csv, ('preprocess',)),
+}
+
+
+def _prepare(name: str, ctx: dict, done: set) -> None:
+    """Runs (untimed) the stages `name` depends on that have not run yet."""
+    for dep in STAGES[name][1]:
+        if dep not in done:
+            _prepare(dep, ctx, done)
+            STAGES[dep][0](ctx)
+            done.add(dep)
+
+
+def run_stage(fn, ctx, track_memory: bool) -> dict:
+    if track_memory:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    fn(ctx)
+    seconds = time.perf_counter() - start
+    peak = (tracemalloc.get_traced_memory()[1] - base) / 2**20 if track_memory else None
+    return {'seconds': round(seconds, 4), 'peak_mb': None if peak is None else round(peak, 1)}
+
+
+def run_benchmark(scales=DEFAULT_SCALES, stages=None, track_memory: bool = True) -> dict:
+    base = load_p2p_frame()
+    if base.empty:
+        raise SystemExit("No source data: run convert_to_parquet.py first.")
+    selected = [name for name in STAGES if not stages or name in stages]
+    results = []
+    if track_memory:
+        tracemalloc.start()
+    try:
+        for scale in scales:
+            ctx = {'raw': synthesize(base, scale)}
+            n_rows = len(ctx['raw'])
+            done = set()
+            for name in selected:
+                _prepare(name, ctx, done)
+                stat = run_stage(STAGES[name][0], ctx, track_memory)
+                done.add(name)
+                results.append({'scale': scale, 'rows': n_rows, 'stage': name, **stat})
+                mem = f" {stat['peak_mb']:>9.1f} MB" if track_memory else ''
+                print(f"{scale:>4}x {n_rows:>9,} rows  {name:<32} {stat['seconds']:>9.3f}s{mem}")
+            del ctx
+    finally:
+        if track_memory:
+            tracemalloc.stop()
+    return {
+        'commit': _git_commit(), 'timestamp': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+        'base_rows': int(len(base)), 'memory_tracked': track_memory, 'results': results,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=DATA_DIR, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or 'unknown'
+    except Exception:
+        return 'unknown'
+
+
+def load_runs(path: Path = RESULTS_PATH) -> list:
+    return json.loads(path.read_text()) if path.exists() else []
+
+
+def save_run(run: dict, path: Path = RESULTS_PATH) -> None:
+    """Appends `run` to the results file (a JSON list of runs, oldest first)."""
+    runs = load_runs(path) + [run]
+    path.write_text(json.dumps(runs, indent=1))
+
+
+def compare(previous: dict, current: dict) -> pd.DataFrame:
+    """Per (scale, stage): previous and current seconds and their ratio (> 1 = slower now)."""
+    key = ['scale', 'stage']
+    prev = pd.DataFrame(previous['results']).set_index(key)['seconds']
+    cur = pd.DataFrame(current['results']).set_index(key)['seconds']
+    out = pd.DataFrame({'previous_s': prev, 'current_s': cur}).dropna()
+    out['ratio'] = (out['current_s'] / out['previous_s']).round(2)
+    return out.reset_index()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard data pipeline on synthetic P2P data.")
+    parser.add_argument('--scales', type=int, nargs='+', default=list(DEFAULT_SCALES),
+                        help="dataset sizes as multiples of the current source data")
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), metavar='STAGE', help="only run these stages (default: all)")
+    parser.add_argument('--no-memory', action='store_true', help="skip tracemalloc peak-memory tracking (faster)")
+    parser.add_argument('--output', type=Path, default=RESULTS_PATH, help="JSON results file to append to")
+    parser.add_argument('--list', action='store_true', help="list the stages and exit")
+    args = parser.parse_args()
+    if args.list:
+        print('\n'.join(STAGES))
+        raise SystemExit
+    run = run_benchmark(args.scales, args.stages, track_memory=not args.no_memory)
+    previous = load_runs(args.output)
+    save_run(run, args.output)
+    print(f"Saved results to {args.output}")
+    if previous:
+        diff = compare(previous[-1], run)
+        if not diff.empty:
+            print(f"Compared with {previous[-1]['commit']} ({previous[-1]['timestamp']}):")
+            print(diff.to_string(index=False))
@@ -1,9 +1,58 @@
+import argparse
+import functools
+import hashlib
+import json
+import multiprocessing
+import operator
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 from pathlib import Path
 
 # ---------- CONFIG ----------
 DATA_DIR = Path(__file__).resolve().parent
 RAW_FILES = [("MEPL (3).xlsx", "MEPL"), ("MLPL (3).xlsx", "MLPL"), ("mmw (3).xlsx", "MMW"), ("mmpl (4).xlsx", "MMPL")]
+PARQUET_PATH = DATA_DIR / "p2p_data.parquet"
+# Rows are written date-sorted in bounded row groups so FY filters prune on row-group statistics
+ROW_GROUP_SIZE = 4096
+# Incremental mode: hive-partitioned dataset (entity_source_file=<ENT>/month=<YYYY-MM>/)
+DATASET_DIR = DATA_DIR / "p2p_dataset"
+MANIFEST_PATH = DATASET_DIR / "_manifest.json"
+PARTITION_MONTH_COL = 'month'
+NO_MONTH = 'none'
+
+# Declared column types (normalized names), enforced at conversion time so the Parquet file
+# carries real Arrow types: date -> timestamp, decimal -> float64, int -> nullable Int64,
+# category -> dictionary-encoded string, string -> plain string. Missing values stay null.
+# In pandas, category columns load as categoricals and string columns as TEXT_DTYPE.
+COLUMN_SCHEMA = {
+    'pr_number': 'string', 'pr_date_submitted': 'date', 'name': 'string', 'line': 'int',
+    'buyer_group': 'category', 'pr_prepared_by': 'category', 'procurement_category': 'category',
+    'item_code': 'string', 'version': 'string', 'product_name': 'category', 'item_description': 'string',
+    'buying_legal_entity': 'category', 'plant': 'category', 'wh': 'category', 'location': 'category',
+    'pr_quantity': 'decimal', 'currency': 'category', 'unit_rate': 'decimal', 'pr_value': 'decimal',
+    'pr_status': 'category', 'purchase_doc': 'string', 'po_create_date': 'date', 'po_delivery_date': 'date',
+    'po_vendor': 'category', 'po_quantity': 'decimal', 'po_unit_rate': 'decimal', 'net_amount': 'decimal',
+    'po_status': 'category', 'po_approved_date': 'date', 'receivedqty': 'decimal', 'pending_qty': 'decimal',
+    'po_orderer': 'category', 'last_po_number': 'string', 'last_po_date': 'date', 'last_po_vendor': 'category',
+    'pr_budget_code': 'category', 'pr_budget_description': 'category', 'po_budget_code': 'category',
+    'po_budget_description': 'category', 'pr_bussiness_unit': 'category', 'po_business_unit': 'category',
+    'pr_department': 'category', 'po_department': 'category', 'entity_source_file': 'category',
+}
+# Arrow-backed text (no Python object per row) with NaN for missing, like the object columns it replaces
+TEXT_DTYPE = pd.StringDtype('pyarrow', na_value=np.nan)
+_TEXT_TYPES = {pa.string(): TEXT_DTYPE, pa.large_string(): TEXT_DTYPE}
+_NULL_TEXT = ['', 'nan', 'NaN', 'None', 'NaT', '<NA>']
+# Candidate columns (first present wins), matching the dashboard's safe_col lookups
+PR_DATE_COLUMNS = ['pr_date_submitted', 'pr_date']
+PO_DATE_COLUMNS = ['po_create_date', 'po_created_date']
+ENTITY_COLUMNS = ['entity', 'company', 'brand', 'entity_name', 'entity_source_file']
 
 def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     """Vectorized, robust column normalizer."""
@@ -30,12 +79,53 @@ def _resolve_path(fn: str) -> Path:
     candidate = DATA_DIR / fn
     return candidate
 
+def excel_engine() -> str:
+    """python-calamine (Rust, streaming) when it is installed, else openpyxl (read-only mode)."""
+    try:
+        import python_calamine  # noqa: F401
+        return 'calamine'
+    except ImportError:
+        return 'openpyxl'
+
 def _read_excel(path: Path, entity: str) -> pd.DataFrame:
     # skiprows=1 was in original — preserve
-    df = pd.read_excel(path, skiprows=1, engine='openpyxl')
+    df = pd.read_excel(path, skiprows=1, engine=excel_engine())
     df['entity_source_file'] = entity
     return df
 
+def _timed_read(reader, path: Path, entity: str):
+    start = time.perf_counter()
+    frame = reader(path, entity)
+    return frame, time.perf_counter() - start
+
+def read_workbooks(jobs, reader=_read_excel, max_workers: int | None = None) -> list:
+    """reader(path, entity) for every (path, entity) job, one workbook per worker process,
+    so a refresh takes about as long as its largest file. Workers are spawned (not forked),
+    which is safe from the threaded Streamlit server; `reader` must be a module-level function.
+    Prints per-file timings and returns [(entity, frame or None, seconds, error or None)] in job order."""
+    jobs = list(jobs)
+    if max_workers is None:
+        max_workers = min(len(jobs), os.cpu_count() or 1)
+    results = []
+    if max_workers <= 1:
+        for path, entity in jobs:
+            try:
+                results.append((entity, *_timed_read(reader, path, entity), None))
+            except Exception as exc:
+                results.append((entity, None, 0.0, exc))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [pool.submit(_timed_read, reader, path, entity) for path, entity in jobs]
+            for (path, entity), future in zip(jobs, futures):
+                try:
+                    results.append((entity, *future.result(), None))
+                except Exception as exc:
+                    results.append((entity, None, 0.0, exc))
+    for (path, _), (entity, frame, seconds, error) in zip(jobs, results):
+        if error is None:
+            print(f"{entity}: read {Path(path).name} ({len(frame)} rows) in {seconds:.1f}s")
+    return results
+
 def _finalize_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
     if not frames:
         return pd.DataFrame()
@@ -47,31 +137,322 @@ def _finalize_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
             x[c] = pd.to_datetime(x[c], errors='coerce')
     return x
 
+def _clean_text(s: pd.Series) -> pd.Series:
+    """Stringify non-null values (mixed Excel cells) and null out blanks / legacy 'nan' literals."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        s = s.astype(object)
+    out = s.where(s.isna(), s.astype(str))
+    return out.mask(out.isin(_NULL_TEXT)).astype(object)
+
+def _numeric(s: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        return s
+    return pd.to_numeric(_clean_text(s).str.replace(',', '', regex=False), errors='coerce')
+
+def _conforms(s: pd.Series, kind: str) -> bool:
+    if kind == 'date':
+        return pd.api.types.is_datetime64_any_dtype(s)
+    if kind == 'decimal':
+        return pd.api.types.is_float_dtype(s)
+    if kind == 'int':
+        return str(s.dtype) == 'Int64'
+    if kind == 'category':
+        return isinstance(s.dtype, pd.CategoricalDtype)
+    return s.dtype == TEXT_DTYPE
+
+def enforce_schema(df: pd.DataFrame, strict: bool = True) -> pd.DataFrame:
+    """Casts columns to COLUMN_SCHEMA. strict=False only touches columns whose dtype does not
+    already conform (cheap on files written by this converter, upgrades legacy all-str files)."""
+    if df is None or df.empty:
+        return df
+    for col in df.columns:
+        kind = COLUMN_SCHEMA.get(col)
+        s = df[col]
+        if kind is None:
+            # undeclared columns keep the old behaviour: text as str, but with real nulls
+            if strict and s.dtype == 'object':
+                df[col] = _clean_text(s).astype(TEXT_DTYPE)
+            continue
+        if not strict and _conforms(s, kind):
+            continue
+        if kind == 'date':
+            df[col] = s if pd.api.types.is_datetime64_any_dtype(s) else pd.to_datetime(_clean_text(s), errors='coerce')
+        elif kind == 'decimal':
+            df[col] = _numeric(s).astype('float64')
+        elif kind == 'int':
+            df[col] = _numeric(s).round().astype('Int64')
+        elif kind == 'category':
+            df[col] = _clean_text(s).astype('category')
+        else:
+            df[col] = _clean_text(s).astype(TEXT_DTYPE)
+    return df
+
 def convert_all_to_parquet(file_list=None):
     if file_list is None:
         file_list = RAW_FILES
-    frames = []
+    jobs = []
     for fn, ent in file_list:
         path = _resolve_path(fn)
         if not path.exists():
             print(f"File not found: {path}")
             continue
-        try:
-            frames.append(_read_excel(path, ent))
-        except Exception as exc:
-            print(f"Failed to read {path.name}: {exc}")
-    
-    df = _finalize_frames(frames)
+        jobs.append((path, ent))
+    frames = []
+    for (path, _), (ent, frame, _, error) in zip(jobs, read_workbooks(jobs)):
+        if error is not None:
+            print(f"Failed to read {path.name}: {error}")
+            continue
+        frames.append(frame)
     
-    # Ensure all object columns are converted to strings to avoid Parquet errors
-    for col in df.columns:
-        if df[col].dtype == 'object':
-            df[col] = df[col].astype(str)
+    df = _sort_for_pruning(enforce_schema(_finalize_frames(frames)))
 
     # Save as a single parquet file
-    output_path = DATA_DIR / "p2p_data.parquet"
-    df.to_parquet(output_path)
+    output_path = PARQUET_PATH
+    df.to_parquet(output_path, index=False, row_group_size=ROW_GROUP_SIZE)
     print(f"Successfully converted all Excel files to {output_path}")
+    # open PR / pending PO state follows the new file (keys still open keep their opened_at)
+    from open_state import rebuild_open_state
+    try:
+        rebuild_open_state()
+    except Exception as exc:
+        print(f"Could not rebuild open PR / PO state: {exc}")
+
+# ---------- Incremental, partitioned ingestion ----------
+
+def fingerprint_file(path: Path, with_hash: bool = True) -> dict:
+    """Size/mtime fingerprint of a source workbook, plus a content hash when requested."""
+    stat = path.stat()
+    fp = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        h = hashlib.sha256()
+        with open(path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b''):
+                h.update(chunk)
+        fp['sha256'] = h.hexdigest()
+    return fp
+
+def _load_manifest() -> dict:
+    if MANIFEST_PATH.exists():
+        try:
+            return json.loads(MANIFEST_PATH.read_text())
+        except Exception as exc:
+            print(f"Ignoring unreadable manifest {MANIFEST_PATH.name}: {exc}")
+    return {}
+
+def _save_manifest(manifest: dict) -> None:
+    DATASET_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = MANIFEST_PATH.with_suffix('.tmp')
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    tmp.replace(MANIFEST_PATH)
+
+def _source_changed(path: Path, prev: dict | None) -> tuple[bool, dict]:
+    """Cheap stat check first; only hash when size/mtime moved."""
+    stat_fp = fingerprint_file(path, with_hash=False)
+    if prev and prev.get('size') == stat_fp['size'] and prev.get('mtime_ns') == stat_fp['mtime_ns']:
+        return False, {**prev, **stat_fp}
+    fp = fingerprint_file(path)
+    if prev and prev.get('sha256') == fp['sha256']:
+        return False, {**prev, **fp}
+    return True, fp
+
+def _first_present(names, candidates):
+    return next((c for c in candidates if c in names), None)
+
+def _fy_basis_date(df: pd.DataFrame) -> pd.Series:
+    """PR date, falling back to PO create date (same basis as the dashboard's FY filter)."""
+    d = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+    for c in [_first_present(df.columns, PR_DATE_COLUMNS), _first_present(df.columns, PO_DATE_COLUMNS)]:
+        if c:
+            d = d.fillna(df[c])
+    return d
+
+def _sort_for_pruning(df: pd.DataFrame) -> pd.DataFrame:
+    order = _fy_basis_date(df).sort_values(kind='stable').index
+    return df.loc[order].reset_index(drop=True)
+
+def partition_month(df: pd.DataFrame) -> pd.Series:
+    """'YYYY-MM' of the FY basis date."""
+    return _fy_basis_date(df).dt.strftime('%Y-%m').fillna(NO_MONTH)
+
+def _align_entity_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Give every partition the same column types, so partitions unify on read."""
+    df = enforce_schema(df)
+    for col in df.columns:
+        # an undeclared all-empty column reads as float64 in one workbook but as text in
+        # another; store it untyped (Arrow null) so it unifies with either
+        if col not in COLUMN_SCHEMA and df[col].isna().all():
+            df[col] = pd.Series(None, index=df.index, dtype=object)
+    return df
+
+def _write_entity_partition(df: pd.DataFrame, entity: str) -> None:
+    """Atomically replace one entity's month partitions."""
+    df = _sort_for_pruning(df)
+    df[PARTITION_MONTH_COL] = partition_month(df)
+    df = df.drop(columns=['entity_source_file'], errors='ignore')
+    target = DATASET_DIR / f"entity_source_file={entity}"
+    staging = DATASET_DIR / f".staging-{entity}"
+    shutil.rmtree(staging, ignore_errors=True)
+    pq.write_to_dataset(pa.Table.from_pandas(df, preserve_index=False), staging,
+                        partition_cols=[PARTITION_MONTH_COL], basename_template='part-{i}.parquet',
+                        row_group_size=ROW_GROUP_SIZE)
+    shutil.rmtree(target, ignore_errors=True)
+    staging.rename(target)
+
+def convert_incremental(file_list=None, force: bool = False) -> dict:
+    """Re-parse only the entity workbooks whose fingerprint changed and rewrite their partitions."""
+    if file_list is None:
+        file_list = RAW_FILES
+    manifest = _load_manifest()
+    refreshed = []
+    jobs, fingerprints = [], {}
+    for fn, ent in file_list:
+        path = _resolve_path(fn)
+        if not path.exists():
+            print(f"File not found: {path}")
+            continue
+        changed, fp = _source_changed(path, manifest.get(ent))
+        if not changed and not force and (DATASET_DIR / f"entity_source_file={ent}").exists():
+            manifest[ent] = fp
+            print(f"{ent}: unchanged, skipping")
+            continue
+        jobs.append((path, ent))
+        fingerprints[ent] = fp
+    converted = {}
+    # changed workbooks are read concurrently, then written one partition at a time
+    for (path, _), (ent, raw, read_seconds, error) in zip(jobs, read_workbooks(jobs)):
+        fp = fingerprints[ent]
+        if error is not None:
+            print(f"Failed to convert {path.name}: {error}")
+            continue
+        start = time.time()
+        try:
+            df = _align_entity_frame(_finalize_frames([raw]))
+            _write_entity_partition(df, ent)
+        except Exception as exc:
+            print(f"Failed to convert {path.name}: {exc}")
+            continue
+        if 'sha256' not in fp:
+            fp = fingerprint_file(path)
+        manifest[ent] = {**fp, 'file': path.name, 'rows': int(len(df)), 'converted_at': pd.Timestamp.now().isoformat()}
+        refreshed.append(ent)
+        converted[ent] = df
+        print(f"{ent}: wrote {len(df)} rows in {time.time() - start:.1f}s (read {read_seconds:.1f}s)")
+    _save_manifest(manifest)
+    # open PR / pending PO state follows the refreshed snapshots (built in full on first run)
+    from open_state import OPEN_STATE_PATH, rebuild_open_state, update_open_state
+    try:
+        if OPEN_STATE_PATH.exists():
+            # also rewritten when nothing changed: the app only trusts a state newer than the manifest
+            update_open_state(converted)
+        else:
+            rebuild_open_state()
+    except Exception as exc:
+        print(f"Could not update open PR / PO state: {exc}")
+    print(f"Incremental refresh done ({', '.join(refreshed) or 'no changes'}) -> {DATASET_DIR}")
+    return manifest
+
+def _unified_schema(dataset: ds.Dataset) -> pa.Schema:
+    """Per-entity partitions can disagree on a column's type (numbers in one workbook, text in
+    another); numeric types widen, anything else falls back to string like the monolithic concat."""
+    schemas = [f.physical_schema for f in dataset.get_fragments()]
+    fields = {}
+    for schema in schemas + [dataset.schema]:
+        for field in schema:
+            fields.setdefault(field.name, []).append(field.type)
+    out = []
+    for name, types in fields.items():
+        try:
+            typ = pa.unify_schemas([pa.schema([(name, t)]) for t in types], promote_options='permissive').field(name).type
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            typ = pa.string()
+        out.append(pa.field(name, typ))
+    return pa.schema(out)
+
+def open_p2p_dataset() -> ds.Dataset | None:
+    """The partitioned dataset when present, else the single Parquet file (None if neither)."""
+    if DATASET_DIR.exists():
+        dataset = ds.dataset(DATASET_DIR, format='parquet', partitioning='hive')
+        return ds.dataset(DATASET_DIR, format='parquet', partitioning='hive', schema=_unified_schema(dataset))
+    if PARQUET_PATH.exists():
+        return ds.dataset(PARQUET_PATH, format='parquet')
+    return None
+
+def build_row_filter(schema: pa.Schema, start=None, end=None, entities=None) -> ds.Expression | None:
+    """Arrow filter for the FY window (PR date, else PO create date) and entity selection;
+    the reader uses it to skip partitions and row groups via their statistics."""
+    exprs = []
+    if start is not None and end is not None:
+        def in_range(col):
+            return (ds.field(col) >= start) & (ds.field(col) <= end)
+        is_ts = lambda c: c is not None and pa.types.is_timestamp(schema.field(c).type)
+        pr = _first_present(schema.names, PR_DATE_COLUMNS)
+        po = _first_present(schema.names, PO_DATE_COLUMNS)
+        if is_ts(pr) and is_ts(po):
+            exprs.append(in_range(pr) | (ds.field(pr).is_null() & in_range(po)))
+        elif is_ts(pr) and po is None:
+            exprs.append(in_range(pr))
+        elif is_ts(po) and pr is None:
+            exprs.append(in_range(po))
+        if PARTITION_MONTH_COL in schema.names:
+            exprs.append((ds.field(PARTITION_MONTH_COL) >= start.strftime('%Y-%m'))
+                         & (ds.field(PARTITION_MONTH_COL) <= end.strftime('%Y-%m')))
+    entity_col = _first_present(schema.names, ENTITY_COLUMNS)
+    if entities and entity_col:
+        exprs.append(ds.field(entity_col).isin(list(entities)))
+    return functools.reduce(operator.and_, exprs) if exprs else None
+
+def scan_frame(dataset: ds.Dataset, columns=None, start=None, end=None, entities=None, enforce: bool = True) -> pd.DataFrame:
+    """Reads only `columns` (None = all) for rows in the FY window / entity selection."""
+    names = [c for c in dataset.schema.names if c != PARTITION_MONTH_COL and (columns is None or c in columns)]
+    table = dataset.to_table(columns=names, filter=build_row_filter(dataset.schema, start, end, entities))
+    df = table.to_pandas(types_mapper=_TEXT_TYPES.get)
+    return enforce_schema(df, strict=False) if enforce else df
+
+def load_p2p_frame(columns=None, start=None, end=None, entities=None) -> pd.DataFrame:
+    dataset = open_p2p_dataset()
+    if dataset is None:
+        return pd.DataFrame()
+    return scan_frame(dataset, columns, start, end, entities)
+
+def source_fingerprint() -> str:
+    """Identity of the current source data: the manifest's content hashes for the partitioned
+    dataset, else the single file's size + Parquet footer (row counts, chunk sizes, statistics),
+    which survives a git checkout unlike mtime."""
+    if MANIFEST_PATH.exists():
+        manifest = _load_manifest()
+        parts = sorted(f"{ent}:{fp.get('sha256', '')}:{fp.get('rows', '')}" for ent, fp in manifest.items())
+    elif PARQUET_PATH.exists():
+        parts = [f"{PARQUET_PATH.stat().st_size}", str(pq.read_metadata(PARQUET_PATH).to_dict())]
+    else:
+        return ''
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:16]
+
+def list_entities() -> list[str]:
+    """Distinct entity values, read from the entity column alone."""
+    dataset = open_p2p_dataset()
+    entity_col = _first_present(dataset.schema.names, ENTITY_COLUMNS) if dataset is not None else None
+    if entity_col is None:
+        return []
+    values = dataset.to_table(columns=[entity_col]).column(0).to_pandas().dropna().astype(str).str.strip()
+    return sorted(v for v in values.unique() if v != '')
 
 if __name__ == "__main__":
-    convert_all_to_parquet()
+    parser = argparse.ArgumentParser(description="Convert the entity Excel reports to Parquet.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only re-parse changed workbooks and write a partitioned dataset")
+    parser.add_argument('--force', action='store_true', help="with --incremental, re-parse every workbook")
+    parser.add_argument('--no-gold', action='store_true', help="skip rebuilding the preprocessed artifact")
+    parser.add_argument('--no-vendor-matches', action='store_true', help="skip refreshing the vendor match table")
+    args = parser.parse_args()
+    start = time.time()
+    if args.incremental:
+        convert_incremental(force=args.force)
+    else:
+        convert_all_to_parquet()
+    print(f"Ingestion took {time.time() - start:.1f}s")
+    if not args.no_gold:
+        from preprocessing import build_gold_artifact
+        build_gold_artifact()
+    if not args.no_vendor_matches:
+        from vendor_match import refresh_match_table
+        refresh_match_table()
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+# Grain of the spend cube besides the two month keys (every sidebar filter except Item / Product)
+CUBE_DIMENSIONS = ('entity', 'procurement_category', 'Buyer.Type', 'po_creator', 'buyer_display', 'Item.Type', 'po_vendor')
+MONTH_KEY = '_month_bucket'   # spend month (PO create date, else PR date) used by the trend charts
+BASIS_KEY = '_basis_month'    # month of the date-range basis column, for the Date range filter
+
+
+def _month(s: pd.Series) -> pd.Series:
+    return s.dt.to_period('M').dt.to_timestamp()
+
+
+def _codes_per_group(group_ids: np.ndarray, codes: np.ndarray, n_groups: int) -> np.ndarray:
+    """Object array holding, per group, the sorted distinct non-null codes seen in it."""
+    out = np.empty(n_groups, dtype=object)
+    if n_groups == 0:
+        return out
+    keep = codes >= 0
+    pairs = np.unique(np.stack([group_ids[keep], codes[keep]]), axis=1)  # sorted by group, then code
+    bounds = np.searchsorted(pairs[0], np.arange(1, n_groups))
+    for i, part in enumerate(np.split(pairs[1].astype(np.int32), bounds)):
+        out[i] = part
+    return out
+
+
+def build_cube(df: pd.DataFrame, amount_col: str, month_col: str | None, basis_col: str | None,
+               po_col: str | None = None, pr_col: str | None = None) -> pd.DataFrame:
+    """Pre-aggregates line items to (month, basis month, CUBE_DIMENSIONS).
+
+    Each cube row carries the spend sum, the line count and the sorted distinct
+    PO / PR codes (int32, from one factorize over `df`) so distinct counts survive
+    any roll-up. Dimension columns keep their dtype, so grouping the cube behaves
+    like grouping the line items (same categories, same null handling)."""
+    keys = {
+        MONTH_KEY: _month(df[month_col]) if month_col else pd.Series(pd.NaT, index=df.index),
+        BASIS_KEY: _month(df[basis_col]) if basis_col else pd.Series(pd.NaT, index=df.index),
+    }
+    for col in CUBE_DIMENSIONS:
+        if col in df.columns:
+            keys[col] = df[col]
+    frame = pd.DataFrame(keys)
+    frame[amount_col] = df[amount_col]
+    frame['_lines'] = 1
+    grouped = frame.groupby(list(keys), dropna=False, observed=True, sort=False)
+    cube = grouped.agg(**{amount_col: (amount_col, 'sum'), 'lines': ('_lines', 'sum')}).reset_index()
+    group_ids = grouped.ngroup().to_numpy()  # same order as the sort=False aggregation
+    for name, col in (('po_codes', po_col), ('pr_codes', pr_col)):
+        if col and col in df.columns:
+            cube[name] = _codes_per_group(group_ids, pd.factorize(df[col])[0], len(cube))
+    return cube
+
+
+def cube_rows(cube: pd.DataFrame, selections: dict, basis_range: tuple | None = None) -> pd.DataFrame:
+    """Cube rows matching the sidebar selections (None = whole dimension) and, when
+    given, a month-aligned (first_month, last_month) range on the basis month."""
+    mask = np.ones(len(cube), dtype=bool)
+    for col, values in selections.items():
+        if values is not None and col in cube.columns:
+            mask &= cube[col].isin(values).to_numpy()
+    if basis_range is not None:
+        lo, hi = basis_range
+        mask &= ((cube[BASIS_KEY] >= lo) & (cube[BASIS_KEY] <= hi)).to_numpy()
+    return cube[mask]
+
+
+def distinct_count(rows: pd.DataFrame, codes_col: str) -> int:
+    """Exact distinct PO / PR count over a roll-up of cube rows."""
+    if codes_col not in rows.columns or rows.empty:
+        return 0
+    return int(len(np.unique(np.concatenate(rows[codes_col].to_numpy()))))
+
+
+def month_aligned_range(start: pd.Timestamp, end: pd.Timestamp, lo: pd.Timestamp, hi: pd.Timestamp):
+    """Basis-month range equivalent to a day-level [start, end] filter, or None when the
+    cube cannot answer it. `lo` / `hi` are the earliest / latest basis dates present."""
+    if start <= lo and end >= hi:
+        return lo.to_period('M').to_timestamp(), hi.to_period('M').to_timestamp()
+    if start == start.to_period('M').to_timestamp() and end.normalize() == end.to_period('M').to_timestamp(how='end').normalize():
+        return start.to_period('M').to_timestamp(), end.to_period('M').to_timestamp()
+    return None
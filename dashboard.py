@@ -4,6 +4,8 @@ import plotly.express as px
 import plotly.graph_objects as go
 import os
 
+from vendor_match import canonical_name, core_name
+
 # --- Page Configuration ---
 st.set_page_config(
     page_title="Procurement & Vendor Spend Dashboard",
@@ -46,6 +48,9 @@ def load_data():
             for col in vendors.columns:
                  if vendors[col].dtype == 'object':
                      vendors[col] = vendors[col].astype(str).str.strip()
+            # Match keys: legal-form folded name ("Pvt. Ltd." == "Private Limited") and its core
+            vendors['MatchName'] = vendors['Vendor Name'].map(canonical_name)
+            vendors['MatchCore'] = vendors['MatchName'].map(core_name)
         else:
             vendors = pd.DataFrame()
 
@@ -197,13 +202,11 @@ with tab_vendor:
             
             # --- Vendor Master Info ---
             if not vendors_df.empty:
-                # Fuzzy/Normalized Matching
-                clean_target = selected_vendor_name.upper()
-                # Create temp column for matching
-                vendors_df['MatchName'] = vendors_df['Vendor Name'].str.upper()
-                
-                # Check for direct match
+                # Normalized Matching: canonical name, then the name without legal words
+                clean_target = canonical_name(selected_vendor_name)
                 match = vendors_df[vendors_df['MatchName'] == clean_target]
+                if match.empty and core_name(clean_target):
+                    match = vendors_df[vendors_df['MatchCore'] == core_name(clean_target)]
                 
                 if not match.empty:
                     info = match.iloc[0]
@@ -0,0 +1,80 @@
+import gzip
+import io
+import tempfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# label -> (file extension, mime type)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+CHUNK_ROWS = 50_000
+EXCEL_MAX_ROWS = 1_048_575  # one sheet, minus the header row
+# exports larger than this spill from memory to a temporary file
+SPOOL_BYTES = 32 * 1024 * 1024
+
+
+def _chunks(frame: pd.DataFrame, chunk_rows: int = CHUNK_ROWS):
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def _write_csv(frame: pd.DataFrame, out) -> None:
+    text = io.TextIOWrapper(out, encoding='utf-8', newline='', write_through=True)
+    for i, chunk in enumerate(_chunks(frame)):
+        chunk.to_csv(text, index=False, header=(i == 0))
+    if frame.empty:
+        frame.to_csv(text, index=False)
+    text.detach()
+
+
+def _write_parquet(frame: pd.DataFrame, out) -> None:
+    schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    with pq.ParquetWriter(out, schema) as writer:
+        for chunk in _chunks(frame):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        if frame.empty:
+            writer.write_table(schema.empty_table())
+
+
+def _write_excel(frame: pd.DataFrame, out) -> None:
+    if len(frame) > EXCEL_MAX_ROWS:
+        raise ValueError(f"{len(frame):,} rows do not fit in one Excel sheet; use CSV or Parquet")
+    with pd.ExcelWriter(out, engine='openpyxl') as writer:
+        row = 0
+        for i, chunk in enumerate(_chunks(frame)):
+            chunk.to_excel(writer, index=False, header=(i == 0), startrow=row)
+            row += len(chunk) + (i == 0)
+        if frame.empty:
+            frame.to_excel(writer, index=False)
+
+
+def write_export(frame: pd.DataFrame, fmt: str, out) -> None:
+    """Writes `frame` to the binary file `out` in EXPORT_FORMATS format `fmt`, chunk by chunk."""
+    if fmt == 'CSV':
+        _write_csv(frame, out)
+    elif fmt == 'CSV (gzip)':
+        with gzip.GzipFile(fileobj=out, mode='wb') as gz:
+            _write_csv(frame, gz)
+    elif fmt == 'Parquet':
+        _write_parquet(frame, out)
+    elif fmt == 'Excel':
+        _write_excel(frame, out)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+def export_file(frame, fmt: str):
+    """Export of `frame` (or of the frame returned by a zero-argument callable, so the
+    rows are only selected on demand) as a rewound temporary file. Nothing is cached:
+    the caller streams it out and the file is gone once closed."""
+    if callable(frame):
+        frame = frame()
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    write_export(frame, fmt, out)
+    out.seek(0)
+    return out
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+# Sidebar dimensions that are filtered by value membership
+FILTER_DIMENSIONS = ('Buyer.Type', 'entity', 'procurement_category', 'po_creator', 'po_vendor', 'product_name', 'Item.Type')
+
+
+class FilterIndex:
+    """Inverted index (value -> row positions) over the sidebar filter dimensions.
+
+    Built once per loaded frame; a filter combination is then one boolean mask per
+    dimension (set from the postings of the selected values) ANDed together, instead
+    of an `isin` scan over the full column for every rerun. Masks are positional, so
+    they apply to any copy of the frame the index was built from."""
+
+    def __init__(self, df: pd.DataFrame, columns=FILTER_DIMENSIONS):
+        self.n_rows = len(df)
+        self._dims = {}
+        for col in columns:
+            if col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col], sort=False)  # NaN -> -1
+            codes = codes.astype(np.int32, copy=False)
+            order = np.argsort(codes, kind='stable').astype(np.int32)
+            n_missing = int((codes < 0).sum())
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            offsets = np.concatenate(([0], np.cumsum(counts))) + n_missing
+            lookup = {str(v): i for i, v in enumerate(uniques)}
+            self._dims[col] = (codes, np.asarray(uniques, dtype=object), lookup, order, offsets)
+
+    def __contains__(self, col) -> bool:
+        return col in self._dims
+
+    def mask(self, col: str, values) -> np.ndarray:
+        """Rows whose `col` is one of `values`; cost is proportional to the matching rows."""
+        out = np.zeros(self.n_rows, dtype=bool)
+        _, _, lookup, order, offsets = self._dims[col]
+        for v in values:
+            i = lookup.get(str(v))
+            if i is not None:
+                out[order[offsets[i]:offsets[i + 1]]] = True
+        return out
+
+    def select(self, selections: dict, base: np.ndarray | None = None) -> np.ndarray:
+        """AND of `base` and one membership mask per dimension; None / unindexed dims are skipped."""
+        out = np.ones(self.n_rows, dtype=bool) if base is None else base.copy()
+        for col, values in selections.items():
+            if values is None or col not in self._dims:
+                continue
+            out &= self.mask(col, values)
+        return out
+
+    def values_in(self, col: str, rows: np.ndarray | None = None) -> list:
+        """Distinct non-null values of `col` among `rows` (all rows when None)."""
+        if col not in self._dims:
+            return []
+        codes, uniques = self._dims[col][:2]
+        present = codes if rows is None else codes[rows]
+        return uniques[np.unique(present[present >= 0])].tolist()
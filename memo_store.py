@@ -0,0 +1,93 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def estimate_nbytes(value) -> int:
+    """Approximate in-memory size of a cached result (deep for object/string columns)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_nbytes(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class MemoStore:
+    """Thread-safe LRU cache bounded by an estimated byte budget, with TTL expiry and
+    hit/miss counters. One instance is shared by every session, so identical filter
+    signatures reuse one result; callers must treat returned objects as read-only."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float | None = None):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (value, nbytes, stored_at)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def _drop(self, key) -> None:
+        _, nbytes, _ = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry[2], now):
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value) -> None:
+        nbytes = estimate_nbytes(value)
+        if nbytes > self.max_bytes:
+            return  # would evict everything else; hand it back uncached
+        now = time.monotonic()
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, nbytes, now)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute_fn):
+        # computed outside the lock: a concurrent miss may compute twice, but never blocks readers
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute_fn()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from convert_to_parquet import DATA_DIR, load_p2p_frame
+
+# ---------- CONFIG ----------
+OPEN_PR_STATUSES = ("Approved", "InReview")
+OPEN_STATE_PATH = DATA_DIR / "open_state.parquet"
+OPEN_EVENTS_PATH = DATA_DIR / "open_state_events.parquet"
+STATE_COLUMNS = ['kind', 'entity', 'key', 'status', 'doc_date', 'amount', 'lines', 'opened_at', 'as_of']
+EVENT_COLUMNS = ['kind', 'entity', 'key', 'event', 'at']
+SNAPSHOT_COLUMNS = ['pr_number', 'pr_status', 'pr_date_submitted', 'purchase_doc', 'po_create_date',
+                    'po_approved_date', 'net_amount', 'entity_source_file']
+
+
+def open_pr_mask(df: pd.DataFrame, status_col: str) -> np.ndarray:
+    """Rows whose PR status is open (Approved / InReview); categoricals are tested per category."""
+    s = df[status_col]
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        is_open = pd.Index(s.cat.categories.astype(str)).isin(OPEN_PR_STATUSES)
+        codes = s.cat.codes.to_numpy()
+        return (codes >= 0) & is_open[np.maximum(codes, 0)]
+    return s.astype(str).isin(OPEN_PR_STATUSES).to_numpy()
+
+
+def pending_po_mask(df: pd.DataFrame, approved_col: str | None) -> np.ndarray:
+    """Rows without a PO approval date (every row when the column is missing)."""
+    if not approved_col or approved_col not in df.columns:
+        return np.ones(len(df), dtype=bool)
+    return df[approved_col].isna().to_numpy()
+
+
+def document_ids(entities, keys) -> pd.Series:
+    """'<entity>|<key>' id of a document, the same for state rows and for the frame's lines."""
+    return pd.Series(entities).astype(str).str.cat(pd.Series(keys).astype(str).to_numpy(), sep='|')
+
+
+def snapshot_open_state(df: pd.DataFrame, entity: str) -> pd.DataFrame:
+    """Key-level open state of one entity's snapshot: one row per open PR (pr_number) and per
+    unapproved PO (purchase_doc), with its status, document date, amount and line count."""
+    parts = []
+    amount = df['net_amount'] if 'net_amount' in df.columns else pd.Series(np.nan, index=df.index)
+    if {'pr_number', 'pr_status'} <= set(df.columns):
+        prs = df[open_pr_mask(df, 'pr_status') & df['pr_number'].notna().to_numpy()]
+        parts.append(pd.DataFrame({
+            'key': prs['pr_number'].astype(str), 'status': prs['pr_status'].astype(str),
+            'doc_date': prs['pr_date_submitted'] if 'pr_date_submitted' in prs.columns else pd.NaT,
+            'amount': amount[prs.index],
+        }).groupby('key', as_index=False).agg(status=('status', 'first'), doc_date=('doc_date', 'min'),
+                                              amount=('amount', 'sum'), lines=('status', 'size')).assign(kind='PR'))
+    if 'purchase_doc' in df.columns and 'po_create_date' in df.columns:
+        pos = df[pending_po_mask(df, 'po_approved_date') & df['purchase_doc'].notna().to_numpy()]
+        parts.append(pd.DataFrame({
+            'key': pos['purchase_doc'].astype(str), 'doc_date': pos['po_create_date'], 'amount': amount[pos.index],
+        }).groupby('key', as_index=False).agg(doc_date=('doc_date', 'min'), amount=('amount', 'sum'),
+                                              lines=('key', 'size')).assign(kind='PO', status='Pending approval'))
+    if not parts:
+        return pd.DataFrame(columns=STATE_COLUMNS)
+    out = pd.concat(parts, ignore_index=True).assign(entity=entity)
+    out['doc_date'] = pd.to_datetime(out['doc_date'], errors='coerce')
+    out['lines'] = out['lines'].astype('int64')
+    return out
+
+
+def load_open_state(path: Path = OPEN_STATE_PATH) -> pd.DataFrame:
+    if not path.exists():
+        return pd.DataFrame(columns=STATE_COLUMNS)
+    return pd.read_parquet(path)
+
+
+def update_open_state(frames: dict, as_of: pd.Timestamp | None = None,
+                      path: Path = OPEN_STATE_PATH, events_path: Path = OPEN_EVENTS_PATH) -> pd.DataFrame:
+    """Folds freshly converted entity snapshots ({entity: frame}) into the persisted state.
+
+    Per entity, keys that became open are inserted (opened_at = as_of) and keys that are no
+    longer open are closed; keys still open keep their opened_at. Every insert / close is
+    appended to the event log. Entities not in `frames` are left untouched."""
+    as_of = as_of or pd.Timestamp.now().floor('s')
+    state = load_open_state(path)
+    kept, events = [state[~state['entity'].isin(list(frames))]], []
+    for entity, frame in frames.items():
+        old = state[state['entity'] == entity].set_index(['kind', 'key'])
+        new = snapshot_open_state(frame, entity).set_index(['kind', 'key'])
+        opened = new.index.difference(old.index)
+        closed = old.index.difference(new.index)
+        new['opened_at'] = pd.to_datetime(old['opened_at'].reindex(new.index)).fillna(as_of)
+        new['as_of'] = as_of
+        kept.append(new.reset_index())
+        for event, keys in (('open', opened), ('close', closed)):
+            if len(keys):
+                events.append(pd.DataFrame({'kind': keys.get_level_values(0), 'entity': entity,
+                                            'key': keys.get_level_values(1), 'event': event, 'at': as_of}))
+        print(f"{entity}: {len(new)} open PRs / pending POs ({len(opened)} opened, {len(closed)} closed)")
+    state = pd.concat([k for k in kept if not k.empty], ignore_index=True) if any(not k.empty for k in kept) \
+        else pd.DataFrame(columns=STATE_COLUMNS)
+    state = state[STATE_COLUMNS]
+    tmp = path.with_suffix('.tmp')
+    state.to_parquet(tmp, index=False)
+    tmp.replace(path)
+    if events:
+        log = pd.concat(events, ignore_index=True)[EVENT_COLUMNS]
+        if events_path.exists():
+            log = pd.concat([pd.read_parquet(events_path), log], ignore_index=True)
+        tmp = events_path.with_suffix('.tmp')
+        log.to_parquet(tmp, index=False)
+        tmp.replace(events_path)
+    return state
+
+
+def rebuild_open_state(entities=None) -> pd.DataFrame:
+    """State for the given (default: all) entities from the converted dataset, e.g. on first run."""
+    df = load_p2p_frame(columns=SNAPSHOT_COLUMNS, entities=entities)
+    if df.empty or 'entity_source_file' not in df.columns:
+        return load_open_state()
+    ents = df['entity_source_file'].astype(str)
+    return update_open_state({ent: df[ents == ent] for ent in sorted(ents.unique())})
+
+
+if __name__ == "__main__":
+    state = rebuild_open_state()
+    print(state.groupby(['entity', 'kind']).size().to_string())
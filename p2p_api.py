@@ -0,0 +1,187 @@
+import argparse
+import inspect
+import json
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from analytics import FILTER_COLUMNS, FY, P2PData, REPORTS, run_report
+from convert_to_parquet import source_fingerprint
+
+# ---------- CONFIG ----------
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_LOADED = 4  # FY / entity loads kept in memory by the server
+LIST_FILTERS = [name for name in FILTER_COLUMNS if name != 'item_type']
+FORMATS = {'json': 'application/json', 'csv': 'text/csv'}
+
+_loaded = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_data(fy: str = 'All Years', entities=None) -> P2PData:
+    """Loaded dataset for one FY / entity selection, reused until the source data changes."""
+    key = (fy, tuple(sorted(entities)) if entities else None, source_fingerprint())
+    with _lock:
+        if key in _loaded:
+            _loaded.move_to_end(key)
+            return _loaded[key]
+    data = P2PData(fy, entities)
+    with _lock:
+        _loaded[key] = data
+        while len(_loaded) > MAX_LOADED:
+            _loaded.popitem(last=False)
+    return data
+
+
+def report_params(name: str) -> dict:
+    """Extra parameters of a report (beyond filters) with their defaults."""
+    sig = inspect.signature(REPORTS[name])
+    return {p.name: p.default for p in list(sig.parameters.values())[2:]}
+
+
+def _param(value: str, default):
+    if value.lower() == 'none':
+        return None
+    if isinstance(default, (int, float)) and not isinstance(default, bool):
+        return float(value)
+    return value
+
+
+def parse_request(name: str, query: dict) -> tuple:
+    """(fy, filters, params, fmt) from query-string style {key: [values]}; list filters take
+    repeated keys (?entity=MEPL&entity=MMW), dates as start / end."""
+    if name not in REPORTS:
+        raise KeyError(f"Unknown report {name!r}")
+    fy = query.get('fy', ['All Years'])[0]
+    if fy not in FY:
+        raise ValueError(f"Unknown fy {fy!r}; expected one of {list(FY)}")
+    filters = {f: query[f] for f in LIST_FILTERS if query.get(f)}
+    if query.get('item_type'):
+        filters['item_type'] = query['item_type'][0]
+    if query.get('start') or query.get('end'):
+        start, end = FY[fy]
+        filters['date_range'] = (query.get('start', [start])[0], query.get('end', [end])[0])
+    params = {p: _param(query[p][0], default) for p, default in report_params(name).items() if query.get(p)}
+    fmt = query.get('format', ['json'])[0]
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {list(FORMATS)}")
+    return fy, filters, params, fmt
+
+
+def query_report(name: str, query: dict) -> tuple:
+    """(DataFrame, format) for one request."""
+    fy, filters, params, fmt = parse_request(name, query)
+    data = get_data(fy, filters.get('entity'))
+    return run_report(data, name, filters, **params), fmt
+
+
+def render(frame: pd.DataFrame, fmt: str) -> bytes:
+    if fmt == 'csv':
+        return frame.to_csv(index=False).encode('utf-8')
+    return frame.to_json(orient='records', date_format='iso').encode('utf-8')
+
+
+def catalogue() -> dict:
+    return {
+        'reports': {name: report_params(name) for name in REPORTS},
+        'filters': ['fy', 'start', 'end', 'item_type'] + LIST_FILTERS,
+        'fy': list(FY), 'formats': list(FORMATS),
+    }
+
+
+class ReportHandler(BaseHTTPRequestHandler):
+    """GET /reports lists the reports; GET /reports/<name>?fy=..&entity=..&format=csv runs one."""
+
+    def _send(self, status: int, body: bytes, content_type: str = 'application/json') -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, message: str) -> None:
+        self._send(status, json.dumps({'error': message}).encode('utf-8'))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        if parts in ([], ['reports']):
+            self._send(200, json.dumps(catalogue(), default=str).encode('utf-8'))
+            return
+        if len(parts) != 2 or parts[0] != 'reports':
+            self._error(404, f"Not found: {url.path}")
+            return
+        try:
+            frame, fmt = query_report(parts[1], parse_qs(url.query))
+        except KeyError as e:
+            self._error(404, str(e.args[0]) if e.args else str(e))
+            return
+        except (TypeError, ValueError) as e:
+            self._error(400, str(e))
+            return
+        except Exception as e:
+            self._error(500, f"{type(e).__name__}: {e}")
+            return
+        self._send(200, render(frame, fmt), FORMATS[fmt])
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+    server = ThreadingHTTPServer((host, port), ReportHandler)
+    print(f"Serving P2P reports on http://{host}:{port}/reports")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="P2P dashboard numbers without the dashboard.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="list reports, their parameters and the filters")
+    rep = sub.add_parser('report', help="run one report and print / write it")
+    rep.add_argument('name', choices=sorted(REPORTS))
+    rep.add_argument('--fy', default='All Years', choices=list(FY))
+    rep.add_argument('--start', help="date range start (YYYY-MM-DD)")
+    rep.add_argument('--end', help="date range end (YYYY-MM-DD)")
+    rep.add_argument('--item-type', dest='item_type', choices=['Products', 'Services'])
+    for f in LIST_FILTERS:
+        rep.add_argument(f"--{f.replace('_', '-')}", dest=f, action='append', help="repeat for several values")
+    rep.add_argument('--param', action='append', default=[], metavar='NAME=VALUE',
+                     help="report parameter, e.g. by=entity or threshold=80")
+    rep.add_argument('--format', default='csv', choices=list(FORMATS))
+    rep.add_argument('--output', help="file to write (default: stdout)")
+    srv = sub.add_parser('serve', help="serve the reports over local HTTP")
+    srv.add_argument('--host', default=DEFAULT_HOST)
+    srv.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        print(json.dumps(catalogue(), indent=2, default=str))
+    elif args.command == 'serve':
+        serve(args.host, args.port)
+    else:
+        query = {k: (v if isinstance(v, list) else [v]) for k, v in vars(args).items()
+                 if k in ['fy', 'start', 'end', 'item_type', 'format'] + LIST_FILTERS and v}
+        for item in args.param:
+            key, _, value = item.partition('=')
+            if key not in report_params(args.name):
+                raise SystemExit(f"error: {args.name} takes {list(report_params(args.name)) or 'no parameters'}")
+            query[key] = [value]
+        try:
+            frame, fmt = query_report(args.name, query)
+        except (KeyError, TypeError, ValueError) as e:
+            raise SystemExit(f"error: {e}")
+        body = render(frame, fmt)
+        if args.output:
+            with open(args.output, 'wb') as f:
+                f.write(body)
+            print(f"Wrote {len(frame)} rows to {args.output}")
+        else:
+            sys.stdout.buffer.write(body)
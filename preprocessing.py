@@ -0,0 +1,356 @@
+import hashlib
+import json
+import os
+import uuid
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from pathlib import Path
+
+from convert_to_parquet import DATA_DIR, ROW_GROUP_SIZE, load_p2p_frame, scan_frame, source_fingerprint
+
+# ---------- CONFIG ----------
+# Materialized output of preprocess(), keyed by source fingerprint + preprocessing version
+GOLD_PATH = DATA_DIR / "p2p_gold.parquet"
+GOLD_META_KEY = b'p2p_gold'
+# Same frame as uncompressed Arrow IPC (Feather v2): memory-mapped on load, so worker processes
+# share the page cache and a cold start skips Parquet decompression / decoding
+HOT_CACHE_PATH = DATA_DIR / "p2p_gold.arrow"
+# Bump when preprocessing semantics change without this file's source changing
+PREPROCESS_VERSION = 1
+
+INDIRECT_BUYERS = {
+    'Aatish', 'Deepak', 'Deepakex', 'Dhruv', 'Dilip', 'Mukul', 'Nayan', 'Paurik',
+    'Kamlesh', 'Suresh', 'Priyam'
+}
+
+# po_orderer code -> PO creator name
+PO_CREATOR_MAP = {
+    'MMW2324030': 'Dhruv', 'MMW2324062': 'Deepak', 'MMW2425154': 'Mukul', 'MMW2223104': 'Paurik',
+    'MMW2021181': 'Nayan', 'MMW2223014': 'Aatish', 'MMW_EXT_002': 'Deepakex', 'MMW2425024': 'Kamlesh',
+    'MMW2021184': 'Suresh', 'N/A': 'Dilip', 'MMW2526019': 'Vraj', 'MMW2223240': 'Vatsal',
+    'MMW2223219': '', 'MMW2021115': 'Priyam', 'MMW2425031': 'Preet', 'MMW222360IN': 'Ayush',
+    'MMW2425132': 'Prateek.B', 'MMW2425025': 'Jaymin', 'MMW2425092': 'Suresh', 'MMW252617IN': 'Akaash',
+    'MMW1920052': 'Nirmal', '2425036': '', 'MMW222355IN': 'Jaymin', 'MMW2324060': 'Chetan',
+    'MMW222347IN': 'Vaibhav', 'MMW2425011': '', 'MMW1920036': 'Ankit', 'MMW2425143': 'Prateek.K',
+    '2425027': '', 'MMW2223017': 'Umesh', 'MMW2021214': 'Raunak', 'Intechuser1': 'Intesh Data'
+}
+# Columns added by preprocess(); loaded alongside the source columns from the gold artifact
+DERIVED_COLUMNS = frozenset([
+    'entity', 'buyer_group_code', 'Buyer.Type', 'po_orderer', 'po_creator', 'po_buyer_type',
+    'buyer_display', 'po_vendor', 'product_name', 'Item.Type',
+])
+
+# ---------- Helpers / Utilities ----------
+
+def safe_col(df, candidates, default=None):
+    for c in candidates:
+        if c in df.columns:
+            return c
+    return default
+
+# ---------- Fast type/coercion utilities ----------
+
+def to_cat(df, col):
+    if col in df.columns:
+        df[col] = df[col].astype('category')
+
+def text_col(s: pd.Series, fill: str = '') -> pd.Series:
+    """Object-string copy of a (possibly categorical / typed) column with nulls filled."""
+    return s.astype(object).where(s.notna(), fill).astype(str)
+
+def text_cat(s: pd.Series, fill: str = '') -> pd.Series:
+    """text_col(s, fill).astype('category') without the per-row strings: a categorical input
+    only has its categories stringified and the nulls moved to `fill`."""
+    if not isinstance(s.dtype, pd.CategoricalDtype):
+        return text_col(s, fill).astype('category')
+    s = s.cat.remove_unused_categories()
+    labels = s.cat.categories.astype(object).astype(str)
+    if not labels.is_unique:
+        return text_col(s, fill).astype('category')
+    s = s.cat.rename_categories(labels)
+    if s.isna().any():
+        if fill not in labels:
+            s = s.cat.add_categories([fill])
+        s = s.fillna(fill)
+    return s.cat.reorder_categories(sorted(s.cat.categories))
+
+# ---------- Domain-specific vectorized helpers ----------
+
+def compute_buyer_type_vectorized(df: pd.DataFrame) -> pd.Series:
+    """Classify PRs into Direct/Indirect using Buyer Group + numeric code (vectorized)."""
+    if df.empty:
+        return pd.Series(dtype=object)
+    group_col = safe_col(df, ['buyer_group', 'Buyer Group', 'buyer group'])
+    if not group_col:  # default to Indirect if missing
+        return pd.Series('Indirect', index=df.index, dtype=object)
+
+    bg_raw = text_col(df[group_col]).str.strip()
+    # extract numeric code
+    code_series = pd.to_numeric(bg_raw.str.extract(r'(\d+)')[0], errors='coerce')
+
+    buyer_type = pd.Series('Direct', index=df.index, dtype=object)
+    alias_direct = bg_raw.str.upper().isin({'ME_BG17', 'MLBG16'})
+    buyer_type[alias_direct] = 'Direct'
+
+    not_available = bg_raw.eq('') | bg_raw.str.lower().isin(['not available', 'na', 'n/a'])
+    buyer_type[not_available] = 'Indirect'
+    # a missing group was stored as the string 'nan' by earlier converters and classified Direct
+    buyer_type[df[group_col].isna()] = 'Direct'
+
+    # vectorized ranges
+    buyer_type[(code_series >= 1) & (code_series <= 9)] = 'Direct'
+    buyer_type[(code_series >= 10) & (code_series <= 18)] = 'Indirect'
+    buyer_type = buyer_type.fillna('Direct')
+    return buyer_type
+
+def compute_buyer_display(df: pd.DataFrame, purchase_doc_col: str | None, requester_col: str | None) -> pd.Series:
+    if df.empty:
+        return pd.Series(dtype=object)
+    po_creator = df.get('po_creator', pd.Series('', index=df.index)).fillna('').astype(str).str.strip()
+    requester = text_col(df.get(requester_col, pd.Series('', index=df.index))).str.strip() if requester_col else pd.Series('', index=df.index)
+
+    has_po = pd.Series(False, index=df.index)
+    if purchase_doc_col and purchase_doc_col in df.columns:
+        has_po = text_col(df[purchase_doc_col]).str.strip() != ''
+
+    # choose in vectorized manner with np.select
+    conditions = [
+        has_po & (po_creator != ''),
+        (po_creator == '') & (requester != '')
+    ]
+    choices = [
+        po_creator,
+        requester
+    ]
+    buyer_display = np.select(conditions, choices, default='PR only - Unassigned')
+    return pd.Series(buyer_display, index=df.index, dtype=object)
+
+def compute_item_type_vectorized(df: pd.DataFrame) -> pd.Series:
+    """Classifies items into 'Products' or 'Services' based on Category, Item Code, and Description."""
+    if df.empty:
+        return pd.Series(dtype=object)
+    
+    # 1. Explicit Service Categories
+    service_cats = {
+        'Service', 'Testing Services', 'IT Services', 'Recruitment', 'Repair & Maintenance', 
+        'Plant Consultancy Services', 'Repairs and Maint.- Vehicle', 'Advertisement And Agency Cost', 
+        'Customer Support Cost', 'Staff Welfare Cost', 'Electric Installation', 'Consulting Services', 
+        'Office Maintenance', 'Insurance Expense', 'Legal and professional', 'Software License', 
+        'SOFTWARE', 'Marketing', 'Network', 'Plant Maintenance', 'Transport'
+    }
+    
+    # 2. Prepare columns
+    cat_col = df.get('procurement_category', pd.Series('', index=df.index)).astype(str).fillna('')
+    code_col = df.get('item_code', pd.Series('', index=df.index)).astype(str).fillna('').str.upper()
+    prod_col = df.get('product_name', pd.Series('', index=df.index)).astype(str).fillna('').str.upper()
+    desc_col = df.get('item_description', pd.Series('', index=df.index)).astype(str).fillna('').str.upper()
+    
+    # 3. Vectorized Masks
+    mask_cat = cat_col.isin(service_cats)
+    
+    # Item Code Patterns: SER_, LBR_
+    mask_code = code_col.str.startswith('SER') | code_col.str.startswith('LBR')
+    
+    # Keywords in Product/Description
+    # Regex for distinct keywords to avoid partial matches like "Serviceable" (though likely safe)
+    service_keywords = r'\b(AMC|ANNUAL MAINTENANCE|SERVICE|FEE|CHARGES|CONSULTANCY|LABOUR|INSTALLATION|FREIGHT|TRANSPORT|SUBSCRIPTION|WARRANTY)\b'
+    mask_desc = prod_col.str.contains(service_keywords, regex=True) | desc_col.str.contains(service_keywords, regex=True)
+    
+    # 4. Final Logic: Any positive signal -> Service
+    is_service = mask_cat | mask_code | mask_desc
+    
+    return np.where(is_service, 'Services', 'Products')
+
+
+def preprocess(_df: pd.DataFrame) -> pd.DataFrame:
+    """Applies all expensive preprocessing steps to the raw dataframe."""
+    if _df.empty:
+        return _df
+    df = _df.copy()
+
+    # ensure entity
+    entity_col = safe_col(df, ['entity','company','brand','entity_name'])
+    if entity_col and entity_col in df.columns:
+        df['entity'] = text_col(df[entity_col]).str.strip()
+    else:
+        df['entity'] = text_col(df['entity_source_file']) if 'entity_source_file' in df.columns else ''
+
+    # defensive default columns
+    pr_budget_desc_col = safe_col(df, ['pr_budget_description', 'pr budget description', 'pr_budget_desc', 'pr budget description'])
+    pr_budget_code_col = safe_col(df, ['pr_budget_code', 'pr budget code', 'pr_budgetcode'])
+    po_budget_desc_col = safe_col(df, ['po_budget_description', 'po budget description', 'po_budget_desc'])
+    po_budget_code_col = safe_col(df, ['po_budget_code', 'po budget code', 'po_budgetcode'])
+    pr_bu_col = safe_col(df, ['pr_bussiness_unit','pr_business_unit','pr business unit','pr_bu','pr bussiness unit','pr business unit'])
+    po_bu_col = safe_col(df, ['po_bussiness_unit','po_business_unit','po business unit','po_bu','po bussiness unit','po business unit'])
+    for c in [pr_budget_desc_col, pr_budget_code_col, po_budget_desc_col, po_budget_code_col, pr_bu_col, po_bu_col]:
+        if c and c not in df.columns:
+            df[c] = ''
+
+    # buyer group code extraction (fast)
+    if 'buyer_group' in df.columns:
+        try:
+            df['buyer_group_code'] = pd.to_numeric(df['buyer_group'].astype(str).str.extract('([0-9]+)')[0], errors='coerce')
+        except Exception:
+            df['buyer_group_code'] = np.nan
+
+    # Buyer.Type
+    if 'Buyer.Type' not in df.columns:
+        df['Buyer.Type'] = compute_buyer_type_vectorized(df)
+    df['Buyer.Type'] = df['Buyer.Type'].fillna('Direct').astype(str).str.strip().str.title()
+    bt_lower = df['Buyer.Type'].str.lower()
+    df.loc[bt_lower.isin(['direct', 'd']), 'Buyer.Type'] = 'Direct'
+    df.loc[bt_lower.isin(['indirect', 'i', 'in']), 'Buyer.Type'] = 'Indirect'
+    df.loc[~df['Buyer.Type'].isin(['Direct', 'Indirect']), 'Buyer.Type'] = 'Direct'
+
+    # normalize po_creator using mapping
+    upper_map = {k.upper(): v for k, v in PO_CREATOR_MAP.items()}
+    po_orderer_col = safe_col(df, ['po_orderer', 'po orderer', 'po_orderer_code'])
+    df['po_orderer'] = text_col(df[po_orderer_col], 'N/A').str.strip() if po_orderer_col in df.columns else 'N/A'
+    
+    # Optimized po_creator mapping
+    df['po_creator'] = df['po_orderer'].str.upper().map(upper_map).fillna(df['po_orderer'])
+    # Robust Dilip mapping (handle nan/null strings case-insensitive)
+    df['po_creator'] = df['po_creator'].fillna('Dilip').astype(str)
+    mask_dilip = df['po_creator'].str.strip().str.lower().isin(['nan', 'n/a', 'na', '', 'none', 'null'])
+    df.loc[mask_dilip, 'po_creator'] = 'Dilip'
+
+    # po_buyer_type
+    creator_clean = df['po_creator'].fillna('').astype(str).str.strip()
+    df['po_buyer_type'] = np.where(creator_clean.isin(INDIRECT_BUYERS), 'Indirect', 'Direct')
+
+    # Fix: Vraj should be considered Direct even if touching Indirect buyer groups
+    df.loc[df['po_creator'] == 'Vraj', 'Buyer.Type'] = 'Direct'
+
+    # pr_requester column detection and buyer_display
+    purchase_doc_col = safe_col(df, ['purchase_doc', 'purchase_doc_number', 'purchase doc'])
+    pr_requester_col = safe_col(df, ['pr_requester','requester','pr_requester_name','pr_requester_name','requester_name'])
+    df['buyer_display'] = compute_buyer_display(df, purchase_doc_col, pr_requester_col)
+
+    # Convert common columns to categorical to speed groupbys & joins
+    po_vendor_col = safe_col(df, ['po_vendor', 'vendor', 'po vendor'])
+    df['po_vendor'] = text_cat(df[po_vendor_col]) if po_vendor_col in df.columns else ''
+    df['product_name'] = text_cat(df['product_name']) if 'product_name' in df.columns else ''
+    
+    # Ensure purchase_doc is categorical to speed up groupby in Delivery tab
+    if purchase_doc_col and purchase_doc_col in df.columns:
+        to_cat(df, purchase_doc_col)
+
+    # Compute Item.Type
+    df['Item.Type'] = compute_item_type_vectorized(df)
+
+    # Derived text is dictionary-encoded too; free text (descriptions, item codes) stays TEXT_DTYPE
+    for c in ['entity', 'po_creator', 'buyer_display', po_vendor_col, 'Buyer.Type', 'procurement_category', 'product_name',
+              'Item.Type', 'po_orderer', 'po_buyer_type']:
+        to_cat(df, c)
+        
+    return df
+
+# ---------- Gold artifact (offline preprocessing) ----------
+
+def preprocess_version() -> str:
+    """Hash of this module's source (mappings, keyword lists, code) plus PREPROCESS_VERSION."""
+    h = hashlib.sha256(Path(__file__).read_bytes())
+    h.update(str(PREPROCESS_VERSION).encode())
+    return h.hexdigest()[:16]
+
+def gold_key() -> dict:
+    return {'source': source_fingerprint(), 'version': preprocess_version()}
+
+def _is_hot_cache(path: Path) -> bool:
+    return path.suffix == HOT_CACHE_PATH.suffix
+
+def read_gold_meta(path: Path = GOLD_PATH) -> dict | None:
+    """Build key stored in the artifact's schema metadata (None if absent/unreadable)."""
+    if not path.exists():
+        return None
+    try:
+        if _is_hot_cache(path):
+            with pa.memory_map(str(path)) as source:
+                meta = pa.ipc.open_file(source).schema.metadata or {}
+        else:
+            meta = pq.read_schema(path).metadata or {}
+        return json.loads(meta[GOLD_META_KEY]) if GOLD_META_KEY in meta else None
+    except Exception:
+        return None
+
+def gold_is_fresh(path: Path = GOLD_PATH) -> bool:
+    meta = read_gold_meta(path)
+    key = gold_key()
+    return bool(meta) and meta.get('source') == key['source'] and meta.get('version') == key['version']
+
+def _temp_path(path: Path) -> Path:
+    """A unique (pid + uuid) temp name next to `path`, so concurrent writers never share a temp file;
+    the writer creates it with the default permissions (umask), which replace() keeps."""
+    return path.with_name(f'.{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp')
+
+def _replace_with(path: Path, write) -> None:
+    """Calls write(tmp) on a unique temp file, then atomically moves it over `path`."""
+    tmp = _temp_path(path)
+    try:
+        write(tmp)
+        tmp.replace(path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+def write_hot_cache(table: pa.Table, path: Path = HOT_CACHE_PATH) -> None:
+    """Writes `table` (with its build key) uncompressed; replaced atomically, so processes that
+    still map the previous file keep reading it until they reload."""
+    _replace_with(path, lambda tmp: feather.write_feather(table, tmp, compression='uncompressed',
+                                                          chunksize=ROW_GROUP_SIZE))
+
+def gold_path() -> Path | None:
+    """The preprocessed artifact to load: the hot cache when fresh, else the Parquet artifact;
+    None when neither is fresh. Only reads: both are written by build_gold_artifact()."""
+    if gold_is_fresh(HOT_CACHE_PATH):
+        return HOT_CACHE_PATH
+    if gold_is_fresh(GOLD_PATH):
+        return GOLD_PATH
+    return None
+
+def build_gold_artifact(path: Path = GOLD_PATH, force: bool = False) -> bool:
+    """Runs preprocess() over the full source and writes it with its build key.
+    Returns False when the existing artifact is already fresh."""
+    if not force and gold_is_fresh(path):
+        if not gold_is_fresh(HOT_CACHE_PATH):
+            write_hot_cache(pq.read_table(path))
+            print(f"{path.name} is up to date; wrote {HOT_CACHE_PATH.name} from it")
+        else:
+            print(f"{path.name} is up to date")
+        return False
+    raw = load_p2p_frame()
+    if raw.empty:
+        print("No source data to preprocess")
+        return False
+    gold = preprocess(raw)
+    table = pa.Table.from_pandas(gold, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta[GOLD_META_KEY] = json.dumps({**gold_key(), 'rows': len(gold), 'built_at': pd.Timestamp.now().isoformat()}).encode()
+    table = table.replace_schema_metadata(meta)
+    write_hot_cache(table)
+    _replace_with(path, lambda tmp: pq.write_table(table, tmp, row_group_size=ROW_GROUP_SIZE))
+    print(f"Wrote {len(gold)} preprocessed rows to {path} and {HOT_CACHE_PATH.name}")
+    return True
+
+def load_gold_frame(columns=None, start=None, end=None, entities=None, path: Path = GOLD_PATH) -> pd.DataFrame:
+    """Reads the gold artifact (Parquet or the memory-mapped hot cache) with the same
+    projection / FY / entity pushdown as the raw loader."""
+    if columns is not None:
+        columns = set(columns) | DERIVED_COLUMNS
+    if _is_hot_cache(path):
+        dataset = ds.dataset(path, format='feather', filesystem=pafs.LocalFileSystem(use_mmap=True))
+    else:
+        dataset = ds.dataset(path, format='parquet')
+    df = scan_frame(dataset, columns, start, end, entities, enforce=False)
+    # the file dictionaries cover the full history; keep only values present in this slice
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.remove_unused_categories()
+    return df
+
+if __name__ == "__main__":
+    build_gold_artifact(force=True)
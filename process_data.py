@@ -1,101 +1,54 @@
 import pandas as pd
 import os
 import glob
-import re
 
-def parse_vendor_files(vendor_files):
-    all_vendors = []
-    
-    for file_path in vendor_files:
-        print(f"Processing vendor file: {file_path}")
-        try:
-            # Read the entire file without header
-            df = pd.read_excel(file_path, header=None)
-            
-            # Pre-calculate company name
-            company_name = None
-            for i in range(min(10, len(df))):
-                val = df.iloc[i, 0]
-                if isinstance(val, str) and "PRIVATE LIMITED" in val:
-                    company_name = val
-                    break
-            
-            # State tracking
-            current_vendor = {}
-            
-            # Iterate through all rows
-            for idx, row in df.iterrows():
-                # Convert first column to string and strip
-                col0 = str(row[0]).strip() if pd.notna(row[0]) else ""
-                
-                if col0 == 'Vendor account':
-                    # If we have a current vendor, save it
-                    if current_vendor:
-                        current_vendor['Source Company'] = company_name
-                        current_vendor['Source File'] = os.path.basename(file_path)
-                        all_vendors.append(current_vendor)
-                    
-                    # Start new vendor
-                    current_vendor = {}
-                    # Value is at index 2 based on debug
-                    if len(row) > 2:
-                        current_vendor['Vendor Account'] = row[2]
-                        
-                elif current_vendor:
-                    # We are inside a vendor block
-                    if col0 == 'Address':
-                        if len(row) > 2:
-                            current_vendor['Address'] = row[2]
-                        
-                        # Vendor Name is on the same row, label at index 6, value at index 9
-                        if len(row) > 9:
-                             # Check if col 6 says 'Vendor name'
-                             col6 = str(row[6]).strip() if pd.notna(row[6]) else ""
-                             if col6 == 'Vendor name':
-                                 current_vendor['Vendor Name'] = row[9]
-                                
-                    elif col0 == 'Telephone':
-                        if len(row) > 2:
-                            current_vendor['Telephone'] = row[2]
-                            
-                    elif col0 == 'Email':
-                        if len(row) > 2:
-                            current_vendor['Email'] = row[2]
-                            
-                    elif col0 == 'Buyer group':
-                        if len(row) > 2:
-                            current_vendor['Buyer Group'] = row[2]
+from convert_to_parquet import excel_engine, read_workbooks
+from vendor_master import parse_vendor_blocks
+
+PROCESS_VENDOR_FIELDS = {'Vendor account': 'Vendor Account', 'Address': 'Address', 'Vendor name': 'Vendor Name',
+                         'Telephone': 'Telephone', 'Email': 'Email', 'Buyer group': 'Buyer Group'}
+
+def _read_vendor_file(file_path, _source=None):
+    # Read the entire file without header
+    df = pd.read_excel(file_path, header=None, engine=excel_engine())
+
+    # Pre-calculate company name
+    company_name = None
+    for i in range(min(10, len(df))):
+        val = df.iloc[i, 0]
+        if isinstance(val, str) and "PRIVATE LIMITED" in val:
+            company_name = val
+            break
 
-            # Save the last vendor
-            if current_vendor:
-                current_vendor['Source Company'] = company_name
-                current_vendor['Source File'] = os.path.basename(file_path)
-                all_vendors.append(current_vendor)
-                
-        except Exception as e:
-            print(f"Error processing {file_path}: {e}")
-            import traceback
-            traceback.print_exc()
-            
-    return pd.DataFrame(all_vendors)
+    # One row per "Vendor account" block, label -> value columns (shared with the dashboard)
+    blocks = parse_vendor_blocks(df)
+    vendors = blocks.reindex(columns=list(PROCESS_VENDOR_FIELDS)).rename(columns=PROCESS_VENDOR_FIELDS)
+    vendors['Source Company'] = company_name
+    vendors['Source File'] = os.path.basename(file_path)
+    return vendors
+
+def _read_report_file(file_path, _source=None):
+    # Read with header=1 as discovered
+    df = pd.read_excel(file_path, header=1, engine=excel_engine())
+    df['Source File'] = os.path.basename(file_path)
+    return df
+
+def _read_all(files, reader):
+    """Workbooks are parsed concurrently (see convert_to_parquet.read_workbooks)."""
+    frames = []
+    jobs = [(file_path, os.path.basename(file_path)) for file_path in files]
+    for (file_path, _), (_, frame, _, error) in zip(jobs, read_workbooks(jobs, reader=reader)):
+        if error is not None:
+            print(f"Error processing {file_path}: {error}")
+            continue
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def parse_vendor_files(vendor_files):
+    return _read_all(vendor_files, _read_vendor_file)
 
 def parse_report_files(report_files):
-    all_reports = []
-    
-    for file_path in report_files:
-        print(f"Processing report file: {file_path}")
-        try:
-            # Read with header=1 as discovered
-            df = pd.read_excel(file_path, header=1)
-            df['Source File'] = os.path.basename(file_path)
-            all_reports.append(df)
-        except Exception as e:
-            print(f"Error processing {file_path}: {e}")
-            
-    if all_reports:
-        return pd.concat(all_reports, ignore_index=True)
-    else:
-        return pd.DataFrame()
+    return _read_all(report_files, _read_report_file)
 
 def main():
     base_path = "/tmp/file_attachments"
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+
+# Free-text fields of the Search tab and the Vendors reverse lookup
+SEARCH_FIELDS = ('pr_number', 'purchase_doc', 'product_name', 'po_vendor', 'item_description')
+# Match quality of a field value, best first
+RANK_EXACT, RANK_PREFIX, RANK_WORD, RANK_SUBSTRING = 4, 3, 2, 1
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """Case-insensitive substring search over SEARCH_FIELDS.
+
+    Each field is factorized once; a character-trigram inverted index over its
+    distinct values narrows a query to the few values containing all of its
+    trigrams, which are then verified and ranked (exact > prefix > word prefix >
+    substring). Row results come from the value codes, so a query costs one pass
+    over the matching values plus a vectorized gather, not a string scan per row.
+    Results are positional, like FilterIndex masks."""
+
+    def __init__(self, df: pd.DataFrame, columns=SEARCH_FIELDS):
+        self.n_rows = len(df)
+        self._fields = {}
+        for col in columns:
+            if col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col], sort=False)  # NaN -> -1
+            texts = [str(v).lower() for v in uniques]
+            postings = defaultdict(list)
+            for i, text in enumerate(texts):
+                for g in _trigrams(text):
+                    postings[g].append(i)
+            postings = {g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()}
+            self._fields[col] = (codes.astype(np.int32, copy=False), texts, postings)
+
+    def __contains__(self, col) -> bool:
+        return col in self._fields
+
+    @property
+    def columns(self) -> list:
+        return list(self._fields)
+
+    def _candidates(self, texts, postings, q: str):
+        """Value ids that may contain `q` (all of them for queries shorter than a trigram)."""
+        if len(q) < 3:
+            return range(len(texts))
+        lists = []
+        for g in _trigrams(q):
+            ids = postings.get(g)
+            if ids is None:
+                return ()
+            lists.append(ids)
+        lists.sort(key=len)
+        ids = lists[0]
+        for other in lists[1:]:
+            ids = np.intersect1d(ids, other, assume_unique=True)
+            if not len(ids):
+                break
+        return ids
+
+    def value_ranks(self, col: str, query: str) -> np.ndarray:
+        """Rank of every distinct value of `col` for `query` (0 = no match)."""
+        _, texts, postings = self._fields[col]
+        q = query.lower().strip()
+        ranks = np.zeros(len(texts), dtype=np.int8)
+        if not q:
+            return ranks
+        for i in self._candidates(texts, postings, q):
+            text = texts[i]
+            pos = text.find(q)
+            if pos < 0:
+                continue
+            if text == q:
+                ranks[i] = RANK_EXACT
+            elif pos == 0:
+                ranks[i] = RANK_PREFIX
+            elif not text[pos - 1].isalnum() or f' {q}' in text:
+                ranks[i] = RANK_WORD
+            else:
+                ranks[i] = RANK_SUBSTRING
+        return ranks
+
+    def rank(self, query: str, columns=None) -> np.ndarray:
+        """Per row, the best rank of `query` over `columns` (default: all indexed fields)."""
+        out = np.zeros(self.n_rows, dtype=np.int8)
+        for col in (columns or self._fields):
+            if col not in self._fields:
+                continue
+            codes = self._fields[col][0]
+            ranks = self.value_ranks(col, query)
+            if not ranks.any():
+                continue
+            row_ranks = np.where(codes >= 0, ranks[codes], 0)
+            np.maximum(out, row_ranks, out=out)
+        return out
+
+    def mask(self, query: str, columns=None) -> np.ndarray:
+        """Rows where any of `columns` contains `query`."""
+        return self.rank(query, columns) > 0
+
+    def search(self, query: str, columns=None, base: np.ndarray | None = None) -> np.ndarray:
+        """Positions of matching rows (restricted to `base` when given), best rank first,
+        then in frame order."""
+        ranks = self.rank(query, columns)
+        if base is not None:
+            ranks = np.where(base, ranks, 0)
+        hits = np.flatnonzero(ranks)
+        return hits[np.argsort(-ranks[hits], kind='stable')]
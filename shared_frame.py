@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+_MASKED = (pd.arrays.IntegerArray, pd.arrays.FloatingArray, pd.arrays.BooleanArray)
+
+def _buffers(values) -> list:
+    """The ndarrays behind one block's values (numpy, categorical, datetime, masked, string)."""
+    if isinstance(values, np.ndarray):
+        return [values]
+    if isinstance(values, pd.arrays.ArrowExtensionArray):
+        return []  # immutable Arrow buffers
+    if isinstance(values, _MASKED):
+        return [values._data, values._mask]
+    out = []
+    for attr in ('_ndarray', '_codes', '_mask'):
+        arr = getattr(values, attr, None)
+        if isinstance(arr, np.ndarray):
+            out.append(arr)
+    return out
+
+
+def freeze(df: pd.DataFrame) -> pd.DataFrame:
+    """Marks the column buffers of a shared (cached, cross-session) frame read-only and returns
+    it: an in-place write then raises instead of leaking into every other session. Frames
+    derived from it under copy-on-write share these buffers until they are written to.
+
+    Object arrays are left writable: pandas' Cython helpers (e.g. memory_usage(deep=True))
+    reject read-only object buffers; copy-on-write still copies them before any write.
+    Arrow-backed (TEXT_DTYPE) columns are immutable already."""
+    for values in df._mgr.arrays:
+        for arr in _buffers(values):
+            if arr.dtype != object:
+                arr.flags.writeable = False
+    return df
+
+
+def is_frozen(df: pd.DataFrame) -> bool:
+    return all(not arr.flags.writeable for values in df._mgr.arrays for arr in _buffers(values) if arr.dtype != object)
+
+
+def shared_nbytes(df: pd.DataFrame) -> int:
+    """Bytes of the frame's own column buffers, Arrow text included (object values not followed)."""
+    return int(sum(values.nbytes for values in df._mgr.arrays))
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+PAGE_SIZES = (50, 100, 250, 500, 1000)
+
+
+def _sort_values(s: pd.Series) -> pd.Series:
+    """Sortable stand-in for `s`: categoricals sort by their labels, not category order."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        labels = pd.Index(s.cat.categories.astype(str))
+        rank = np.empty(len(labels), dtype=np.int64)
+        rank[np.argsort(labels.to_numpy(), kind='stable')] = np.arange(len(labels))
+        codes = s.cat.codes.to_numpy()
+        return pd.Series(np.where(codes >= 0, rank[np.maximum(codes, 0)], -1), index=s.index).where(codes >= 0)
+    if s.dtype == object:
+        return s.where(s.isna(), s.astype(str))
+    return s
+
+
+def sort_rows(frame: pd.DataFrame, rows: np.ndarray, column: str | None, ascending: bool = True) -> np.ndarray:
+    """`rows` (positions into `frame`) ordered by `column`, nulls last; unchanged when column is None.
+    Only the sort column of those rows is read."""
+    if column is None or column not in frame.columns or not len(rows):
+        return rows
+    values = _sort_values(frame[column].iloc[rows].reset_index(drop=True))
+    order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+    return rows[order]
+
+
+def page_count(n_rows: int, page_size: int) -> int:
+    return max(1, -(-n_rows // page_size))
+
+
+def window(frame: pd.DataFrame, rows: np.ndarray, page: int, page_size: int, columns=None) -> pd.DataFrame:
+    """The `page`-th (1-based) slice of `rows`, materialized from `frame` (optionally only `columns`)."""
+    offset = (max(page, 1) - 1) * page_size
+    part = frame.iloc[rows[offset:offset + page_size]]
+    return (part if columns is None else part[list(columns)]).reset_index(drop=True)
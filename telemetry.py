@@ -0,0 +1,118 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# ---------- CONFIG ----------
+TELEMETRY_PATH = Path(__file__).resolve().parent / "telemetry.jsonl"
+TELEMETRY_MAX_BYTES = 20 * 1024 * 1024  # rotated to telemetry.jsonl.1 beyond this
+RECORD_COLUMNS = ['ts', 'run', 'tab', 'filter_key', 'kind', 'name', 'seconds', 'cache', 'rows', 'filters']
+
+_write_lock = threading.Lock()
+
+
+def result_rows(value) -> int | None:
+    """Row count of a computed result (frame, series, array or sequence); None otherwise."""
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index, np.ndarray, list, tuple)):
+        return len(value)
+    return None
+
+
+def filter_key(signature: tuple) -> str:
+    """Short stable id of a filter signature, to group log records by filter combination."""
+    return hashlib.sha1(repr(signature).encode()).hexdigest()[:10]
+
+
+def describe_filters(selections: dict, max_values: int = 3) -> str:
+    """Readable one-line summary of the active filters ('Entity=MEPL,MMW; Vendor=12 selected')."""
+    parts = []
+    for label, values in selections.items():
+        if values is None or values == () or values == []:
+            continue
+        if isinstance(values, (list, tuple)):
+            text = ','.join(map(str, values)) if len(values) <= max_values else f"{len(values)} selected"
+        else:
+            text = str(values)
+        parts.append(f"{label}={text}")
+    return '; '.join(parts)
+
+
+class RunTelemetry:
+    """Timings of one script run: data stages, memoized computes (with cache hit/miss and
+    result rows), the tab body and each figure. Every record carries the run id, the active
+    tab and the filter key, so the JSONL log can be grouped by tab and filter combination."""
+
+    def __init__(self):
+        self.run = uuid.uuid4().hex[:12]
+        self.tab = None
+        self.filter_key = None
+        self.records = []
+
+    def record(self, kind: str, name: str, seconds: float, **fields) -> None:
+        self.records.append({'ts': time.time(), 'run': self.run, 'tab': self.tab, 'filter_key': self.filter_key,
+                             'kind': kind, 'name': name, 'seconds': round(seconds, 4), **fields})
+
+    @contextmanager
+    def span(self, kind: str, name: str, **fields):
+        """Times the block; the yielded dict takes extra fields (e.g. cache, rows) set inside it."""
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            self.record(kind, name, time.perf_counter() - start, **fields)
+
+    def frame(self) -> pd.DataFrame:
+        out = pd.DataFrame(self.records).reindex(columns=RECORD_COLUMNS)
+        out['rows'] = pd.to_numeric(out['rows']).astype('Int64')
+        return out
+
+    def flush(self, path: Path = TELEMETRY_PATH) -> None:
+        """Appends this run's records to the JSONL log (shared by every session)."""
+        if not self.records:
+            return
+        lines = ''.join(json.dumps(r, default=str) + '\n' for r in self.records)
+        with _write_lock:
+            if path.exists() and path.stat().st_size > TELEMETRY_MAX_BYTES:
+                path.replace(path.with_name(path.name + '.1'))
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+
+
+def load_telemetry(path: Path = TELEMETRY_PATH, last: int = 20000) -> pd.DataFrame:
+    """The last `last` records of the JSONL log (unreadable lines are skipped)."""
+    if not path.exists():
+        return pd.DataFrame(columns=RECORD_COLUMNS)
+    with open(path, encoding='utf-8') as f:
+        tail = deque(f, maxlen=last)
+    records = []
+    for line in tail:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    return pd.DataFrame(records).reindex(columns=RECORD_COLUMNS)
+
+
+def slowest_tabs(log: pd.DataFrame) -> pd.DataFrame:
+    """Tab-body timings per (tab, filter combination): runs, median and max seconds."""
+    tabs = log[log['kind'] == 'tab']
+    if tabs.empty:
+        return pd.DataFrame(columns=['tab', 'filters', 'runs', 'median_s', 'max_s'])
+    out = tabs.groupby(['tab', 'filter_key'], dropna=False).agg(
+        filters=('filters', 'last'), runs=('seconds', 'size'), median_s=('seconds', 'median'), max_s=('seconds', 'max'))
+    return out.reset_index().drop(columns='filter_key').sort_values('median_s', ascending=False)
+
+
+if __name__ == "__main__":
+    log = load_telemetry()
+    print(slowest_tabs(log).head(30).to_string(index=False))
+    spans = log[log['kind'].isin(['compute', 'figure'])]
+    if not spans.empty:
+        print(spans.groupby(['kind', 'name'])['seconds'].describe(percentiles=[.5, .9]).round(3).to_string())
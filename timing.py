@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# Document attributes SLA percentiles are broken down by
+TIMING_ATTRIBUTES = ('Buyer.Type', 'po_creator', 'entity')
+PERCENTILES = (50, 90, 99)
+
+
+def _days(start: pd.Series, end: pd.Series) -> pd.Series:
+    return (end - start).dt.days
+
+
+def _business_days(start: pd.Series, end: pd.Series) -> pd.Series:
+    """Mon-Fri days from start to end (negative when end is earlier); NaN when either is missing."""
+    ok = (start.notna() & end.notna()).to_numpy()
+    out = np.full(len(start), np.nan)
+    if ok.any():
+        a = start.to_numpy()[ok].astype('datetime64[D]')
+        b = end.to_numpy()[ok].astype('datetime64[D]')
+        out[ok] = np.busday_count(a, b)
+    return pd.Series(out, index=start.index)
+
+
+def _per_document(df: pd.DataFrame, key: str, dates: dict, attributes) -> tuple:
+    """(row -> document code, one row per document): `dates` maps output name -> (column, 'min'|'max')."""
+    codes, uniques = pd.factorize(df[key])
+    frame = pd.DataFrame({'_doc': codes})
+    agg = {}
+    for name, (col, how) in dates.items():
+        if col and col in df.columns:
+            frame[name] = pd.to_datetime(df[col].to_numpy(), errors='coerce')
+        else:
+            frame[name] = pd.NaT
+        agg[name] = (name, how)
+    for col in attributes:
+        if col in df.columns:
+            frame[col] = df[col].to_numpy()
+            agg[col] = (col, 'first')
+    agg['lines'] = ('_doc', 'size')
+    docs = frame[frame['_doc'] >= 0].groupby('_doc', sort=True).agg(**agg).reset_index(drop=True)
+    docs.insert(0, key, np.asarray(uniques, dtype=object))
+    return codes.astype(np.int32, copy=False), docs
+
+
+class DocumentTimings:
+    """One row per PR and per PO with its timestamps and durations, built once per loaded frame.
+
+    PR lead time runs from the PR submission to the first PO created for it; PO approval time
+    from PO creation to approval. Both are counted once per document (a multi-line PR or PO
+    is no longer weighted by its line count), in calendar and in business days. Line rows map
+    to their documents, so a filtered row mask selects the documents it touches."""
+
+    def __init__(self, df: pd.DataFrame, pr_key: str | None, pr_date: str | None, po_key: str | None,
+                 po_create: str | None, po_approved: str | None = None, po_delivery: str | None = None,
+                 attributes=TIMING_ATTRIBUTES):
+        self.pr_key, self.po_key = pr_key, po_key
+        self._pr_rows = self._po_rows = None
+        self.pr = self.po = pd.DataFrame()
+        if pr_key and pr_key in df.columns:
+            self._pr_rows, pr = _per_document(df, pr_key, {'pr_date': (pr_date, 'min'), 'first_po_date': (po_create, 'min')}, attributes)
+            pr['lead_days'] = _days(pr['pr_date'], pr['first_po_date'])
+            pr['lead_bdays'] = _business_days(pr['pr_date'], pr['first_po_date'])
+            self.pr = pr
+        if po_key and po_key in df.columns:
+            self._po_rows, po = _per_document(df, po_key, {'po_create': (po_create, 'min'), 'po_approved': (po_approved, 'min'),
+                                                          'po_delivery': (po_delivery, 'max')}, attributes)
+            po['approval_days'] = _days(po['po_create'], po['po_approved'])
+            po['approval_bdays'] = _business_days(po['po_create'], po['po_approved'])
+            po['delivery_days'] = _days(po['po_create'], po['po_delivery'])
+            self.po = po
+
+    @staticmethod
+    def _select(docs: pd.DataFrame, row_docs, rows) -> pd.DataFrame:
+        if docs.empty or rows is None:
+            return docs
+        present = row_docs[rows]
+        return docs.iloc[np.unique(present[present >= 0])]
+
+    def prs(self, rows: np.ndarray | None = None) -> pd.DataFrame:
+        """PR documents with at least one line in `rows` (boolean row mask; None = all)."""
+        return self._select(self.pr, self._pr_rows, rows)
+
+    def pos(self, rows: np.ndarray | None = None) -> pd.DataFrame:
+        """PO documents with at least one line in `rows` (boolean row mask; None = all)."""
+        return self._select(self.po, self._po_rows, rows)
+
+
+def percentile_table(docs: pd.DataFrame, by: str | None, value: str, percentiles=PERCENTILES) -> pd.DataFrame:
+    """Document count, mean and percentiles of `value` per `by` (overall when by is None)."""
+    valid = docs[docs[value].notna()] if value in docs.columns else docs.iloc[0:0]
+    if by is not None and by not in valid.columns:
+        return pd.DataFrame()
+    grouped = valid.groupby(by, observed=True, sort=True)[value] if by else valid.assign(_all='All').groupby('_all')[value]
+    out = grouped.agg(['size', 'mean']).rename(columns={'size': 'Documents', 'mean': 'Avg'})
+    for p in percentiles:
+        out[f'P{p}'] = grouped.quantile(p / 100)
+    return out.round(1).reset_index(drop=by is None)
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+CONTACT_COLUMNS = ['Entity', 'VendorCode', 'VendorName', 'Address', 'Phone', 'Email', 'State', 'City']
+
+
+def normalize_vendor_names(names: pd.Series) -> pd.Series:
+    """Join key shared by transactions and the vendor master (lower-cased, stripped)."""
+    return names.astype(str).str.lower().str.strip()
+
+
+class VendorDimension:
+    """One row per normalized vendor name, addressed by a stable integer vendor_id.
+
+    `table` holds the contact attributes of the vendor's first master entry by Entity
+    (the row the dashboard shows) and GeoState / GeoCity from its first entry that
+    has a State. Transactions are enriched by id lookup: for categorical vendor
+    columns only the categories are normalized, then rows take their code's id.
+    `aliases` (normalized name -> master VendorName_Norm, e.g. accepted fuzzy matches)
+    resolve further spellings to the same vendor_id."""
+
+    def __init__(self, vendor_master: pd.DataFrame, aliases: dict | None = None):
+        vm = vendor_master.reset_index(drop=True)
+        norm = vm['VendorName_Norm'] if 'VendorName_Norm' in vm.columns else normalize_vendor_names(vm['VendorName'])
+        norms = pd.Index(pd.unique(norm))
+        self._id_by_norm = pd.Series(np.arange(len(norms)), index=norms)
+        row_ids = self._id_by_norm.reindex(norm).to_numpy()
+        if aliases:
+            extra = pd.Series(aliases, dtype=object)
+            extra = extra[~extra.index.isin(norms) & extra.isin(norms)]
+            self._id_by_norm = pd.concat([self._id_by_norm, self._id_by_norm.reindex(extra.to_numpy()).set_axis(extra.index)])
+
+        by_entity = vm.assign(vendor_id=row_ids).sort_values('Entity', kind='stable').drop_duplicates('vendor_id')
+        table = by_entity.set_index('vendor_id').reindex(np.arange(len(norms)))
+        geo = vm.assign(vendor_id=row_ids)[vm['State'].notna()].drop_duplicates('vendor_id').set_index('vendor_id')
+        table['GeoState'] = geo['State'].reindex(table.index)
+        table['GeoCity'] = geo['City'].reindex(table.index)
+        table['VendorName_Norm'] = norms
+        self.table = table
+        # master row positions per vendor_id, for the all-entities contact lookup
+        order = np.argsort(row_ids, kind='stable')
+        self._master = vm
+        self._master_order = order
+        self._master_bounds = np.searchsorted(row_ids[order], np.arange(len(norms) + 1))
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def ids_for(self, names: pd.Series) -> np.ndarray:
+        """vendor_id per transaction row (-1 when the name is not in the master)."""
+        if isinstance(names.dtype, pd.CategoricalDtype):
+            cat_ids = self._lookup(normalize_vendor_names(pd.Series(names.cat.categories)))
+            codes = names.cat.codes.to_numpy()
+            return np.where(codes >= 0, cat_ids[codes], -1)
+        codes, uniques = pd.factorize(names, use_na_sentinel=False)
+        return self._lookup(normalize_vendor_names(pd.Series(uniques, dtype=object)))[codes]
+
+    def _lookup(self, norms: pd.Series) -> np.ndarray:
+        return self._id_by_norm.reindex(norms.to_numpy()).fillna(-1).to_numpy(dtype=np.int64)
+
+    def enrich(self, frame: pd.DataFrame, name_col: str, columns, how: str = 'left') -> pd.DataFrame:
+        """`frame` plus dimension `columns` (list, or {dim column: output name}) for its vendors.
+        how='inner' keeps only rows whose vendor is in the master."""
+        ids = self.ids_for(frame[name_col])
+        out = frame if how == 'left' else frame[ids >= 0]
+        if how != 'left':
+            ids = ids[ids >= 0]
+        out = out.copy()
+        mapping = columns if isinstance(columns, dict) else {c: c for c in columns}
+        safe_ids = np.where(ids >= 0, ids, 0)
+        for col, name in mapping.items():
+            values = self.table[col].to_numpy()[safe_ids] if len(self.table) else np.full(len(ids), np.nan, dtype=object)
+            out[name] = pd.Series(values, index=out.index).where(ids >= 0)
+        return out
+
+    def contacts(self, name) -> pd.DataFrame:
+        """Every master entry (all entities) of one vendor name."""
+        vid = self._lookup(normalize_vendor_names(pd.Series([name], dtype=object)))[0]
+        if vid < 0:
+            return self._master.iloc[0:0]
+        rows = self._master_order[self._master_bounds[vid]:self._master_bounds[vid + 1]]
+        return self._master.iloc[rows]
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+
+from convert_to_parquet import DATA_DIR, excel_engine, fingerprint_file, read_workbooks
+
+# ---------- CONFIG ----------
+VENDOR_FILES = {
+    'MEPL': 'meplvendor.xlsx',
+    'MLPL': 'mlplvendor.xlsx',
+    'MMW':  'mmwvendor.xlsx',
+    'MMPL': 'mmplvendor.xlsx'
+}
+VENDOR_MASTER_PATH = DATA_DIR / "vendor_master.parquet"
+VENDOR_META_KEY = b'vendor_master'
+PARSER_VERSION = 1
+VENDOR_MARKER = 'Vendor account'
+# (label column, value column) pairs of the vendor report layout: A -> C and G -> J
+LABEL_VALUE_COLUMNS = ((0, 2), (6, 9))
+# The dashboard only reads this many rows of a block (the vendor report's first page)
+APP_BLOCK_ROWS = 40
+VENDOR_MASTER_COLUMNS = ['Entity', 'VendorCode', 'VendorName', 'Address', 'Phone', 'Email', 'State', 'City', 'VendorName_Norm']
+
+
+def _labels(s: pd.Series) -> pd.Series:
+    return s.astype(object).where(s.notna(), '').astype(str).str.strip()
+
+
+def parse_vendor_blocks(raw: pd.DataFrame, max_block_rows: int | None = None) -> pd.DataFrame:
+    """One row per "Vendor account" block of a headerless vendor report.
+
+    Block ids are a cumulative sum over the marker rows; every (label, value) cell pair
+    of LABEL_VALUE_COLUMNS inside a block becomes a column named after the label (the
+    marker's own value lands in 'Vendor account'). The last occurrence of a label in a
+    block wins; `max_block_rows` ignores rows further than that from the marker."""
+    if raw.empty:
+        return pd.DataFrame()
+    is_marker = (_labels(raw.iloc[:, 0]) == VENDOR_MARKER).to_numpy()
+    block = np.cumsum(is_marker)
+    pos = np.arange(len(raw))
+    offset = pos - np.maximum.accumulate(np.where(is_marker, pos, 0))
+    keep = block > 0
+    if max_block_rows is not None:
+        keep &= offset < max_block_rows
+
+    pairs = []
+    for label_col, value_col in LABEL_VALUE_COLUMNS:
+        if value_col >= raw.shape[1]:
+            continue
+        pairs.append(pd.DataFrame({
+            'block': block[keep], 'offset': offset[keep],
+            'label': _labels(raw.iloc[:, label_col]).to_numpy()[keep],
+            'value': raw.iloc[:, value_col].to_numpy()[keep],
+        }))
+    cells = pd.concat(pairs, ignore_index=True)
+    cells = cells[cells['label'] != '']
+    cells = cells.sort_values(['block', 'offset'], kind='stable').drop_duplicates(['block', 'label'], keep='last')
+    wide = cells.pivot(index='block', columns='label', values='value')
+    wide.columns.name = None
+    return wide.reset_index(drop=True)
+
+
+def _text(s: pd.Series) -> pd.Series:
+    """Stripped strings; missing / blank cells become None."""
+    out = s.astype(object).where(s.notna(), None)
+    out = out.map(lambda v: str(v).strip() if v is not None else None)
+    return out.where(out != '', None)
+
+
+def vendor_master_frame(blocks: pd.DataFrame, entity: str) -> pd.DataFrame:
+    """Dashboard vendor master rows (VENDOR_MASTER_COLUMNS) from parse_vendor_blocks output."""
+    def field(label):
+        return _text(blocks[label]) if label in blocks.columns else pd.Series(None, index=blocks.index, dtype=object)
+
+    out = pd.DataFrame({
+        'Entity': entity,
+        'VendorCode': field(VENDOR_MARKER),
+        'VendorName': field('Vendor name'),
+        'Address': field('Address'),
+        'Phone': field('Telephone'),
+        'Email': field('Email'),
+        'State': field('State'),
+    }, index=blocks.index)
+    # City from the "City -Zip" line of the address (e.g. "Noida -201301")
+    out['City'] = out['Address'].str.extract(r'(?:^|\n)([^\n]+?)\s*-\s*\d{6}', expand=False).str.strip()
+    out['VendorName_Norm'] = out['VendorName'].astype(str).str.lower().str.strip()
+    return out[VENDOR_MASTER_COLUMNS]
+
+
+def _parse_vendor_file(path: Path, entity: str) -> pd.DataFrame:
+    raw = pd.read_excel(path, header=None, engine=excel_engine())
+    return vendor_master_frame(parse_vendor_blocks(raw, max_block_rows=APP_BLOCK_ROWS), entity)
+
+
+# ---------- Parquet cache ----------
+
+def _sources(data_dir: Path) -> dict:
+    return {entity: data_dir / fname for entity, fname in VENDOR_FILES.items() if (data_dir / fname).exists()}
+
+def vendor_master_key(data_dir: Path = DATA_DIR) -> dict:
+    """Content hashes of the vendor workbooks plus the parser version (this module's source)."""
+    files = {entity: fingerprint_file(path)['sha256'] for entity, path in _sources(data_dir).items()}
+    h = hashlib.sha256(Path(__file__).read_bytes())
+    h.update(str(PARSER_VERSION).encode())
+    return {'files': files, 'version': h.hexdigest()[:16]}
+
+def _read_cache(path: Path, key: dict) -> pd.DataFrame | None:
+    if not path.exists():
+        return None
+    try:
+        meta = pq.read_schema(path).metadata or {}
+        if VENDOR_META_KEY not in meta or json.loads(meta[VENDOR_META_KEY]) != key:
+            return None
+        return pq.read_table(path).to_pandas()
+    except Exception as exc:
+        print(f"Ignoring unreadable vendor master cache {path.name}: {exc}")
+        return None
+
+def _write_cache(df: pd.DataFrame, path: Path, key: dict) -> None:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta[VENDOR_META_KEY] = json.dumps(key).encode()
+    tmp = path.with_suffix('.tmp')
+    pq.write_table(table.replace_schema_metadata(meta), tmp)
+    tmp.replace(path)
+
+def load_vendor_master(data_dir: Path = DATA_DIR, path: Path = VENDOR_MASTER_PATH) -> pd.DataFrame:
+    """Unified vendor master of all entities. Reads the Parquet cache when it was built from
+    the current workbooks with the current parser; otherwise parses them and refreshes it."""
+    key = vendor_master_key(data_dir)
+    cached = _read_cache(path, key)
+    if cached is not None:
+        return cached
+
+    frames, failed = [], False
+    jobs = [(src, entity) for entity, src in _sources(data_dir).items()]
+    for (src, _), (entity, frame, _, error) in zip(jobs, read_workbooks(jobs, reader=_parse_vendor_file)):
+        if error is not None:
+            failed = True
+            print(f"Error parsing vendor file {src.name}: {error}")
+            continue
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=VENDOR_MASTER_COLUMNS)
+    v_df = pd.concat(frames, ignore_index=True)
+    if not failed:  # a partial result would otherwise stick until a workbook changes
+        try:
+            _write_cache(v_df, path, key)
+        except Exception as exc:
+            print(f"Could not cache vendor master to {path.name}: {exc}")
+    return v_df
+
+
+if __name__ == "__main__":
+    from vendor_match import refresh_match_table
+    VENDOR_MASTER_PATH.unlink(missing_ok=True)
+    vendor_master = load_vendor_master()
+    print(f"Parsed {len(vendor_master)} vendors into {VENDOR_MASTER_PATH}")
+    refresh_match_table(vendor_master)
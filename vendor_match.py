@@ -0,0 +1,234 @@
+import difflib
+import hashlib
+import json
+import math
+import re
+from collections import Counter, defaultdict
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+
+from convert_to_parquet import DATA_DIR, open_p2p_dataset, source_fingerprint
+from vendor_dim import normalize_vendor_names
+from vendor_master import vendor_master_key
+
+# ---------- CONFIG ----------
+MATCH_TABLE_PATH = DATA_DIR / "vendor_matches.parquet"
+MATCH_META_KEY = b'vendor_matches'
+MATCHER_VERSION = 2
+# Fuzzy matches at or above this score are used for enrichment; lower ones are kept for review
+MATCH_THRESHOLD = 0.9
+MAX_CANDIDATES = 10
+# Two core tokens of at least this length count as the same word at this similarity ("SICOMA" ~ "SICOMMA")
+TOKEN_MIN_LEN, TOKEN_SIMILARITY = 4, 0.85
+# Spelling variants of legal-form words, folded to one form before comparing
+LEGAL_ALIASES = {
+    'PVT': 'PRIVATE', 'PRIVATE': 'PRIVATE', 'PRIV': 'PRIVATE', 'P': 'PRIVATE',
+    'LTD': 'LIMITED', 'LIMITED': 'LIMITED', 'L': 'LIMITED',
+    'CO': 'COMPANY', 'COMPANY': 'COMPANY', 'CORP': 'CORPORATION', 'CORPORATION': 'CORPORATION',
+    'LLP': 'LLP', 'INC': 'INC', 'MFG': 'MANUFACTURING', 'ENGG': 'ENGINEERING', 'INDS': 'INDUSTRIES',
+}
+# Words that say what kind of entity it is, not which one (dropped from the core name)
+LEGAL_WORDS = {'PRIVATE', 'LIMITED', 'COMPANY', 'CORPORATION', 'LLP', 'INC', 'THE', 'M', 'S', 'MS'}
+GSTIN_RE = re.compile(r'\b\d{2}[A-Z]{5}\d{4}[A-Z][0-9A-Z]Z[0-9A-Z]\b')
+MATCH_COLUMNS = ['po_vendor', 'VendorName_Norm', 'score', 'method']
+
+
+def canonical_name(name) -> str:
+    """Upper-cased, punctuation-free name with legal-form spellings folded
+    ("Pvt. Ltd." == "Private Limited", "&" == "AND")."""
+    text = str(name).upper().replace('&', ' AND ')
+    text = re.sub(r'^\s*M\s*/\s*S\.?\s+', '', text)  # "M/s XYZ"
+    tokens = re.sub(r'[^0-9A-Z]+', ' ', text).split()
+    # "P LTD" / "PVT LTD": single letters only count as legal words next to one
+    def beside_legal(i):
+        return any(0 <= j < len(tokens) and len(tokens[j]) > 1 and tokens[j] in LEGAL_ALIASES for j in (i - 1, i + 1))
+    return ' '.join(LEGAL_ALIASES.get(t, t) if len(t) > 1 or beside_legal(i) else t for i, t in enumerate(tokens))
+
+
+def core_name(canonical: str) -> str:
+    return ' '.join(t for t in canonical.split() if t not in LEGAL_WORDS)
+
+
+def _trigrams(text: str) -> set:
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(a: set, b: set) -> float:
+    return 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+
+def _same_token(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    return (min(len(a), len(b)) >= TOKEN_MIN_LEN
+            and difflib.SequenceMatcher(None, a, b).ratio() >= TOKEN_SIMILARITY)
+
+
+class VendorMatcher:
+    """Resolves transaction vendor names to vendor-master names.
+
+    Tries, in order: exact normalized name, canonical name (legal-form folding),
+    core name (legal words dropped), a vendor code or GSTIN contained in the name,
+    then fuzzy similarity over candidates blocked by a character-trigram index of
+    the core names, so each name is compared with a handful of masters only.
+
+    Fuzzy scores are weighted by how distinctive the shared words are (IDF over
+    the master core names): "ABC ENGINEERING WORKS" and "S M ENGINEERING WORKS"
+    share only generic words, so they do not match, and a candidate is rejected
+    outright unless the rarest word of each name has a counterpart in the other."""
+
+    def __init__(self, vendor_master: pd.DataFrame):
+        vm = vendor_master.dropna(subset=['VendorName']).drop_duplicates('VendorName_Norm')
+        self.norms = vm['VendorName_Norm'].tolist()
+        canon = [canonical_name(n) for n in vm['VendorName']]
+        self.cores = [core_name(c) for c in canon]
+        self._by_norm = {n: i for i, n in enumerate(self.norms)}
+        self._by_canon = {}
+        self._by_core = {}
+        for i, (c, k) in enumerate(zip(canon, self.cores)):
+            self._by_canon.setdefault(c, i)
+            if k:
+                self._by_core.setdefault(k, i)
+        self._by_code = {}
+        for code, norm in zip(vendor_master['VendorCode'], vendor_master['VendorName_Norm']):
+            if isinstance(code, str) and code.strip() and norm in self._by_norm:
+                self._by_code.setdefault(code.strip().upper(), self._by_norm[norm])
+        for text, norm in zip(vendor_master['Address'], vendor_master['VendorName_Norm']):
+            if isinstance(text, str) and norm in self._by_norm:
+                for gstin in GSTIN_RE.findall(text.upper()):
+                    self._by_code.setdefault(gstin, self._by_norm[norm])
+        self._tokens = [k.split() for k in self.cores]
+        doc_freq = Counter(t for tokens in self._tokens for t in set(tokens))
+        n = len(self.cores)
+        self._idf = {t: math.log((n + 1) / (f + 1)) + 1 for t, f in doc_freq.items()}
+        self._max_idf = math.log(n + 1) + 1  # words no master uses
+        self._grams = [_trigrams(k) for k in self.cores]
+        self._postings = defaultdict(list)
+        for i, grams in enumerate(self._grams):
+            for g in grams:
+                self._postings[g].append(i)
+
+    def match(self, name) -> tuple:
+        """(matched VendorName_Norm or None, score 0..1, method)."""
+        norm = str(name).lower().strip()
+        if norm in self._by_norm:
+            return norm, 1.0, 'exact'
+        canon = canonical_name(name)
+        if canon in self._by_canon:
+            return self.norms[self._by_canon[canon]], 0.99, 'canonical'
+        core = core_name(canon)
+        if core in self._by_core:
+            return self.norms[self._by_core[core]], 0.97, 'core'
+        for token in GSTIN_RE.findall(canon.replace(' ', '')) + str(name).upper().split():
+            if token in self._by_code:
+                return self.norms[self._by_code[token]], 0.95, 'code'
+        return self._fuzzy(core)
+
+    def _weight(self, token: str) -> float:
+        return self._idf.get(token, self._max_idf)
+
+    def _coverage(self, tokens: list, other: list) -> float | None:
+        """IDF-weighted share of `tokens` with a counterpart in `other`; None when the most
+        distinctive of them has none."""
+        if not tokens:
+            return None
+        weights = [self._weight(t) for t in tokens]
+        found = [any(_same_token(t, o) for o in other) for t in tokens]
+        if not found[weights.index(max(weights))]:
+            return None
+        return sum(w for w, f in zip(weights, found) if f) / sum(weights)
+
+    def _fuzzy(self, core: str) -> tuple:
+        grams = _trigrams(core)
+        tokens = core.split()
+        shared = Counter(i for g in grams for i in self._postings.get(g, ()))
+        best = (None, 0.0, 'none')
+        for i, _ in shared.most_common(MAX_CANDIDATES):
+            forward = self._coverage(tokens, self._tokens[i])
+            backward = self._coverage(self._tokens[i], tokens)
+            if forward is None or backward is None:
+                continue
+            ratio = difflib.SequenceMatcher(None, core, self.cores[i]).ratio()
+            score = round(min(forward, backward) * (0.6 * _dice(grams, self._grams[i]) + 0.4 * ratio), 3)
+            if score > best[1]:
+                best = (self.norms[i], score, 'fuzzy')
+        return best
+
+    def match_all(self, names) -> pd.DataFrame:
+        rows = [(n, *self.match(n)) for n in names]
+        return pd.DataFrame(rows, columns=MATCH_COLUMNS)
+
+
+# ---------- Persisted match table ----------
+
+def _distinct_vendor_names() -> list:
+    dataset = open_p2p_dataset()
+    if dataset is None or 'po_vendor' not in dataset.schema.names:
+        return []
+    values = dataset.to_table(columns=['po_vendor']).column(0).to_pandas().dropna().astype(str)
+    return sorted(v for v in values.unique() if v.strip() and v.strip().lower() != 'nan')
+
+def match_table_key() -> dict:
+    h = hashlib.sha256(Path(__file__).read_bytes())
+    h.update(str(MATCHER_VERSION).encode())
+    return {'master': vendor_master_key(), 'source': source_fingerprint(), 'version': h.hexdigest()[:16]}
+
+def build_match_table(vendor_master: pd.DataFrame, path: Path = MATCH_TABLE_PATH) -> pd.DataFrame:
+    """Matches every distinct po_vendor of the source once and persists the result."""
+    key = match_table_key()
+    table = VendorMatcher(vendor_master).match_all(_distinct_vendor_names())
+    arrow = pa.Table.from_pandas(table, preserve_index=False)
+    meta = dict(arrow.schema.metadata or {})
+    meta[MATCH_META_KEY] = json.dumps(key).encode()
+    tmp = path.with_suffix('.tmp')
+    pq.write_table(arrow.replace_schema_metadata(meta), tmp)
+    tmp.replace(path)
+    return table
+
+def match_table_is_fresh(path: Path = MATCH_TABLE_PATH) -> bool:
+    """Whether the persisted table was built from the current source, master and matcher."""
+    if not path.exists():
+        return False
+    try:
+        meta = pq.read_schema(path).metadata or {}
+        return MATCH_META_KEY in meta and json.loads(meta[MATCH_META_KEY]) == match_table_key()
+    except Exception as exc:
+        print(f"Ignoring unreadable match table {path.name}: {exc}")
+        return False
+
+def refresh_match_table(vendor_master: pd.DataFrame | None = None, force: bool = False,
+                        path: Path = MATCH_TABLE_PATH) -> bool:
+    """Offline step (converter / vendor-master refresh): rebuilds the table when stale.
+    Returns False when it was already up to date or there is no vendor master."""
+    if not force and match_table_is_fresh(path):
+        print(f"{path.name} is up to date")
+        return False
+    if vendor_master is None:
+        from vendor_master import load_vendor_master
+        vendor_master = load_vendor_master()
+    if vendor_master.empty:
+        print("No vendor master to match against")
+        return False
+    table = build_match_table(vendor_master, path)
+    print(f"Matched {len(table)} vendor names into {path.name}")
+    return True
+
+def load_match_table(path: Path = MATCH_TABLE_PATH) -> pd.DataFrame:
+    """The persisted match table; empty (exact name matching only) when it is missing or stale.
+    Never built here: see refresh_match_table()."""
+    if not match_table_is_fresh(path):
+        return pd.DataFrame(columns=MATCH_COLUMNS)
+    return pq.read_table(path).to_pandas()
+
+def accepted_aliases(matches: pd.DataFrame, threshold: float = MATCH_THRESHOLD) -> dict:
+    """normalized transaction name -> matched VendorName_Norm, for non-exact matches above threshold."""
+    ok = matches[(matches['method'] != 'exact') & matches['VendorName_Norm'].notna() & (matches['score'] >= threshold)]
+    return dict(zip(normalize_vendor_names(ok['po_vendor']), ok['VendorName_Norm']))
+
+
+if __name__ == "__main__":
+    refresh_match_table(force=True)
+    print(load_match_table()['method'].value_counts().to_string())